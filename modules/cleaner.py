@@ -7,15 +7,44 @@ import threading
 import os
 from tkinter import messagebox
 from pathlib import Path
-import shutil
 import subprocess
 import winreg
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from utils.logger import get_logger
-from utils.safe_commands import run_command
+from utils.config_manager import ConfigManager
+from utils.fs_scanner import format_size
+from utils.scan_index import CACHE_DIR, ScanIndex
+from utils.clean_scheduler import CleanScheduler
+from utils.clean_filters import compile_category_filters
+from utils.clean_plan import build_plan
+from utils.delete_job import DeleteJob
+from utils.io_throttle import CLEAN_MODE_BACKGROUND, CLEAN_MODE_FOREGROUND, throttle_from_settings
+from utils.size_accounting import size_accounting_from_settings
 
 logger = get_logger(__name__)
 
+# Last previewed plan, kept for auditing
+LAST_PLAN_FILE = CACHE_DIR / "last_clean_plan.json"
+
+# Seconds spent on Windows.old per cleaning run; the deletion resumes from
+# its journal on the next run
+WINDOWS_OLD_TIME_BUDGET = 300
+
+# Progress labels for each cleaning category
+CATEGORY_LABELS = {
+    "temp_files": "temporary files",
+    "windows_cache": "Windows cache",
+    "browser_cache": "browser cache",
+    "recycle_bin": "recycle bin",
+    "windows_update": "Windows Update cache",
+    "thumbnails": "thumbnail cache",
+    "delivery_opt": "delivery optimization",
+    "log_files": "log files",
+    "crash_dumps": "crash dumps",
+    "windows_old": "Windows.old",
+    "defender_logs": "Defender logs",
+}
+
 
 class CleanerModule:
     """System cleaner module"""
@@ -25,6 +54,11 @@ class CleanerModule:
         self.frame = None
         self.cleaning_in_progress = False
         self.total_cleaned = 0
+        self.clean_reports = {}
+        self.config = ConfigManager()
+        self.scan_index = None
+        self.clean_plan = None
+        self.clean_throttle = None
         
     def show(self):
         """Display the cleaner module"""
@@ -106,6 +140,16 @@ class CleanerModule:
         )
         self.scan_btn.pack(side="left", padx=10)
         
+        self.plan_btn = ctk.CTkButton(
+            button_frame,
+            text="📋 Preview Plan",
+            command=self.preview_plan,
+            width=200,
+            height=40,
+            font=ctk.CTkFont(size=14)
+        )
+        self.plan_btn.pack(side="left", padx=10)
+        
         self.clean_btn = ctk.CTkButton(
             button_frame,
             text="🧹 Start Cleaning",
@@ -117,6 +161,22 @@ class CleanerModule:
             hover_color="darkgreen"
         )
         self.clean_btn.pack(side="left", padx=10)
+        
+        # Background mode: capped disk throughput for busy workstations
+        self.background_switch = ctk.CTkSwitch(
+            content,
+            text="🐢 Background mode (limit disk usage while cleaning)",
+            command=self._toggle_background_mode,
+            font=ctk.CTkFont(size=12)
+        )
+        if self.config.get_setting('optimization.clean_mode') == CLEAN_MODE_BACKGROUND:
+            self.background_switch.select()
+        self.background_switch.grid(row=len(clean_options) + 3, column=0, pady=5)
+    
+    def _toggle_background_mode(self):
+        """Save the selected cleaning mode"""
+        mode = CLEAN_MODE_BACKGROUND if self.background_switch.get() else CLEAN_MODE_FOREGROUND
+        self.config.set_setting('optimization.clean_mode', mode)
     
     def scan_only(self):
         """Scan for cleanable items without deleting"""
@@ -127,42 +187,23 @@ class CleanerModule:
         self.progress_label.configure(text="Scanning...")
         self.progress_bar.set(0)
         
-        total_size = 0
-        items_found = 0
-        
         try:
-            # Scan temp files
-            if self.options["temp_files"].get():
-                temp_paths = [
-                    Path(os.environ.get('TEMP', '')),
-                    Path('C:\\Windows\\Temp')
-                ]
-                for path in temp_paths:
-                    if path.exists():
-                        size, count = self._calculate_folder_size(path)
-                        total_size += size
-                        items_found += count
-            
-            # Scan browser cache
-            if self.options["browser_cache"].get():
-                browser_paths = self._get_browser_cache_paths()
-                for path in browser_paths:
-                    if path.exists():
-                        size, count = self._calculate_folder_size(path)
-                        total_size += size
-                        items_found += count
-            
-            # Update result
-            size_mb = total_size / (1024 * 1024)
-            size_gb = size_mb / 1024
+            size_accounting_from_settings(self.config.get_setting('optimization'))
+            selected = [key for key, var in self.options.items() if var.get()]
+            if self.scan_index is None:
+                self.scan_index = ScanIndex()
+            results = self.scan_index.scan_categories(
+                self._get_category_targets(), selected,
+                on_progress=self._on_scan_progress, filters=self._get_clean_filters()
+            )
             
-            if size_gb >= 1:
-                size_str = f"{size_gb:.2f} GB"
-            else:
-                size_str = f"{size_mb:.2f} MB"
+            total_size = sum(r.size for r in results.values())
+            items_found = sum(r.count for r in results.values())
+            for category, result in results.items():
+                logger.debug(f"Scan {category}: {result.count} files, {result.size} bytes")
             
             self.progress_label.configure(
-                text=f"✅ Scan Complete: {items_found:,} items found ({size_str})"
+                text=f"✅ Scan Complete: {items_found:,} items found ({format_size(total_size)})"
             )
             self.progress_bar.set(1)
             
@@ -170,6 +211,38 @@ class CleanerModule:
             logger.error(f"Scan error: {e}")
             self.progress_label.configure(text=f"❌ Scan error: {str(e)}")
     
+    def preview_plan(self):
+        """Compute the clean plan for the current selection without deleting"""
+        threading.Thread(target=self._plan_thread, daemon=True).start()
+    
+    def _plan_thread(self):
+        """Plan thread"""
+        self.progress_label.configure(text="Planning...")
+        self.progress_bar.set(0)
+        
+        try:
+            size_accounting_from_settings(self.config.get_setting('optimization'))
+            targets, _ = self._get_selected_jobs()
+            plan = build_plan(
+                targets, filters=self._get_clean_filters(), on_progress=self._on_scan_progress
+            )
+            plan.save(LAST_PLAN_FILE)
+            self.clean_plan = plan
+            
+            details = ", ".join(
+                f"{CATEGORY_LABELS.get(category, category)}: {format_size(result.size)}"
+                for category, result in plan.totals().items() if result.count
+            )
+            self.progress_label.configure(
+                text=f"📋 Plan: {plan.file_count:,} items ({format_size(plan.total_size)})"
+                     + (f"\n{details}" if details else "")
+            )
+            self.progress_bar.set(1)
+            
+        except Exception as e:
+            logger.error(f"Planning error: {e}")
+            self.progress_label.configure(text=f"❌ Planning error: {str(e)}")
+    
     def start_cleaning(self):
         """Start the cleaning process"""
         if self.cleaning_in_progress:
@@ -190,99 +263,45 @@ class CleanerModule:
     def _clean_thread(self):
         """Cleaning thread"""
         self.total_cleaned = 0
+        self.clean_reports = {}
         self.progress_bar.set(0)
         self.progress_label.configure(text="Starting cleaning...")
         
         try:
-            total_steps = sum(1 for v in self.options.values() if v.get())
-            current_step = 0
-            
-            # Clean temp files
-            if self.options["temp_files"].get():
-                self.progress_label.configure(text="Cleaning temporary files...")
-                self._clean_temp_files()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Clean Windows cache
-            if self.options["windows_cache"].get():
-                self.progress_label.configure(text="Cleaning Windows cache...")
-                self._clean_windows_cache()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Clean browser cache
-            if self.options["browser_cache"].get():
-                self.progress_label.configure(text="Cleaning browser cache...")
-                self._clean_browser_cache()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Empty recycle bin
-            if self.options["recycle_bin"].get():
-                self.progress_label.configure(text="Emptying recycle bin...")
-                self._empty_recycle_bin()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Clean Windows Update cache
-            if self.options["windows_update"].get():
-                self.progress_label.configure(text="Cleaning Windows Update cache...")
-                self._clean_windows_update()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Clean thumbnails
-            if self.options["thumbnails"].get():
-                self.progress_label.configure(text="Cleaning thumbnail cache...")
-                self._clean_thumbnails()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Delivery Optimization
-            if self.options["delivery_opt"].get():
-                self.progress_label.configure(text="Cleaning delivery optimization...")
-                self._clean_delivery_optimization()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Log files
-            if self.options["log_files"].get():
-                self.progress_label.configure(text="Cleaning log files...")
-                self._clean_log_files()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
-            
-            # Crash dumps
-            if self.options["crash_dumps"].get():
-                self.progress_label.configure(text="Cleaning crash dumps...")
-                self._clean_crash_dumps()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
+            size_accounting_from_settings(self.config.get_setting('optimization'))
+            targets, actions = self._get_selected_jobs()
             
-            # Windows.old
-            if self.options["windows_old"].get():
-                self.progress_label.configure(text="Removing Windows.old...")
-                self._remove_windows_old()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
+            def on_progress(category, report, done, total):
+                self.total_cleaned += report.freed
+                label = CATEGORY_LABELS.get(category, category)
+                self.progress_label.configure(
+                    text=f"Cleaned {label} ({done}/{total})..."
+                )
+                self.progress_bar.set(done / total)
             
-            # Defender logs
-            if self.options["defender_logs"].get():
-                self.progress_label.configure(text="Cleaning Defender logs...")
-                self._clean_defender_logs()
-                current_step += 1
-                self.progress_bar.set(current_step / total_steps)
+            self.clean_throttle = throttle_from_settings(self.config.get_setting('optimization'))
+            if self.clean_throttle is not None:
+                logger.info(f"Background cleaning: {self.clean_throttle}")
+            scheduler = CleanScheduler(self.config.get_setting('optimization.clean_workers'),
+                                       self.clean_throttle)
+            plan = self.clean_plan
+            if plan is not None and plan.matches(list(targets)):
+                # Execute the previewed plan: no rescan, changed files are skipped
+                self.clean_plan = None
+                results = scheduler.run_plan(plan, actions, on_progress,
+                                             on_stream=self._on_clean_progress)
+                changed = sum(report.changed for report in results.values())
+                if changed:
+                    logger.info(f"{changed} planned files changed since preview and were kept")
+                self.clean_reports = results
+            else:
+                scheduler.run(targets, actions, on_progress, on_stream=self._on_clean_progress,
+                              filters=self._get_clean_filters())
+                self.clean_reports = scheduler.path_reports
             
             # Complete
             self.progress_bar.set(1)
-            size_mb = self.total_cleaned / (1024 * 1024)
-            size_gb = size_mb / 1024
-            
-            if size_gb >= 1:
-                size_str = f"{size_gb:.2f} GB"
-            else:
-                size_str = f"{size_mb:.2f} MB"
+            size_str = format_size(self.total_cleaned)
             
             self.progress_label.configure(
                 text=f"✅ Cleaning Complete! {size_str} freed"
@@ -301,35 +320,61 @@ class CleanerModule:
             self.cleaning_in_progress = False
             self.clean_btn.configure(state="normal")
     
-    def _clean_temp_files(self):
-        """Clean temporary files"""
-        import os
-        temp_paths = [
-            Path(os.environ.get('TEMP', '')),
-            Path('C:\\Windows\\Temp')
-        ]
+    def _get_selected_jobs(self):
+        """Split the selected categories into folder targets and custom actions"""
+        selected = [key for key, var in self.options.items() if var.get()]
         
-        for path in temp_paths:
-            if path.exists():
-                self.total_cleaned += self._delete_folder_contents(path)
-    
-    def _clean_windows_cache(self):
-        """Clean Windows cache"""
-        cache_paths = [
-            Path('C:\\Windows\\Prefetch'),
-            Path(f"C:\\Users\\{os.getlogin()}\\AppData\\Local\\Microsoft\\Windows\\Explorer"),
-        ]
+        # Categories that are not plain folder deletions
+        actions = {}
+        if "recycle_bin" in selected:
+            actions["recycle_bin"] = self._empty_recycle_bin
+        if "windows_old" in selected:
+            actions["windows_old"] = self._remove_windows_old
         
-        for path in cache_paths:
-            if path.exists():
-                self.total_cleaned += self._delete_folder_contents(path, pattern="*.db")
+        all_targets = self._get_category_targets()
+        targets = {
+            key: all_targets[key] for key in selected
+            if key in all_targets and key not in actions
+        }
+        return targets, actions
     
-    def _clean_browser_cache(self):
-        """Clean browser cache"""
-        browser_paths = self._get_browser_cache_paths()
-        for path in browser_paths:
-            if path.exists():
-                self.total_cleaned += self._delete_folder_contents(path)
+    def _get_clean_filters(self):
+        """Compile the per-category rules from optimization.clean_filters"""
+        errors = {}
+        filters = compile_category_filters(
+            self.config.get_setting('optimization.clean_filters', {}), errors=errors
+        )
+        if errors:
+            message = "These categories are skipped until their rules are fixed:\n" + "\n".join(
+                f"{CATEGORY_LABELS.get(category, category)}: {error}"
+                for category, error in errors.items()
+            )
+            self._post_to_ui(lambda: messagebox.showwarning("Invalid Cleaning Filters", message))
+        return filters
+    
+    def _post_to_ui(self, callback):
+        """Run a UI update on the Tk main loop"""
+        try:
+            self.frame.after(0, callback)
+        except Exception:
+            # Window closed while a worker was still reporting
+            pass
+    
+    def _on_scan_progress(self, event):
+        """Show streamed scan progress (called from the scan thread)"""
+        if event.done:
+            return
+        text = f"Scanning... {event.files:,} items ({format_size(event.bytes)}) - {event.root}"
+        self._post_to_ui(lambda: self.progress_label.configure(text=text))
+    
+    def _on_clean_progress(self, event):
+        """Show streamed cleaning progress (called from worker threads)"""
+        if event.done:
+            return
+        text = f"Cleaning... {format_size(event.bytes)} freed ({event.files:,} files) - {event.root}"
+        if event.phase == "delete":
+            text += f" [{event.files_per_second:,.0f} files/s, {event.mb_per_second:.1f} MB/s]"
+        self._post_to_ui(lambda: self.progress_label.configure(text=text))
     
     def _empty_recycle_bin(self):
         """Empty recycle bin"""
@@ -339,78 +384,19 @@ class CleanerModule:
         except:
             pass
     
-    def _clean_windows_update(self):
-        """Clean Windows Update cache"""
-        update_path = Path('C:\\Windows\\SoftwareDistribution\\Download')
-        if update_path.exists():
-            self.total_cleaned += self._delete_folder_contents(update_path)
-    
-    def _clean_thumbnails(self):
-        """Clean thumbnail cache"""
-        import os
-        thumb_path = Path(f"C:\\Users\\{os.getlogin()}\\AppData\\Local\\Microsoft\\Windows\\Explorer")
-        if thumb_path.exists():
-            self.total_cleaned += self._delete_folder_contents(thumb_path, pattern="thumbcache_*.db")
-    
-    def _clean_delivery_optimization(self):
-        """Clean delivery optimization files"""
-        do_path = Path('C:\\Windows\\SoftwareDistribution\\DeliveryOptimization')
-        if do_path.exists():
-            self.total_cleaned += self._delete_folder_contents(do_path)
-    
-    def _clean_log_files(self):
-        """Clean log files"""
-        log_path = Path('C:\\Windows\\Logs')
-        if log_path.exists():
-            self.total_cleaned += self._delete_folder_contents(log_path, pattern="*.log")
-    
-    def _clean_crash_dumps(self):
-        """Clean crash dumps"""
-        dump_paths = [
-            Path('C:\\Windows\\Minidump'),
-            Path('C:\\Windows\\MEMORY.DMP'),
-        ]
-        
-        for path in dump_paths:
-            if path.exists():
-                if path.is_file():
-                    try:
-                        size = path.stat().st_size
-                        path.unlink()
-                        self.total_cleaned += size
-                    except:
-                        pass
-                else:
-                    self.total_cleaned += self._delete_folder_contents(path)
-    
     def _remove_windows_old(self):
-        """Remove Windows.old folder"""
+        """Remove Windows.old folder (resumable, see utils.delete_job)"""
         old_path = Path('C:\\Windows.old')
-        if old_path.exists():
-            try:
-                run_command(['cmd', '/c', 'rd', '/s', '/q', str(old_path)], 
-                         timeout=300)
-            except:
-                pass
-    
-    def _clean_defender_logs(self):
-        """Clean Windows Defender logs (requires admin)"""
-        try:
-            defender_path = Path('C:\\ProgramData\\Microsoft\\Windows Defender\\Scans\\History')
-            # Check if path exists - this can also raise PermissionError
-            try:
-                if not defender_path.exists():
-                    logger.debug("Defender logs path does not exist")
-                    return
-            except PermissionError:
-                logger.debug("Defender logs require admin privileges - skipped (access check)")
-                return
-            
-            self.total_cleaned += self._delete_folder_contents(defender_path)
-        except PermissionError:
-            logger.debug("Defender logs require admin privileges - skipped")
-        except Exception as e:
-            logger.debug(f"Could not clean defender logs: {e}")
+        if not old_path.exists():
+            return 0
+        job = DeleteJob(old_path, remove_root=True, on_progress=self._on_clean_progress,
+                        throttle=self.clean_throttle)
+        freed_before = job.report.freed
+        report = job.run(time_budget=WINDOWS_OLD_TIME_BUDGET)
+        if not job.complete:
+            logger.info(f"Windows.old partially removed ({format_size(report.freed)}), "
+                        f"will resume on next cleaning")
+        return report.freed - freed_before
     
     def _get_browser_cache_paths(self) -> List[Path]:
         """Get browser cache paths"""
@@ -430,69 +416,31 @@ class CleanerModule:
             Path(f"{base}\\Roaming\\Opera Software\\Opera Stable\\Cache"),
         ]
     
-    def _calculate_folder_size(self, folder: Path) -> Tuple[int, int]:
-        """Calculate folder size and item count"""
-        total_size = 0
-        item_count = 0
-        
-        # Protection: Skip critical system folders
-        critical_paths = ['system32', 'syswow64', 'program files']
-        folder_str = str(folder).lower()
-        for critical in critical_paths:
-            if critical in folder_str and 'temp' not in folder_str and 'cache' not in folder_str:
-                logger.warning(f"Skipping critical folder: {folder}")
-                return 0, 0
-        
-        try:
-            for item in folder.rglob('*'):
-                if item.is_file():
-                    try:
-                        total_size += item.stat().st_size
-                        item_count += 1
-                    except (PermissionError, OSError):
-                        # Skip inaccessible files
-                        pass
-        except Exception as e:
-            logger.debug(f"Error scanning {folder}: {e}")
-        
-        return total_size, item_count
-    
-    def _delete_folder_contents(self, folder: Path, pattern: str = '*') -> int:
-        """Delete folder contents and return total size deleted"""
-        total_deleted = 0
-        
-        # Protection: Don't delete from critical folders
-        critical_paths = ['system32', 'syswow64', 'program files', 'windows\\system']
-        folder_str = str(folder).lower()
-        for critical in critical_paths:
-            if critical in folder_str and 'temp' not in folder_str and 'cache' not in folder_str:
-                logger.error(f"BLOCKED: Attempted to delete from critical folder: {folder}")
-                return 0
-        
-        if not folder.exists():
-            return 0
-        
-        try:
-            for item in folder.glob(pattern):
-                try:
-                    if item.is_file():
-                        # Additional protection for system files
-                        if item.suffix.lower() in ['.sys', '.dll', '.exe'] and 'temp' not in str(item).lower():
-                            logger.warning(f"Skipping system file: {item}")
-                            continue
-                        
-                        size = item.stat().st_size
-                        item.unlink()
-                        total_deleted += size
-                    elif item.is_dir():
-                        size, _ = self._calculate_folder_size(item)
-                        shutil.rmtree(item, ignore_errors=True)
-                        total_deleted += size
-                except PermissionError:
-                    logger.debug(f"Permission denied: {item}")
-                except Exception as e:
-                    logger.debug(f"Could not delete {item}: {e}")
-        except Exception as e:
-            logger.error(f"Error deleting folder contents: {e}")
+    def _get_category_targets(self) -> Dict[str, List[Tuple[Path, str]]]:
+        """Get (path, pattern) targets for each cleaning category"""
+        local_app_data = f"C:\\Users\\{os.getlogin()}\\AppData\\Local"
+        explorer = Path(f"{local_app_data}\\Microsoft\\Windows\\Explorer")
         
-        return total_deleted
+        return {
+            "temp_files": [
+                (Path(path), '*')
+                for path in (os.environ.get('TEMP'), 'C:\\Windows\\Temp') if path
+            ],
+            "windows_cache": [
+                (Path('C:\\Windows\\Prefetch'), '*.db'),
+                (explorer, '*.db'),
+            ],
+            "browser_cache": [(path, '*') for path in self._get_browser_cache_paths()],
+            "windows_update": [(Path('C:\\Windows\\SoftwareDistribution\\Download'), '*')],
+            "thumbnails": [(explorer, 'thumbcache_*.db')],
+            "delivery_opt": [(Path('C:\\Windows\\SoftwareDistribution\\DeliveryOptimization'), '*')],
+            "log_files": [(Path('C:\\Windows\\Logs'), '*.log')],
+            "crash_dumps": [
+                (Path('C:\\Windows\\Minidump'), '*'),
+                (Path('C:\\Windows\\MEMORY.DMP'), '*'),
+            ],
+            "windows_old": [(Path('C:\\Windows.old'), '*')],
+            "defender_logs": [
+                (Path('C:\\ProgramData\\Microsoft\\Windows Defender\\Scans\\History'), '*'),
+            ],
+        }
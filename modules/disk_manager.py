@@ -1,28 +1,692 @@
-"""Disk Manager Module - Placeholder"""
+"""
+Disk Manager Module - Disk Space Analysis
+"""
+
 import customtkinter as ctk
+import threading
+import contextlib
+import os
+from tkinter import messagebox
 from utils.logger import get_logger
+from utils.config_manager import ConfigManager
+from utils.fs_scanner import format_size
+from utils.large_files import LargeFileFinder, find_large_files
+from utils.duplicates import DuplicateFinder, reclaimable_bytes
+from utils.backup_manager import BackupManager
+from utils.dedup import BACKUP_TYPE, DEDUP_HARDLINK, DEDUP_QUARANTINE, DedupJob
+from utils.file_catalog import FileCatalog
+from utils.disk_snapshot import DiskSnapshot, SnapshotStore, diff_snapshots
+from utils.treemap import OTHER, TreemapWorker, hit_test
+from utils.disk_histogram import DiskHistogram
+from utils.disk_watch import LiveTree
+from utils.size_accounting import size_accounting_from_settings
+
 logger = get_logger(__name__)
 
+# Rows shown for one folder (largest first)
+MAX_ROWS = 200
+
+# Large files listed, and delay between two list refreshes while scanning
+TOP_FILES = 100
+SNAPSHOT_INTERVAL = 0.5
+
+# Duplicate sets listed (most reclaimable first)
+MAX_DUPLICATE_SETS = 200
+
+# "Changes" compares the current analysis with the snapshot of a week ago
+CHANGES_PERIOD = 7 * 24 * 3600
+MAX_CHANGES = 25
+
+# Treemap: fill colors by depth, delay before re-layout after a resize (ms)
+TREEMAP_COLORS = ("#1f6aa5", "#2b8a3e", "#c77c02", "#a61e4d", "#5f3dc4", "#0b7285")
+TREEMAP_OTHER_COLOR = "#555555"
+TREEMAP_RESIZE_DELAY = 150
+
+# Extensions listed in the breakdown tab
+TOP_EXTENSIONS = 30
+
+
 class DiskManagerModule:
     def __init__(self, parent):
         self.parent = parent
+        self.config = ConfigManager()
         self.frame = None
-    
+        self.tree = None
+        self.catalog = None
+        self.snapshots = SnapshotStore()
+        self.snapshot = None
+        self.treemap_worker = TreemapWorker(self._on_treemap_layout)
+        self.treemap_rects = []
+        # Tree the treemap was laid out from (a snapshot while live updates run)
+        self.treemap_tree = None
+        self.treemap_node = 0
+        self.treemap_resize_job = None
+        self.histogram = None
+        self.live = None
+        self.current = 0
+        self.analysis_in_progress = False
+        self.cancel_event = threading.Event()
+        self.large_files = []
+        self.search_in_progress = False
+        self.search_cancel = threading.Event()
+        self.duplicates = []
+        self.duplicate_in_progress = False
+        self.duplicate_cancel = threading.Event()
+        self.dedup_in_progress = False
+
     def show(self):
+        """Display the disk manager module"""
         self.frame = ctk.CTkFrame(self.parent)
         self.frame.pack(fill="both", expand=True, padx=20, pady=20)
-        
-        title = ctk.CTkLabel(self.frame, text="💿 Disk Manager", 
+
+        title = ctk.CTkLabel(self.frame, text="💿 Disk Manager",
                             font=ctk.CTkFont(size=24, weight="bold"))
         title.pack(pady=20)
-        
-        desc = ctk.CTkLabel(self.frame, 
+
+        desc = ctk.CTkLabel(self.frame,
                            text="Analyze disk usage, find large files, detect duplicates",
                            font=ctk.CTkFont(size=14))
         desc.pack(pady=10)
-        
-        ctk.CTkLabel(self.frame, text="🛠️ Under Development - Coming Soon!",
-                    font=ctk.CTkFont(size=16), text_color="orange").pack(pady=30)
-        
-        ctk.CTkLabel(self.frame, text="Planned Features: Disk Health, Partitioning, Space Analysis",
-                    font=ctk.CTkFont(size=12), text_color="gray").pack(pady=5)
+
+        tabview = ctk.CTkTabview(self.frame)
+        tabview.pack(fill="both", expand=True, padx=20, pady=10)
+
+        analysis_tab = tabview.add("📊 Space Analysis")
+        self._create_analysis_tab(analysis_tab)
+
+        large_tab = tabview.add("📦 Large Files")
+        self._create_large_files_tab(large_tab)
+
+        duplicates_tab = tabview.add("👯 Duplicates")
+        self._create_duplicates_tab(duplicates_tab)
+
+        treemap_tab = tabview.add("🗺 Treemap")
+        self._create_treemap_tab(treemap_tab)
+
+        breakdown_tab = tabview.add("🧮 Breakdown")
+        self._create_breakdown_tab(breakdown_tab)
+
+    def _create_analysis_tab(self, parent):
+        """Create the space analysis tab"""
+        controls = ctk.CTkFrame(parent, fg_color="transparent")
+        controls.pack(fill="x", padx=10, pady=10)
+
+        self.path_entry = ctk.CTkEntry(controls, width=400)
+        self.path_entry.insert(0, os.environ.get('SystemDrive', 'C:') + os.sep)
+        self.path_entry.pack(side="left", padx=5)
+
+        self.analyze_btn = ctk.CTkButton(controls, text="🔍 Analyze", width=120,
+                                         command=self.start_analysis)
+        self.analyze_btn.pack(side="left", padx=5)
+
+        self.cancel_btn = ctk.CTkButton(controls, text="⏹ Stop", width=80,
+                                        command=self.cancel_event.set, state="disabled")
+        self.cancel_btn.pack(side="left", padx=5)
+
+        self.up_btn = ctk.CTkButton(controls, text="⬆ Up", width=80, command=self.go_up)
+        self.up_btn.pack(side="left", padx=5)
+
+        self.changes_btn = ctk.CTkButton(controls, text="📈 Changes", width=100,
+                                         command=self.show_changes)
+        self.changes_btn.pack(side="left", padx=5)
+
+        self.live_switch = ctk.CTkSwitch(controls, text="👁 Live", command=self._toggle_live)
+        self.live_switch.pack(side="left", padx=5)
+
+        self.status_label = ctk.CTkLabel(parent, text="Select a folder and click 'Analyze'",
+                                         font=ctk.CTkFont(size=12))
+        self.status_label.pack(pady=5)
+
+        self.rows_frame = ctk.CTkScrollableFrame(parent)
+        self.rows_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.rows_frame.grid_columnconfigure(1, weight=1)
+
+        if self.tree is not None:
+            self._show_folder(self.current)
+
+    def _create_large_files_tab(self, parent):
+        """Create the large files tab"""
+        controls = ctk.CTkFrame(parent, fg_color="transparent")
+        controls.pack(fill="x", padx=10, pady=10)
+
+        self.large_path_entry = ctk.CTkEntry(controls, width=300)
+        self.large_path_entry.insert(0, os.environ.get('SystemDrive', 'C:') + os.sep)
+        self.large_path_entry.pack(side="left", padx=5)
+
+        self.min_size_entry = ctk.CTkEntry(controls, width=90, placeholder_text="Min MB")
+        self.min_size_entry.pack(side="left", padx=5)
+
+        self.extensions_entry = ctk.CTkEntry(controls, width=160,
+                                             placeholder_text="Extensions (iso, mkv...)")
+        self.extensions_entry.pack(side="left", padx=5)
+
+        self.search_btn = ctk.CTkButton(controls, text="🔍 Find", width=100,
+                                        command=self.start_large_file_search)
+        self.search_btn.pack(side="left", padx=5)
+
+        ctk.CTkButton(controls, text="⏹ Stop", width=80,
+                      command=self.search_cancel.set).pack(side="left", padx=5)
+
+        self.large_status = ctk.CTkLabel(parent, text=f"Lists the {TOP_FILES} largest files",
+                                         font=ctk.CTkFont(size=12))
+        self.large_status.pack(pady=5)
+
+        self.large_list = ctk.CTkTextbox(parent, font=ctk.CTkFont(family="Consolas", size=12))
+        self.large_list.pack(fill="both", expand=True, padx=10, pady=10)
+        self._show_large_files(self.large_files)
+
+    def _create_treemap_tab(self, parent):
+        """Create the treemap tab (shows the last analysis)"""
+        self.treemap_status = ctk.CTkLabel(parent, text="Analyze a folder to see its treemap "
+                                                        "(click: open folder, right click: up)",
+                                           font=ctk.CTkFont(size=12))
+        self.treemap_status.pack(pady=5)
+
+        self.treemap_canvas = ctk.CTkCanvas(parent, bg="#202020", highlightthickness=0)
+        self.treemap_canvas.pack(fill="both", expand=True, padx=10, pady=10)
+        self.treemap_canvas.bind("<Configure>", self._on_treemap_resize)
+        self.treemap_canvas.bind("<Button-1>", self._on_treemap_click)
+        self.treemap_canvas.bind("<Button-3>", lambda _: self._treemap_up())
+
+    def _request_treemap(self, index, tree=None):
+        """Lay out a folder of tree (the analyzed tree by default) on the worker thread"""
+        tree = tree or self.tree
+        if tree is None:
+            return
+        width = self.treemap_canvas.winfo_width()
+        height = self.treemap_canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return
+        live = self.live
+        if live is not None and (tree is self.tree or tree is live.tree):
+            # Live updates change and compact the tree: lay out a copy
+            with live.lock:
+                path = tree.path(index)
+                tree = live.snapshot()
+            try:
+                index = tree.find(path)
+            except KeyError:
+                index = 0
+        self.treemap_worker.request(tree, width, height, index)
+
+    def _on_treemap_resize(self, _event):
+        """Re-layout once the window stops resizing"""
+        if self.treemap_resize_job is not None:
+            self.treemap_canvas.after_cancel(self.treemap_resize_job)
+        self.treemap_resize_job = self.treemap_canvas.after(
+            TREEMAP_RESIZE_DELAY,
+            lambda: self._request_treemap(self.treemap_node, self.treemap_tree)
+        )
+
+    def _on_treemap_layout(self, tree, index, rects):
+        """Layout finished (called from the worker thread)"""
+        self._post_to_ui(lambda: self._draw_treemap(tree, index, rects))
+
+    def _draw_treemap(self, tree, index, rects):
+        """Draw the rectangles of a finished layout"""
+        canvas = self.treemap_canvas
+        self.treemap_tree = tree
+        self.treemap_node = index
+        self.treemap_rects = rects
+        canvas.delete("all")
+        for x, y, w, h, node, depth in rects:
+            if node == OTHER:
+                color = TREEMAP_OTHER_COLOR
+            else:
+                color = TREEMAP_COLORS[depth % len(TREEMAP_COLORS)]
+            canvas.create_rectangle(x, y, x + w, y + h, fill=color, outline="#101010")
+            if node != OTHER and depth > 0 and w > 60 and h > 16:
+                canvas.create_text(x + 3, y + 2, anchor="nw", fill="white",
+                                   text=tree.name(node), width=w - 6)
+        self.treemap_status.configure(
+            text=f"{tree.path(index)} - {format_size(tree.size[index])} ({len(rects):,} blocks)"
+        )
+
+    def _on_treemap_click(self, event):
+        """Open the clicked folder, or show what the block is"""
+        rect = hit_test(self.treemap_rects, event.x, event.y)
+        if rect is None:
+            return
+        tree = self.treemap_tree
+        node = rect[4]
+        if node == OTHER:
+            self.treemap_status.configure(text="Files and folders too small to draw")
+        elif tree.is_dir(node) and node != self.treemap_node:
+            self._request_treemap(node, tree)
+        else:
+            self.treemap_status.configure(
+                text=f"{tree.path(node)} - {format_size(tree.size[node])}"
+            )
+
+    def _treemap_up(self):
+        """Show the parent of the treemap folder"""
+        tree = self.treemap_tree
+        if tree is not None and self.treemap_node > 0:
+            self._request_treemap(tree.parent[self.treemap_node], tree)
+
+    def _create_breakdown_tab(self, parent):
+        """Create the type/age/size breakdown tab (filled by the analysis)"""
+        self.breakdown_text = ctk.CTkTextbox(parent, font=ctk.CTkFont(family="Consolas", size=12))
+        self.breakdown_text.pack(fill="both", expand=True, padx=10, pady=10)
+        self._show_breakdown(self.histogram)
+
+    def _show_breakdown(self, histogram):
+        """Show where the space goes by type, age and size"""
+        if histogram is None:
+            text = "Analyze a folder to see where the space goes by type, age and size"
+        else:
+            total = histogram.total_bytes() or 1
+            lines = ["By type"]
+            for ext, size, files in histogram.by_extension(TOP_EXTENSIONS):
+                lines.append(f"  {ext or '(none)':<12} {format_size(size):>12} "
+                             f"{size * 100 / total:5.1f}%  {files:>10,} files")
+            lines += ["", "By last modification"]
+            for label, size, files in histogram.by_age():
+                lines.append(f"  {label:<12} {format_size(size):>12} "
+                             f"{size * 100 / total:5.1f}%  {files:>10,} files")
+            lines += ["", "By file size"]
+            for label, size, files in histogram.by_size_class():
+                lines.append(f"  {label:<12} {files:>10,} files  {format_size(size):>12}")
+            text = "\n".join(lines)
+        self.breakdown_text.configure(state="normal")
+        self.breakdown_text.delete("1.0", "end")
+        self.breakdown_text.insert("end", text)
+        self.breakdown_text.configure(state="disabled")
+
+    def start_large_file_search(self):
+        """Search the largest files in the background"""
+        if self.search_in_progress:
+            return
+        path = self.large_path_entry.get().strip()
+        if not os.path.isdir(path):
+            self.large_status.configure(text=f"❌ Not a folder: {path}")
+            return
+        try:
+            min_size = int(float(self.min_size_entry.get() or 0) * 1024 * 1024)
+        except ValueError:
+            self.large_status.configure(text="❌ Invalid minimum size")
+            return
+        extensions = [e for e in self.extensions_entry.get().replace(',', ' ').split() if e]
+
+        self.search_in_progress = True
+        self.search_cancel.clear()
+        self.search_btn.configure(state="disabled")
+        self.large_status.configure(text="Searching...")
+        threading.Thread(target=self._large_file_thread,
+                         args=(path, min_size, extensions), daemon=True).start()
+
+    def _large_file_thread(self, path, min_size, extensions):
+        """Large file search thread"""
+        def on_snapshot(files):
+            self._post_to_ui(lambda: self._show_large_files(files))
+
+        try:
+            files = find_large_files(path, TOP_FILES, min_size, extensions,
+                                     on_snapshot, SNAPSHOT_INTERVAL, self.search_cancel)
+            self.large_files = files
+            total = sum(size for size, _ in files)
+            self._post_to_ui(lambda: self.large_status.configure(
+                text=f"✅ {len(files)} largest files: {format_size(total)}"
+            ))
+        except Exception as e:
+            logger.error(f"Large file search error: {e}")
+            text = f"❌ Error: {e}"
+            self._post_to_ui(lambda: self.large_status.configure(text=text))
+        finally:
+            self.search_in_progress = False
+            self._post_to_ui(lambda: self.search_btn.configure(state="normal"))
+
+    def _show_large_files(self, files):
+        """Show a top-K snapshot"""
+        self.large_list.configure(state="normal")
+        self.large_list.delete("1.0", "end")
+        self.large_list.insert("end", "\n".join(
+            f"{format_size(size):>12}  {path}" for size, path in files
+        ))
+        self.large_list.configure(state="disabled")
+
+    def _create_duplicates_tab(self, parent):
+        """Create the duplicate files tab"""
+        controls = ctk.CTkFrame(parent, fg_color="transparent")
+        controls.pack(fill="x", padx=10, pady=10)
+
+        self.duplicate_path_entry = ctk.CTkEntry(controls, width=350)
+        self.duplicate_path_entry.insert(0, os.path.expanduser("~"))
+        self.duplicate_path_entry.pack(side="left", padx=5)
+
+        self.duplicate_min_entry = ctk.CTkEntry(controls, width=90, placeholder_text="Min MB")
+        self.duplicate_min_entry.pack(side="left", padx=5)
+
+        self.duplicate_btn = ctk.CTkButton(controls, text="🔍 Find Duplicates", width=150,
+                                           command=self.start_duplicate_search)
+        self.duplicate_btn.pack(side="left", padx=5)
+
+        ctk.CTkButton(controls, text="⏹ Stop", width=80,
+                      command=self.duplicate_cancel.set).pack(side="left", padx=5)
+
+        self.duplicate_status = ctk.CTkLabel(parent, text="Size, then partial hash, then full hash",
+                                             font=ctk.CTkFont(size=12))
+        self.duplicate_status.pack(pady=5)
+
+        actions = ctk.CTkFrame(parent, fg_color="transparent")
+        actions.pack(fill="x", padx=10)
+        self.dedup_buttons = [
+            ctk.CTkButton(actions, text="🔗 Replace with Hard Links", width=190,
+                          command=lambda: self.start_dedup(DEDUP_HARDLINK)),
+            ctk.CTkButton(actions, text="📦 Move to Quarantine", width=170,
+                          command=lambda: self.start_dedup(DEDUP_QUARANTINE)),
+            ctk.CTkButton(actions, text="↩ Undo Last", width=110, command=self.undo_last_dedup),
+        ]
+        for button in self.dedup_buttons:
+            button.pack(side="left", padx=5)
+
+        self.duplicate_list = ctk.CTkTextbox(parent, font=ctk.CTkFont(family="Consolas", size=12))
+        self.duplicate_list.pack(fill="both", expand=True, padx=10, pady=10)
+        self._show_duplicates(self.duplicates)
+
+    def start_duplicate_search(self):
+        """Search duplicate files in the background"""
+        if self.duplicate_in_progress:
+            return
+        path = self.duplicate_path_entry.get().strip()
+        if not os.path.isdir(path):
+            self.duplicate_status.configure(text=f"❌ Not a folder: {path}")
+            return
+        try:
+            min_size = int(float(self.duplicate_min_entry.get() or 0) * 1024 * 1024)
+        except ValueError:
+            self.duplicate_status.configure(text="❌ Invalid minimum size")
+            return
+
+        self.duplicate_in_progress = True
+        self.duplicate_cancel.clear()
+        self.duplicate_btn.configure(state="disabled")
+        self.duplicate_status.configure(text="Searching duplicates...")
+        threading.Thread(target=self._duplicate_thread, args=(path, min_size), daemon=True).start()
+
+    def _duplicate_thread(self, path, min_size):
+        """Duplicate search thread"""
+        def on_progress(event):
+            if not event.done:
+                text = f"Hashing... {format_size(event.bytes)} read - {event.root}"
+                self._post_to_ui(lambda: self.duplicate_status.configure(text=text))
+
+        try:
+            finder = DuplicateFinder(min_size, on_progress=on_progress,
+                                     cancel=self.duplicate_cancel, cache=self._get_catalog())
+            self.duplicates = finder.find([path])
+            self._get_catalog().save()
+            text = (f"✅ {len(self.duplicates)} duplicate sets, "
+                    f"{format_size(reclaimable_bytes(self.duplicates))} reclaimable "
+                    f"({finder.files_scanned:,} files, {finder.full_hashed:,} fully hashed)")
+            self._post_to_ui(lambda: (self.duplicate_status.configure(text=text),
+                                      self._show_duplicates(self.duplicates)))
+        except Exception as e:
+            logger.error(f"Duplicate search error: {e}")
+            text = f"❌ Error: {e}"
+            self._post_to_ui(lambda: self.duplicate_status.configure(text=text))
+        finally:
+            self.duplicate_in_progress = False
+            self._post_to_ui(lambda: self.duplicate_btn.configure(state="normal"))
+
+    def start_dedup(self, mode):
+        """Reclaim the duplicates found (the first copy of each set is kept)"""
+        if self.dedup_in_progress or self.duplicate_in_progress or not self.duplicates:
+            return
+        action = "replaced by hard links to" if mode == DEDUP_HARDLINK else "moved to quarantine, keeping"
+        if not messagebox.askyesno(
+            "Reclaim Duplicates",
+            f"Every copy is compared byte by byte, then {action} the first copy of its set.\n"
+            f"Up to {format_size(reclaimable_bytes(self.duplicates))} reclaimed. "
+            "This can be undone from the backups.\n\nContinue?"
+        ):
+            return
+        self.dedup_in_progress = True
+        self.duplicate_cancel.clear()
+        self._set_dedup_state("disabled")
+        self.duplicate_status.configure(text="Comparing and reclaiming duplicates...")
+        threading.Thread(target=self._dedup_thread, args=(mode,), daemon=True).start()
+
+    def _dedup_thread(self, mode):
+        """Dedup thread"""
+        def on_progress(event):
+            if not event.done:
+                text = f"Reclaimed {format_size(event.bytes)} ({event.files:,} files) - {event.root}"
+                self._post_to_ui(lambda: self.duplicate_status.configure(text=text))
+
+        try:
+            report = DedupJob(mode, BackupManager(), on_progress=on_progress,
+                              cancel=self.duplicate_cancel).run(self.duplicates)
+            text = (f"✅ {format_size(report.reclaimed)} reclaimed ({report.files:,} files), "
+                    f"{len(report.skipped):,} kept, {len(report.errors):,} errors")
+            self.duplicates = []
+            self._post_to_ui(lambda: (self.duplicate_status.configure(text=text),
+                                      self._show_duplicates(self.duplicates)))
+        except Exception as e:
+            logger.error(f"Dedup error: {e}")
+            text = f"❌ Error: {e}"
+            self._post_to_ui(lambda: self.duplicate_status.configure(text=text))
+        finally:
+            self.dedup_in_progress = False
+            self._post_to_ui(lambda: self._set_dedup_state("normal"))
+
+    def undo_last_dedup(self):
+        """Undo the most recent dedup run"""
+        if self.dedup_in_progress:
+            return
+        backups = BackupManager()
+        runs = [b for b in backups.list_backups()
+                if b.get('type') == BACKUP_TYPE and not b.get('restored')]
+        if not runs:
+            self.duplicate_status.configure(text="No dedup to undo")
+            return
+        last = runs[-1]
+        if not messagebox.askyesno(
+            "Undo Dedup",
+            f"Restore the {last.get('files', 0):,} files of the {last['timestamp'][:19]} run?"
+        ):
+            return
+        self.dedup_in_progress = True
+        self._set_dedup_state("disabled")
+        self.duplicate_status.configure(text="Restoring duplicates...")
+
+        def undo():
+            try:
+                done = backups.restore_dedup_backup(last['name'])
+                text = "✅ Dedup undone" if done else "⚠ Dedup partly undone (see log)"
+                self._post_to_ui(lambda: self.duplicate_status.configure(text=text))
+            finally:
+                self.dedup_in_progress = False
+                self._post_to_ui(lambda: self._set_dedup_state("normal"))
+        threading.Thread(target=undo, daemon=True).start()
+
+    def _set_dedup_state(self, state):
+        for button in self.dedup_buttons:
+            button.configure(state=state)
+
+    def _show_duplicates(self, duplicates):
+        """Show duplicate sets, most reclaimable first"""
+        lines = []
+        for duplicate in duplicates[:MAX_DUPLICATE_SETS]:
+            lines.append(f"{format_size(duplicate.reclaimable)} reclaimable - "
+                         f"{len(duplicate.paths)} x {format_size(duplicate.size)}")
+            lines.extend(f"    {path}" for path in duplicate.paths)
+        self.duplicate_list.configure(state="normal")
+        self.duplicate_list.delete("1.0", "end")
+        self.duplicate_list.insert("end", "\n".join(lines))
+        self.duplicate_list.configure(state="disabled")
+
+    def start_analysis(self):
+        """Analyze the selected folder in the background"""
+        if self.analysis_in_progress:
+            return
+        path = self.path_entry.get().strip()
+        if not os.path.isdir(path):
+            self.status_label.configure(text=f"❌ Not a folder: {path}")
+            return
+
+        self._stop_live()
+        self.live_switch.deselect()
+        self.analysis_in_progress = True
+        self.cancel_event.clear()
+        self.analyze_btn.configure(state="disabled")
+        self.cancel_btn.configure(state="normal")
+        threading.Thread(target=self._analysis_thread, args=(path,), daemon=True).start()
+
+    def _analysis_thread(self, path):
+        """Analysis thread"""
+        try:
+            size_accounting_from_settings(self.config.get_setting('optimization'))
+            tree = self._get_catalog().analyze(path, on_progress=self._on_progress,
+                                               cancel=self.cancel_event)
+            # The large files list comes from the tree: no second scan
+            finder = LargeFileFinder(TOP_FILES)
+            finder.add_tree(tree)
+            self.large_files = finder.top()
+            self.histogram = DiskHistogram()
+            self.histogram.add_tree(tree)
+            if not self.cancel_event.is_set():
+                self.snapshot = DiskSnapshot.from_tree(tree)
+                self.snapshots.save(self.snapshot)
+            logger.info(f"Analyzed {path}: {len(tree):,} entries, "
+                        f"{format_size(tree.memory_usage())} in memory")
+            self._post_to_ui(lambda: self._analysis_done(tree))
+        except Exception as e:
+            logger.error(f"Disk analysis error: {e}")
+            text = f"❌ Error: {e}"
+            self._post_to_ui(lambda: self.status_label.configure(text=text))
+        finally:
+            self.analysis_in_progress = False
+            self._post_to_ui(lambda: (self.analyze_btn.configure(state="normal"),
+                                      self.cancel_btn.configure(state="disabled")))
+
+    def show_changes(self):
+        """Show the directories that grew or shrank since about a week ago"""
+        if self.snapshot is None:
+            self.status_label.configure(text="Analyze a folder first")
+            return
+        baseline = self.snapshots.baseline(self.snapshot.root, CHANGES_PERIOD)
+        if baseline is None or baseline.taken_at >= self.snapshot.taken_at:
+            self.status_label.configure(text="No earlier snapshot of this folder yet")
+            return
+
+        diff = diff_snapshots(baseline, self.snapshot, MAX_CHANGES)
+        days = diff.elapsed / 86400
+        sign = "+" if diff.delta >= 0 else "-"
+        self.status_label.configure(
+            text=f"{self.snapshot.root}: {sign}{format_size(abs(diff.delta))} in {days:.1f} days "
+                 f"({diff.added:,} new, {diff.removed:,} removed folders)"
+        )
+        for widget in self.rows_frame.winfo_children():
+            widget.destroy()
+        rows = [("📈", change) for change in diff.grown] + [("📉", change) for change in diff.shrunk]
+        for row, (icon, change) in enumerate(rows):
+            ctk.CTkLabel(self.rows_frame, text=f"{icon} {change.path}", anchor="w").grid(
+                row=row, column=0, columnspan=2, sticky="w", padx=5, pady=2
+            )
+            sign = "+" if change.delta >= 0 else "-"
+            ctk.CTkLabel(self.rows_frame, text=f"{sign}{format_size(abs(change.delta))}",
+                         width=90).grid(row=row, column=2, sticky="e", padx=5)
+
+    def _get_catalog(self):
+        """Open the file catalog on first use (it is loaded from disk)"""
+        if self.catalog is None:
+            self.catalog = FileCatalog()
+        return self.catalog
+
+    def _analysis_done(self, tree):
+        """Keep the finished tree and show its root"""
+        self.tree = tree
+        self._show_folder(0)
+        self._request_treemap(0)
+        self._show_breakdown(self.histogram)
+        self._show_large_files(self.large_files)
+
+    def _post_to_ui(self, callback):
+        """Run a UI update on the Tk main loop"""
+        try:
+            self.frame.after(0, callback)
+        except Exception:
+            # Window closed while the analysis was running
+            pass
+
+    def _on_progress(self, event):
+        """Show streamed analysis progress (called from the analysis thread)"""
+        if event.done:
+            return
+        text = f"Analyzing... {event.files:,} files ({format_size(event.bytes)}) - {event.root}"
+        self._post_to_ui(lambda: self.status_label.configure(text=text))
+
+    def _toggle_live(self):
+        """Keep the analyzed tree current while the switch is on"""
+        if not self.live_switch.get():
+            self._stop_live()
+            return
+        if self.tree is None or self.analysis_in_progress:
+            self.live_switch.deselect()
+            self.status_label.configure(text="Analyze a folder first")
+            return
+        self.live = LiveTree(self.tree, on_change=lambda _: self._post_to_ui(self._refresh_live))
+        self.live.start()
+        if self.treemap_tree is self.tree:
+            # Drawn from the tree that live updates now change
+            self._request_treemap(self.treemap_node)
+
+    def _stop_live(self):
+        if self.live is not None:
+            live, self.live = self.live, None
+            threading.Thread(target=live.stop, daemon=True).start()
+
+    def _refresh_live(self):
+        """Show the current folder again after a live update"""
+        if self.live is None:
+            return
+        with self.live.lock:
+            path = self.tree.path(self.current)
+            self.tree = self.live.tree
+            try:
+                # Updated folders move inside the tree arrays
+                index = self.tree.find(path)
+            except KeyError:
+                index = 0
+        self._show_folder(index)
+
+    def _tree_lock(self):
+        """Lock held while reading a tree that live updates may change"""
+        return self.live.lock if self.live is not None else contextlib.nullcontext()
+
+    def go_up(self):
+        """Show the parent of the current folder"""
+        if self.tree is not None and self.current > 0:
+            self._show_folder(self.tree.parent[self.current])
+
+    def _show_folder(self, index):
+        """Show the children of a folder, largest first"""
+        tree = self.tree
+        self.current = index
+        for widget in self.rows_frame.winfo_children():
+            widget.destroy()
+
+        with self._tree_lock():
+            total = tree.size[index]
+            title = f"{tree.path(index)} - {format_size(total)} in {tree.count[index]:,} files"
+            rows = [(child, tree.size[child], tree.name(child), tree.is_dir(child))
+                    for child in tree.largest_children(index, MAX_ROWS)]
+        self.status_label.configure(text=title)
+
+        for row, (child, size, name, is_dir) in enumerate(rows):
+            if is_dir:
+                label = ctk.CTkButton(self.rows_frame, text=f"📁 {name}", anchor="w",
+                                      fg_color="transparent", width=300,
+                                      command=lambda c=child: self._show_folder(c))
+            else:
+                label = ctk.CTkLabel(self.rows_frame, text=f"📄 {name}", anchor="w", width=300)
+            label.grid(row=row, column=0, sticky="w", padx=5, pady=2)
+
+            bar = ctk.CTkProgressBar(self.rows_frame)
+            bar.set(size / total if total else 0)
+            bar.grid(row=row, column=1, sticky="ew", padx=5)
+
+            ctk.CTkLabel(self.rows_frame, text=format_size(size), width=90).grid(
+                row=row, column=2, sticky="e", padx=5
+            )
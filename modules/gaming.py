@@ -8,7 +8,8 @@ import winreg
 from tkinter import messagebox
 import threading
 from utils.logger import get_logger
-from utils.safe_commands import run_command, stop_service, start_service
+from utils.safe_commands import run_command, run_commands
+from utils.service_control import RUNNING, STOPPED, apply_service_states
 
 logger = get_logger(__name__)
 
@@ -186,13 +187,25 @@ class GamingModule:
     
     def toggle_gaming_mode(self):
         """Toggle gaming mode on/off"""
+        # Services are changed on a worker thread: no second toggle meanwhile
+        self.toggle_btn.configure(state="disabled")
         if not self.gaming_mode_active:
-            self.activate_gaming_mode()
+            self.status_label.configure(text="Gaming Mode: activating...")
+            threading.Thread(target=self.activate_gaming_mode, daemon=True).start()
         else:
-            self.deactivate_gaming_mode()
+            self.status_label.configure(text="Gaming Mode: deactivating...")
+            threading.Thread(target=self.deactivate_gaming_mode, daemon=True).start()
+    
+    def _post_to_ui(self, callback):
+        """Run a UI update on the Tk main loop"""
+        try:
+            self.frame.after(0, callback)
+        except Exception:
+            # Window closed while a worker was still reporting
+            pass
     
     def activate_gaming_mode(self):
-        """Activate gaming mode"""
+        """Activate gaming mode (runs on a worker thread)"""
         try:
             # Stop unnecessary services
             services_to_stop = [
@@ -203,64 +216,78 @@ class GamingModule:
                 'SysMain',  # Superfetch
             ]
             
-            for service in services_to_stop:
-                try:
-                    stop_service(service)
-                except:
-                    pass
+            # One state query, only running services are stopped (in parallel)
+            report = apply_service_states({service: STOPPED for service in services_to_stop})
+            for service, reason in report.failed.items():
+                logger.warning(f"Gaming mode could not stop {service}: {reason}")
             
             # Set high performance power plan
             run_command(['powercfg', '-setactive', 
                           '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'])
             
-            # Update UI
-            self.gaming_mode_active = True
-            self.status_label.configure(
-                text="Gaming Mode: ACTIVE",
-                text_color="green"
-            )
-            self.toggle_btn.configure(
-                text="🛑 DEACTIVATE GAMING MODE",
-                fg_color="red",
-                hover_color="darkred"
-            )
-            
-            messagebox.showinfo("Success", "Gaming Mode Activated!\n\nNon-essential services stopped.")
+            self._post_to_ui(self._gaming_mode_activated)
             logger.info("Gaming mode activated")
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to activate gaming mode: {e}")
             logger.error(f"Gaming mode activation error: {e}")
+            message = f"Failed to activate gaming mode: {e}"
+            self._post_to_ui(lambda: self._gaming_mode_failed(message))
+    
+    def _gaming_mode_activated(self):
+        """Update the UI once gaming mode is on"""
+        self.gaming_mode_active = True
+        self.status_label.configure(
+            text="Gaming Mode: ACTIVE",
+            text_color="green"
+        )
+        self.toggle_btn.configure(
+            text="🛑 DEACTIVATE GAMING MODE",
+            fg_color="red",
+            hover_color="darkred",
+            state="normal"
+        )
+        messagebox.showinfo("Success", "Gaming Mode Activated!\n\nNon-essential services stopped.")
     
     def deactivate_gaming_mode(self):
-        """Deactivate gaming mode"""
+        """Deactivate gaming mode (runs on a worker thread)"""
         try:
             # Restart services
             services_to_start = ['wuauserv', 'BITS', 'Spooler', 'WSearch']
             
-            for service in services_to_start:
-                try:
-                    start_service(service)
-                except:
-                    pass
-            
-            # Update UI
-            self.gaming_mode_active = False
-            self.status_label.configure(
-                text="Gaming Mode: INACTIVE",
-                text_color="red"
-            )
-            self.toggle_btn.configure(
-                text="🎮 ACTIVATE GAMING MODE",
-                fg_color="green",
-                hover_color="darkgreen"
-            )
+            report = apply_service_states({service: RUNNING for service in services_to_start})
+            for service, reason in report.failed.items():
+                logger.warning(f"Gaming mode could not restart {service}: {reason}")
             
-            messagebox.showinfo("Success", "Gaming Mode Deactivated!\n\nServices restored.")
+            self._post_to_ui(self._gaming_mode_deactivated)
             logger.info("Gaming mode deactivated")
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to deactivate gaming mode: {e}")
+            logger.error(f"Gaming mode deactivation error: {e}")
+            message = f"Failed to deactivate gaming mode: {e}"
+            self._post_to_ui(lambda: self._gaming_mode_failed(message))
+    
+    def _gaming_mode_deactivated(self):
+        """Update the UI once gaming mode is off"""
+        self.gaming_mode_active = False
+        self.status_label.configure(
+            text="Gaming Mode: INACTIVE",
+            text_color="red"
+        )
+        self.toggle_btn.configure(
+            text="🎮 ACTIVATE GAMING MODE",
+            fg_color="green",
+            hover_color="darkgreen",
+            state="normal"
+        )
+        messagebox.showinfo("Success", "Gaming Mode Deactivated!\n\nServices restored.")
+    
+    def _gaming_mode_failed(self, message):
+        """Restore the UI after a failed toggle"""
+        self.status_label.configure(
+            text="Gaming Mode: ACTIVE" if self.gaming_mode_active else "Gaming Mode: INACTIVE"
+        )
+        self.toggle_btn.configure(state="normal")
+        messagebox.showerror("Error", message)
     
     # Gaming optimizations
     def disable_game_dvr(self):
@@ -326,7 +353,7 @@ class GamingModule:
         try:
             # Find network interfaces
             result = run_command(['powershell', '-Command',
-                'Get-NetAdapter | Select-Object -ExpandProperty InterfaceGuid'])
+                'Get-NetAdapter | Select-Object -ExpandProperty InterfaceGuid'], read_only=True)
             
             if result and result.stdout:
                 for guid in result.stdout.split():
@@ -430,8 +457,12 @@ class GamingModule:
                 ['netsh', 'int', 'tcp', 'set', 'global', 'timestamps=disabled'],
             ]
             
-            for cmd in commands:
-                run_command(cmd)
+            # Independent settings: applied concurrently
+            results = run_commands(commands)
+            failed = [' '.join(cmd[5:]) for cmd, result in zip(commands, results)
+                      if result is None or result.returncode != 0]
+            if failed:
+                logger.warning(f"TCP/IP settings not applied: {', '.join(failed)}")
             
             messagebox.showinfo("Success", "TCP/IP stack optimized!")
         except Exception as e:
@@ -415,7 +415,7 @@ class OptimizerModule:
                           'e9a42b02-d5df-448d-aa00-03f14749eb61'])
             
             # Get the GUID and set it active
-            result = run_command(['powercfg', '-list'])
+            result = run_command(['powercfg', '-list'], read_only=True)
             if result and result.stdout:
                 for line in result.stdout.split('\n'):
                     if 'Ultimate Performance' in line:
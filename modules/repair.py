@@ -6,7 +6,7 @@ import customtkinter as ctk
 import threading
 from tkinter import messagebox
 from utils.logger import get_logger
-from utils.safe_commands import run_command
+from utils.safe_commands import run_command, run_commands
 
 logger = get_logger(__name__)
 
@@ -306,7 +306,8 @@ class RepairModule:
             
             result = run_command(
                 ['wmic', 'diskdrive', 'get', 'status'],
-                timeout=30
+                timeout=30,
+                read_only=True
             )
             
             if result and result.stdout and 'OK' in result.stdout:
@@ -346,10 +347,16 @@ class RepairModule:
             "This will reset all network settings.\n\n"
             "Restart required after completion.\n\nContinue?"):
             try:
-                run_command(['netsh', 'winsock', 'reset'])
-                run_command(['netsh', 'int', 'ip', 'reset'])
-                run_command(['ipconfig', '/flushdns'])
-                run_command(['netsh', 'int', 'tcp', 'reset'])
+                # Independent resets: run concurrently
+                commands = [
+                    ['netsh', 'winsock', 'reset'],
+                    ['netsh', 'int', 'ip', 'reset'],
+                    ['ipconfig', '/flushdns'],
+                    ['netsh', 'int', 'tcp', 'reset'],
+                ]
+                for cmd, result in zip(commands, run_commands(commands)):
+                    if result is None or result.returncode != 0:
+                        logger.warning(f"Network reset step failed: {' '.join(cmd)}")
                 
                 messagebox.showinfo("Success", 
                     "Network fully reset!\n\n"
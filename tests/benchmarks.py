@@ -0,0 +1,527 @@
+"""
+Benchmarks de performance pour OptiWindows
+Mesure les moteurs de scan et de nettoyage sur des arborescences synthétiques
+
+Usage:
+    python tests/benchmarks.py                 # tous les benchmarks
+    python tests/benchmarks.py scan --files 100000
+"""
+
+import argparse
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from collections import deque
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.fs_scanner import scan_path
+from utils.fs_cleaner import delete_contents
+from utils.clean_scheduler import CleanScheduler
+from utils.scan_index import ScanIndex
+from utils.delete_job import DeleteJob
+from utils.io_throttle import IOThrottle
+from utils.disk_usage import FLAG_DIR, SizeTree, analyze_tree
+from utils.file_catalog import FileCatalog
+from utils.disk_snapshot import DiskSnapshot, diff_snapshots
+from utils.treemap import layout_treemap
+from utils.disk_histogram import DiskHistogram
+from utils.backup_manager import BackupManager
+from utils.duplicates import find_duplicates
+from utils.dedup import DEDUP_HARDLINK, DEDUP_QUARANTINE, DedupJob, undo_dedup
+from utils.safe_commands import POWERSHELL_SESSION, ShellPool, frame_powershell, frame_sh
+from utils.command_policy import DEFAULT_POLICY, CommandPolicy
+
+
+def make_synthetic_tree(root: Path, file_count: int, files_per_dir: int = 500,
+                        file_size: int = 64) -> Path:
+    """Crée une arborescence de file_count petits fichiers"""
+    payload = b"x" * file_size
+    dir_count = (file_count + files_per_dir - 1) // files_per_dir
+    created = 0
+    for d in range(dir_count):
+        folder = root / f"group_{d // 50:04d}" / f"dir_{d:05d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for f in range(min(files_per_dir, file_count - created)):
+            with open(folder / f"file_{f:04d}.tmp", "wb") as fh:
+                fh.write(payload)
+            created += 1
+    return root
+
+
+def timed(func, *args, **kwargs):
+    """Exécute func et retourne (résultat, secondes)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def legacy_folder_size(folder: Path):
+    """Ancienne implémentation (Path.rglob + is_file + stat)"""
+    total_size = 0
+    item_count = 0
+    for item in folder.rglob('*'):
+        if item.is_file():
+            try:
+                total_size += item.stat().st_size
+                item_count += 1
+            except (PermissionError, OSError):
+                pass
+    return total_size, item_count
+
+
+def bench_scan(file_count: int):
+    """Benchmark: scan os.scandir vs Path.rglob"""
+    print("=" * 70)
+    print(f"BENCHMARK: scan d'une arborescence de {file_count:,} fichiers")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _, build = timed(make_synthetic_tree, root, file_count)
+        print(f"Création de l'arborescence: {build:.1f}s")
+
+        # Premier passage pour chauffer le cache du système de fichiers
+        scan_path(root)
+
+        legacy, legacy_time = timed(legacy_folder_size, root)
+        new, new_time = timed(scan_path, root)
+
+        assert legacy == new, f"Résultats différents: {legacy} != {new}"
+        print(f"Path.rglob  : {legacy_time:.2f}s")
+        print(f"os.scandir  : {new_time:.2f}s")
+        print(f"Accélération: x{legacy_time / new_time:.1f}\n")
+
+
+def legacy_delete_contents(folder: Path):
+    """Ancienne implémentation (calcul de taille puis shutil.rmtree)"""
+    total_deleted = 0
+    for item in folder.glob('*'):
+        if item.is_file():
+            total_deleted += item.stat().st_size
+            item.unlink()
+        elif item.is_dir():
+            size, _ = legacy_folder_size(item)
+            shutil.rmtree(item, ignore_errors=True)
+            total_deleted += size
+    return total_deleted
+
+
+def bench_delete(file_count: int):
+    """Benchmark: suppression en une passe vs calcul + rmtree"""
+    print("=" * 70)
+    print(f"BENCHMARK: suppression de {file_count:,} fichiers")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_root = make_synthetic_tree(Path(tmp) / "legacy", file_count)
+        new_root = make_synthetic_tree(Path(tmp) / "new", file_count)
+
+        legacy, legacy_time = timed(legacy_delete_contents, legacy_root)
+        report, new_time = timed(delete_contents, new_root)
+
+        assert legacy == report.freed, f"Résultats différents: {legacy} != {report.freed}"
+        print(f"taille + rmtree : {legacy_time:.2f}s")
+        print(f"une seule passe : {new_time:.2f}s")
+        print(f"Accélération    : x{legacy_time / new_time:.1f}\n")
+
+
+def bench_parallel_clean(file_count: int, roots: int = 8, workers: int = 4):
+    """Benchmark: nettoyage séquentiel vs pool de threads sur plusieurs racines"""
+    print("=" * 70)
+    print(f"BENCHMARK: nettoyage de {roots} racines ({file_count:,} fichiers, {workers} workers)")
+    print("=" * 70)
+
+    per_root = file_count // roots
+    with tempfile.TemporaryDirectory() as tmp:
+        def build(name):
+            return {
+                f"category_{i}": [(make_synthetic_tree(Path(tmp) / name / str(i), per_root), '*')]
+                for i in range(roots)
+            }
+
+        sequential_targets = build("sequential")
+        parallel_targets = build("parallel")
+
+        sequential, sequential_time = timed(CleanScheduler(1).run, sequential_targets)
+        parallel, parallel_time = timed(CleanScheduler(workers).run, parallel_targets)
+
+        assert sum(r.freed for r in sequential.values()) == sum(r.freed for r in parallel.values())
+        print(f"1 worker    : {sequential_time:.2f}s")
+        print(f"{workers} workers   : {parallel_time:.2f}s")
+        print(f"Accélération: x{sequential_time / parallel_time:.1f}\n")
+
+
+def bench_scan_index(file_count: int):
+    """Benchmark: premier scan vs rescan incrémental d'une arborescence inchangée"""
+    print("=" * 70)
+    print(f"BENCHMARK: index de scan incrémental ({file_count:,} fichiers)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_synthetic_tree(Path(tmp) / "tree", file_count)
+        db = Path(tmp) / "index.db"
+        targets = {"temp_files": [(root, '*')]}
+
+        cold, cold_time = timed(ScanIndex(db).scan_categories, targets)
+        index = ScanIndex(db)
+        warm, warm_time = timed(index.scan_categories, targets)
+
+        assert cold["temp_files"].size == warm["temp_files"].size
+        print(f"Premier scan : {cold_time:.2f}s")
+        print(f"Rescan       : {warm_time:.3f}s ({index.hits} dossiers réutilisés)")
+        print(f"Accélération : x{cold_time / warm_time:.0f}\n")
+
+
+def bench_delete_job(file_count: int):
+    """Benchmark: coût du journal d'une suppression reprenable"""
+    print("=" * 70)
+    print(f"BENCHMARK: suppression avec points de contrôle ({file_count:,} fichiers)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_root = make_synthetic_tree(Path(tmp) / "plain", file_count)
+        job_root = make_synthetic_tree(Path(tmp) / "job", file_count)
+
+        plain, plain_time = timed(delete_contents, plain_root)
+        events = []
+        job = DeleteJob(job_root, journal_path=Path(tmp) / "job.jsonl", on_progress=events.append)
+        report, job_time = timed(job.run)
+
+        assert plain.freed == report.freed
+        print(f"sans journal : {plain_time:.2f}s")
+        print(f"avec journal : {job_time:.2f}s "
+              f"({events[-1].files_per_second:,.0f} fichiers/s, {events[-1].mb_per_second:.1f} Mo/s)")
+        print(f"Surcoût      : {(job_time / plain_time - 1) * 100:+.0f}%\n")
+
+
+def bench_background_clean(file_count: int, workers: int = 4):
+    """Benchmark: nettoyage au premier plan vs mode arrière-plan limité"""
+    # Plafond volontairement bas pour que l'effet soit mesurable
+    cap = max(file_count // 10, 100)
+    print("=" * 70)
+    print(f"BENCHMARK: mode arrière-plan ({file_count:,} fichiers, plafond {cap:,} fichiers/s)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fast_root = make_synthetic_tree(Path(tmp) / "foreground", file_count)
+        slow_root = make_synthetic_tree(Path(tmp) / "background", file_count)
+
+        throttle = IOThrottle(files_per_second=cap)
+        fast, fast_time = timed(CleanScheduler(workers).run, {"temp": [(fast_root, '*')]})
+        slow, slow_time = timed(CleanScheduler(workers, throttle).run, {"temp": [(slow_root, '*')]})
+
+        assert fast["temp"].files == slow["temp"].files == file_count
+        print(f"premier plan : {fast_time:.2f}s ({file_count / fast_time:,.0f} fichiers/s)")
+        print(f"arrière-plan : {slow_time:.2f}s ({file_count / slow_time:,.0f} fichiers/s, "
+              f"{throttle.waited:.1f}s de pause)\n")
+
+
+def synthetic_size_tree(entry_count: int, files_per_dir: int = 100) -> SizeTree:
+    """Construit en mémoire un arbre de tailles de entry_count entrées"""
+    tree = SizeTree("C:\\")
+    listing = [(f"dir_{i:05d}", FLAG_DIR, 0, 0) for i in range(files_per_dir // 10)]
+    listing += [(f"file_{i:05d}.dat", 0, 4096 + i, 1_600_000_000 + i * 86400)
+                for i in range(files_per_dir)]
+    pending = deque([0])
+    while pending and len(tree) + len(listing) <= entry_count:
+        index = pending.popleft()
+        first = tree.add_children(index, listing)
+        pending.extend(range(first, first + files_per_dir // 10))
+    tree.aggregate()
+    return tree
+
+
+def bench_analyzer(file_count: int, workers: int = 8):
+    """Benchmark: analyse parallèle et empreinte mémoire de l'arbre des tailles"""
+    print("=" * 70)
+    print(f"BENCHMARK: analyse de l'espace disque ({file_count:,} fichiers)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_synthetic_tree(Path(tmp), file_count)
+        scan_path(root)
+        (size, count), walk_time = timed(scan_path, root)
+        tree, tree_time = timed(analyze_tree, root, workers)
+
+        assert (tree.size[0], tree.count[0]) == (size, count)
+        print(f"scan séquentiel     : {walk_time:.2f}s")
+        print(f"analyse ({workers} threads) : {tree_time:.2f}s ({len(tree):,} entrées)")
+
+    for entries in (1_000_000, 5_000_000):
+        tree, build_time = timed(synthetic_size_tree, entries)
+        print(f"{len(tree):>10,} entrées : {tree.memory_usage() / 1024 ** 2:6.1f} Mo "
+              f"({tree.memory_usage() / len(tree):.0f} octets/entrée, construit en {build_time:.1f}s)")
+        del tree
+    print()
+
+
+def bench_catalog(file_count: int):
+    """Benchmark: analyse à froid vs rafraîchissement depuis le catalogue"""
+    print("=" * 70)
+    print(f"BENCHMARK: catalogue de fichiers ({file_count:,} fichiers)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_synthetic_tree(Path(tmp) / "tree", file_count)
+        db = Path(tmp) / "catalog.db"
+
+        cold, cold_time = timed(FileCatalog(db).analyze, root)
+        catalog, load_time = timed(FileCatalog, db)
+        warm, warm_time = timed(catalog.analyze, root)
+
+        assert (cold.size[0], cold.count[0]) == (warm.size[0], warm.count[0])
+        print(f"Analyse à froid    : {cold_time:.2f}s")
+        print(f"Chargement         : {load_time:.3f}s")
+        print(f"Rafraîchissement   : {warm_time:.3f}s ({catalog.hits} dossiers réutilisés, "
+              f"{catalog.misses} relus)")
+        print(f"Accélération       : x{cold_time / warm_time:.0f}\n")
+
+
+def bench_snapshot(entry_count: int):
+    """Benchmark: instantané en colonnes et diff linéaire de deux instantanés"""
+    print("=" * 70)
+    print(f"BENCHMARK: instantanés d'espace disque ({entry_count:,} entrées)")
+    print("=" * 70)
+
+    tree = synthetic_size_tree(entry_count)
+    old, snapshot_time = timed(DiskSnapshot.from_tree, tree, 1000.0)
+    data, pack_time = timed(old.to_bytes)
+    new, load_time = timed(DiskSnapshot.from_bytes, data)
+    new.taken_at = 2000.0
+    # Un dossier sur cent grossit
+    for index in range(0, len(new), 100):
+        new.size[index] += index
+    diff, diff_time = timed(diff_snapshots, old, new)
+
+    assert diff.grown and diff.changed == len(range(0, len(new), 100)) - 1
+    print(f"Instantané          : {snapshot_time:.2f}s ({len(old):,} dossiers)")
+    print(f"Sérialisation       : {pack_time:.2f}s ({len(data) / 1024 ** 2:.1f} Mo compressés, "
+          f"{len(data) / len(old):.1f} octets/dossier)")
+    print(f"Chargement          : {load_time:.2f}s")
+    print(f"Diff                : {diff_time:.2f}s ({len(old) / diff_time:,.0f} dossiers/s)\n")
+
+
+def bench_treemap(entry_count: int, width: int = 1600, height: int = 900):
+    """Benchmark: calcul de la treemap d'un grand arbre de tailles"""
+    print("=" * 70)
+    print(f"BENCHMARK: treemap {width}x{height} ({entry_count:,} entrées)")
+    print("=" * 70)
+
+    tree = synthetic_size_tree(entry_count)
+    for depth in (2, 4, 8):
+        rects, layout_time = timed(layout_treemap, tree, width, height, max_depth=depth)
+        print(f"profondeur {depth} : {layout_time * 1000:7.1f} ms, {len(rects):,} rectangles")
+    print()
+
+
+def bench_histogram(file_count: int, workers: int = 8):
+    """Benchmark: histogrammes pendant l'analyse et depuis un arbre en mémoire"""
+    print("=" * 70)
+    print(f"BENCHMARK: histogrammes extension/âge/taille ({file_count:,} fichiers)")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_synthetic_tree(Path(tmp), file_count)
+        analyze_tree(root, workers)
+        _, plain_time = timed(analyze_tree, root, workers)
+        histogram = DiskHistogram()
+        _, collect_time = timed(analyze_tree, root, workers, collectors=[histogram.add_listing])
+        assert histogram.total_files() == file_count
+        print(f"analyse seule         : {plain_time:.2f}s")
+        print(f"analyse + histogramme : {collect_time:.2f}s "
+              f"(+{(collect_time / plain_time - 1) * 100:.0f}%)")
+
+    tree = synthetic_size_tree(file_count * 10)
+    histogram = DiskHistogram()
+    _, tree_time = timed(histogram.add_tree, tree)
+    print(f"depuis l'arbre        : {tree_time:.2f}s ({histogram.total_files():,} fichiers, "
+          f"{histogram.total_files() / tree_time:,.0f} fichiers/s)\n")
+
+
+def bench_dedup(file_count: int, file_size: int = 16 * 1024, workers: int = 4):
+    """Benchmark: remplacement des doublons par des liens physiques et quarantaine"""
+    print("=" * 70)
+    print(f"BENCHMARK: dédoublonnage ({file_count:,} doublons de {file_size // 1024} Ko)")
+    print("=" * 70)
+
+    for mode in (DEDUP_HARDLINK, DEDUP_QUARANTINE):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "data"
+            # Paires de copies : chaque doublon est comparé à son original
+            for i in range(file_count):
+                folder = root / f"d{i // 500:04d}"
+                folder.mkdir(parents=True, exist_ok=True)
+                data = i.to_bytes(8, 'little') * (file_size // 8)
+                (folder / f"{i}.a").write_bytes(data)
+                (folder / f"{i}.b").write_bytes(data)
+            duplicates = find_duplicates([root], workers=workers)
+            job = DedupJob(mode, BackupManager(str(Path(tmp) / "backups")), workers=workers)
+            report, run_time = timed(job.run, duplicates)
+            assert report.files == file_count, report
+            undone, undo_time = timed(undo_dedup, job.journal_path, workers)
+            assert undone.files == file_count, undone
+            print(f"{mode:<11}: {run_time:.2f}s ({report.files / run_time:,.0f} fichiers/s), "
+                  f"annulation {undo_time:.2f}s")
+    print()
+
+
+def bench_shell_pool(calls: int = 200):
+    """Benchmark: un processus par script vs sessions shell persistantes"""
+    # PowerShell si disponible (le cas réel), sinon sh
+    powershell = shutil.which("powershell") or shutil.which("pwsh")
+    if powershell:
+        session = [powershell] + POWERSHELL_SESSION[1:]
+        framer = frame_powershell
+        script = "Write-Output ready; [Console]::Error.WriteLine('done')"
+        spawn = [powershell, "-NoProfile", "-NonInteractive", "-Command", script]
+    else:
+        session = ["sh"]
+        framer = frame_sh
+        script = "echo ready; echo done >&2"
+        spawn = ["sh", "-c", script]
+
+    print("=" * 70)
+    print(f"BENCHMARK: sessions shell persistantes ({calls} scripts, {session[0]})")
+    print("=" * 70)
+
+    def spawned():
+        for _ in range(calls):
+            subprocess.run(spawn, capture_output=True, text=True)
+
+    pool = ShellPool(session, framer, size=2)
+
+    def pooled():
+        for _ in range(calls):
+            assert pool.run(script) == (0, "ready\n", "done\n")
+
+    _, spawn_time = timed(spawned)
+    _, pool_time = timed(pooled)
+    pool.close()
+    print(f"Un processus par script : {spawn_time:.2f}s ({spawn_time / calls * 1000:.1f} ms/script)")
+    print(f"Sessions persistantes   : {pool_time:.2f}s ({pool_time / calls * 1000:.1f} ms/script)")
+    print(f"Accélération            : x{spawn_time / pool_time:.1f}\n")
+
+
+def legacy_command_check(command):
+    """
+    Ancienne vérification de run_command (listes reconstruites à chaque appel)
+
+    Renvoie le même verdict que la politique ('block', 'warn' ou 'allow').
+    Les motifs PowerShell, vérifiés à part par run_powershell, sont inclus :
+    la politique les applique aussi à chaque commande.
+    """
+    dangerous_commands = [
+        'format', 'del /f /s /q c:\\', 'rd /s /q c:\\', 'reg delete hklm',
+        'diskpart', 'bcdedit /delete',
+        'remove-item -recurse c:\\', 'format-volume', 'clear-disk', 'remove-partition',
+    ]
+    command_str = ' '.join(command).lower()
+    for dangerous in dangerous_commands:
+        if dangerous in command_str:
+            return 'block'
+    exe = command[0].lower()
+    allowed_exes = [
+        'powershell', 'cmd', 'powercfg', 'sc', 'schtasks',
+        'netsh', 'reg', 'wmic', 'ipconfig', 'sfc', 'dism',
+        'chkdsk', 'cleanmgr', 'defrag', 'taskkill', 'tasklist',
+        'vssadmin', 'fsutil', 'compact', 'nvidia-settings',
+        'radeonsettings.exe', 'net', 'del', 'ren', 'start'
+    ]
+    exe_name = exe.split('\\')[-1].replace('.exe', '')
+    if exe_name not in allowed_exes and '\\' not in exe:
+        if not any(allowed in exe_name for allowed in allowed_exes):
+            return 'warn'
+    return 'allow'
+
+
+def bench_policy(calls: int = 200000):
+    """Benchmark: coût de la vérification d'une commande, ancien code vs politique compilée"""
+    print("=" * 70)
+    print(f"BENCHMARK: politique de commandes ({calls:,} vérifications)")
+    print("=" * 70)
+
+    corpus = [
+        ['netsh', 'int', 'tcp', 'set', 'global', 'autotuninglevel=normal'],
+        ['sc', 'query', 'wuauserv'],
+        ['powercfg', '-setactive', '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'],
+        ['python.exe', '-V'],
+        ['powershell', '-Command', 'Get-NetAdapter | Select-Object -ExpandProperty InterfaceGuid'],
+        ['reg', 'delete', 'HKLM\\SOFTWARE\\Foo', '/f'],
+    ]
+    rounds = calls // len(corpus)
+
+    def legacy():
+        for _ in range(rounds):
+            for command in corpus:
+                legacy_command_check(command)
+
+    def compiled():
+        check = DEFAULT_POLICY.check
+        for _ in range(rounds):
+            for command in corpus:
+                check(command)
+
+    def unmemoized():
+        check = CommandPolicy(cache_size=0).check
+        for _ in range(rounds):
+            for command in corpus:
+                check(command)
+
+    for command in corpus:
+        assert legacy_command_check(command) == DEFAULT_POLICY.check(command).action, command
+
+    _, legacy_time = timed(legacy)
+    _, first_time = timed(unmemoized)
+    _, policy_time = timed(compiled)
+    done = rounds * len(corpus)
+    print(f"Ancienne vérification : {legacy_time / done * 1e6:.2f} µs/commande")
+    print(f"Première vérification : {first_time / done * 1e6:.2f} µs/commande")
+    print(f"Décision mémorisée    : {policy_time / done * 1e6:.2f} µs/commande")
+    # La première vérification coûte autant que l'ancienne : le gain vient du mémo
+    print(f"Accélération          : x{legacy_time / first_time:.1f} (première), "
+          f"x{legacy_time / policy_time:.1f} (mémorisée)\n")
+
+
+BENCHMARKS = {
+    "scan": lambda args: bench_scan(args.files),
+    "delete": lambda args: bench_delete(args.files),
+    "parallel": lambda args: bench_parallel_clean(args.files),
+    "index": lambda args: bench_scan_index(args.files),
+    "job": lambda args: bench_delete_job(args.files),
+    "background": lambda args: bench_background_clean(args.files),
+    "analyzer": lambda args: bench_analyzer(args.files),
+    "catalog": lambda args: bench_catalog(args.files),
+    "snapshot": lambda args: bench_snapshot(args.files * 10),
+    "treemap": lambda args: bench_treemap(args.files * 10),
+    "histogram": lambda args: bench_histogram(args.files),
+    "dedup": lambda args: bench_dedup(args.files),
+    "shell": lambda args: bench_shell_pool(),
+    "policy": lambda args: bench_policy(),
+}
+
+
+def main():
+    """Lance les benchmarks demandés"""
+    parser = argparse.ArgumentParser(description="Benchmarks OptiWindows")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"Benchmarks à lancer parmi {', '.join(BENCHMARKS)} (tous par défaut)")
+    parser.add_argument("--files", type=int, default=500_000,
+                        help="Nombre de fichiers des arborescences synthétiques")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmark inconnu: {', '.join(unknown)}")
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name](args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Tests de l'exécution asynchrone des commandes
+Vérifie l'ordre des résultats, la limite de concurrence, les délais,
+l'annulation et la lecture ligne par ligne
+"""
+
+import unittest
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import safe_commands
+from utils.safe_commands import (
+    MAX_CONCURRENT_COMMANDS, gather_commands, run_command_async, run_commands,
+    set_command_concurrency
+)
+
+
+def python(code):
+    """Commande exécutant du code Python (disponible sur toutes les plateformes)"""
+    return [sys.executable, '-c', code]
+
+
+def sleeper(seconds, text=""):
+    return python(f"import time; time.sleep({seconds}); print({text!r})")
+
+
+class TestAsyncCommands(unittest.TestCase):
+    """Tests pour run_command_async et gather_commands"""
+
+    def tearDown(self):
+        set_command_concurrency(MAX_CONCURRENT_COMMANDS)
+        self.assertEqual(safe_commands._slots.running, 0)
+
+    def test_results_in_order(self):
+        """Les résultats suivent l'ordre des commandes, pas l'ordre de fin"""
+        results = run_commands([sleeper(0.3, "slow"), sleeper(0, "fast"),
+                                python("import sys; sys.exit(3)")])
+        self.assertEqual([r.stdout for r in results], ["slow\n", "fast\n", ""])
+        self.assertEqual([r.returncode for r in results], [0, 0, 3])
+
+    def test_concurrency_limit(self):
+        """Pas plus de commandes simultanées que la limite globale"""
+        set_command_concurrency(2)
+        start = time.monotonic()
+        run_commands([sleeper(0.4)] * 4)
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.8)
+        self.assertLess(elapsed, 1.5)
+
+    def test_raised_limit_wakes_waiters(self):
+        """Relever la limite démarre aussitôt les commandes en attente"""
+        set_command_concurrency(1)
+        threading.Timer(0.2, set_command_concurrency, args=(4,)).start()
+        start = time.monotonic()
+        run_commands([sleeper(1)] * 3)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_streaming(self):
+        """Les lignes arrivent pendant l'exécution, chaque flux séparément"""
+        seen = []
+        code = ("import sys, time\n"
+                "for i in range(3):\n"
+                "    print(f'line {i}', flush=True); time.sleep(0.1)\n"
+                "print('warning', file=sys.stderr)")
+        start = time.monotonic()
+        results = run_commands([python(code)],
+                               on_line=lambda i, stream, line: seen.append(
+                                   (i, stream, line, time.monotonic() - start)))
+        self.assertEqual([(s, line) for _, s, line, _ in seen],
+                         [("stdout", "line 0"), ("stdout", "line 1"), ("stdout", "line 2"),
+                          ("stderr", "warning")])
+        # La première ligne est reçue avant la fin de la commande
+        self.assertLess(seen[0][3], seen[2][3])
+        self.assertEqual(results[0].stdout, "line 0\nline 1\nline 2\n")
+
+    def test_timeout(self):
+        """Une commande trop longue est tuée et renvoie None"""
+        start = time.monotonic()
+        results = run_commands([sleeper(10), sleeper(0, "ok")], timeout=0.5)
+        self.assertIsNone(results[0])
+        self.assertEqual(results[1].stdout, "ok\n")
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_task_cancellation(self):
+        """Annuler la tâche tue le processus et libère sa place"""
+        async def scenario():
+            task = asyncio.ensure_future(run_command_async(sleeper(10)))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        start = time.monotonic()
+        asyncio.run(scenario())
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_cancel_event(self):
+        """Un événement d'annulation arrête les commandes en cours et en attente"""
+        set_command_concurrency(1)
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        start = time.monotonic()
+        results = run_commands([sleeper(10), sleeper(10)], cancel=cancel)
+        self.assertEqual(results, [None, None])
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_shell_quoting(self):
+        """Avec shell=True, un argument contenant des espaces reste entier"""
+        command = python("import sys; print(sys.argv[1:])") + ['two words']
+        result = asyncio.run(run_command_async(command, shell=True))
+        self.assertEqual(result.stdout, "['two words']\n")
+
+    def test_blocked_command(self):
+        """Les commandes interdites restent bloquées"""
+        results = asyncio.run(gather_commands([['format', 'c:', '/q']]))
+        self.assertEqual(results, [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests des filtres de nettoyage
+Vérifie la compilation des règles et leur application pendant le parcours
+"""
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.clean_filters import (
+    compile_filter, compile_category_filters, FilterSyntaxError
+)
+from utils.fs_scanner import scan_categories
+from utils.clean_scheduler import CleanScheduler
+from utils.scan_index import ScanIndex
+from tests.test_fs_scanner import make_tree
+
+NOW = 1_700_000_000.0
+DAY = 86400
+
+
+class FakeStat:
+    """Résultat de stat minimal"""
+
+    def __init__(self, size=0, age_days=0.0):
+        self.st_size = size
+        self.st_mtime = NOW - age_days * DAY
+
+
+class TestCompileFilter(unittest.TestCase):
+    """Tests pour le langage de règles"""
+
+    def test_age(self):
+        """Test règle d'âge"""
+        predicate = compile_filter("age > 7d", now=NOW)
+        self.assertTrue(predicate("x", FakeStat(age_days=8)))
+        self.assertFalse(predicate("x", FakeStat(age_days=6)))
+
+    def test_size(self):
+        """Test règle de taille"""
+        predicate = compile_filter(["size >= 10MB"], now=NOW)
+        self.assertTrue(predicate("x", FakeStat(size=10 * 1024 ** 2)))
+        self.assertFalse(predicate("x", FakeStat(size=1024)))
+
+    def test_name(self):
+        """Test règle de nom"""
+        predicate = compile_filter("name != thumbcache_*", now=NOW)
+        self.assertTrue(predicate(os.path.join("d", "iconcache.db"), FakeStat()))
+        self.assertFalse(predicate(os.path.join("d", "thumbcache_32.db"), FakeStat()))
+
+    def test_unlocked(self):
+        """Test exclusion des fichiers ouverts"""
+        locked = {os.path.normcase(os.path.join("d", "busy.log"))}
+        predicate = compile_filter("unlocked", locked=locked)
+        self.assertFalse(predicate(os.path.join("d", "busy.log"), FakeStat()))
+        self.assertTrue(predicate(os.path.join("d", "idle.log"), FakeStat()))
+
+    def test_combined(self):
+        """Test combinaison des règles en un seul prédicat"""
+        predicate = compile_filter(["age > 1w and size > 1KB", "name = *.log"], now=NOW)
+        self.assertTrue(predicate("a.log", FakeStat(size=2048, age_days=10)))
+        self.assertFalse(predicate("a.tmp", FakeStat(size=2048, age_days=10)))
+        self.assertFalse(predicate("a.log", FakeStat(size=10, age_days=10)))
+
+    def test_empty(self):
+        """Test absence de règles"""
+        self.assertIsNone(compile_filter(None))
+        self.assertIsNone(compile_filter([]))
+
+    def test_invalid(self):
+        """Test règles invalides"""
+        for rule in ("age > 7 years", "size ~ 3", "__import__('os')", "size > 1; x"):
+            with self.assertRaises(FilterSyntaxError):
+                compile_filter(rule)
+
+    def test_category_filters_invalid_match_nothing(self):
+        """Test qu'une catégorie invalide ne retient aucun fichier et est signalée"""
+        errors = {}
+        filters = compile_category_filters({"temp_files": "age > 1d", "bad": "nope", "none": []},
+                                           errors=errors)
+        self.assertEqual(sorted(filters), ["bad", "temp_files"])
+        self.assertFalse(filters["bad"]("x.tmp", FakeStat(size=1, age_days=30)))
+        self.assertEqual(list(errors), ["bad"])
+
+
+class TestFiltersInWalkers(unittest.TestCase):
+    """Tests pour l'application des filtres au scan et au nettoyage"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "Temp"
+        make_tree(self.root, {"old.tmp": 10, "sub/old2.tmp": 20, "new.tmp": 30, "sub/new2.tmp": 40})
+        old = time.time() - 10 * DAY
+        for name in ("old.tmp", "sub/old2.tmp"):
+            os.utime(self.root / name, (old, old))
+        self.targets = {"temp_files": [(self.root, "*")]}
+        self.filters = compile_category_filters({"temp_files": ["age > 7d"]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan(self):
+        """Test scan filtré"""
+        result = scan_categories(self.targets, filters=self.filters)["temp_files"]
+        self.assertEqual((result.size, result.count), (30, 2))
+
+    def test_scan_index(self):
+        """Test scan incrémental filtré"""
+        index = ScanIndex(Path(self.tmp.name) / "index.db")
+        result = index.scan_categories(self.targets, filters=self.filters)["temp_files"]
+        self.assertEqual((result.size, result.count), (30, 2))
+
+    def test_clean(self):
+        """Test nettoyage filtré"""
+        results = CleanScheduler().run(self.targets, filters=self.filters)
+        self.assertEqual(results["temp_files"].freed, 30)
+        self.assertTrue((self.root / "new.tmp").exists())
+        self.assertTrue((self.root / "sub" / "new2.tmp").exists())
+        self.assertFalse((self.root / "sub" / "old2.tmp").exists())
+
+    def test_clean_invalid_deletes_nothing(self):
+        """Test qu'une règle invalide ne supprime aucun fichier"""
+        filters = compile_category_filters({"temp_files": ["age > 7 years"]})
+        results = CleanScheduler().run(self.targets, filters=filters)
+        self.assertEqual(results["temp_files"].freed, 0)
+        for name in ("old.tmp", "sub/old2.tmp", "new.tmp", "sub/new2.tmp"):
+            self.assertTrue((self.root / name).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
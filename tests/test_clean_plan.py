@@ -0,0 +1,119 @@
+"""
+Tests des plans de nettoyage
+Vérifie le calcul, la sérialisation et l'exécution vérifiée d'un plan
+"""
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.clean_plan import CleanPlan, build_plan
+from utils.clean_scheduler import CleanScheduler
+from utils.fs_scanner import scan_categories
+from tests.test_fs_scanner import make_tree
+
+
+class TestCleanPlan(unittest.TestCase):
+    """Tests pour les plans de nettoyage"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "Temp/a.tmp": 10,
+            "Temp/sub/b.tmp": 20,
+            "Temp/sub/deep/c.tmp": 30,
+            "Logs/d.log": 40,
+            "Logs/keep.txt": 50,
+        })
+        self.targets = {
+            "temp_files": [(self.root / "Temp", "*")],
+            "log_files": [(self.root / "Logs", "*.log")],
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_plan_matches_scan(self):
+        """Test totaux du plan identiques au scan"""
+        plan = build_plan(self.targets)
+        scanned = scan_categories(self.targets)
+        for category, result in plan.totals().items():
+            self.assertEqual((result.size, result.count),
+                             (scanned[category].size, scanned[category].count))
+        self.assertEqual(plan.total_size, 100)
+        self.assertEqual(len(plan.categories["temp_files"].dirs), 2)
+
+    def test_round_trip(self):
+        """Test sauvegarde et rechargement JSON"""
+        plan = build_plan(self.targets, categories=["temp_files"])
+        path = self.root / "plan.json"
+        self.assertTrue(plan.save(path))
+        loaded = CleanPlan.load(path)
+        self.assertEqual(loaded.to_dict(), plan.to_dict())
+        self.assertTrue(loaded.matches(["temp_files"]))
+        self.assertFalse(loaded.matches(["temp_files", "log_files"]))
+
+    def test_execute_without_rescan(self):
+        """Test exécution du plan et suppression des dossiers"""
+        plan = build_plan(self.targets)
+        results = CleanScheduler(2).run_plan(plan, actions={"recycle_bin": lambda: 1})
+        self.assertEqual(results["temp_files"].freed, 60)
+        self.assertEqual(results["log_files"].freed, 40)
+        self.assertEqual(results["recycle_bin"].freed, 1)
+        self.assertEqual(list((self.root / "Temp").iterdir()), [])
+        self.assertTrue((self.root / "Logs" / "keep.txt").exists())
+
+    def test_changed_entries_skipped(self):
+        """Test que les fichiers modifiés ou ajoutés depuis le plan sont conservés"""
+        plan = build_plan(self.targets)
+        (self.root / "Temp" / "sub" / "b.tmp").write_bytes(b"y" * 25)
+        (self.root / "Temp" / "sub" / "new.tmp").write_bytes(b"z")
+        (self.root / "Temp" / "a.tmp").unlink()
+
+        results = CleanScheduler().run_plan(plan)
+        self.assertEqual(results["temp_files"].freed, 30)
+        self.assertEqual(results["temp_files"].changed, 2)
+        self.assertTrue((self.root / "Temp" / "sub" / "b.tmp").exists())
+        self.assertTrue((self.root / "Temp" / "sub" / "new.tmp").exists())
+        self.assertFalse((self.root / "Temp" / "sub" / "deep").exists())
+
+    def test_binaries_only_guarded_at_top_level(self):
+        """Test que seuls les binaires du premier niveau sont exclus du plan"""
+        make_tree(self.root, {"Downloads/tool.exe": 10, "Downloads/sub/setup.exe": 20})
+        plan = build_plan({"downloads": [(self.root / "Downloads", "*")]})
+        self.assertEqual([Path(f[0]).name for f in plan.categories["downloads"].files],
+                         ["setup.exe"])
+        results = CleanScheduler().run_plan(plan)
+        self.assertEqual(results["downloads"].freed, 20)
+        self.assertFalse((self.root / "Downloads" / "sub").exists())
+
+    def test_loaded_plan_rechecks_protected_paths(self):
+        """Test qu'un plan chargé ne supprime ni dossier critique ni binaire système"""
+        make_tree(self.root, {"Downloads/tool.exe": 10, "System32/drivers/x.log": 20})
+        entries = []
+        for name in ("Downloads/tool.exe", "System32/drivers/x.log", "Temp/a.tmp"):
+            st = (self.root / name).stat()
+            entries.append([str(self.root / name), st.st_size, st.st_mtime_ns])
+        plan = CleanPlan.from_dict({
+            'version': 1, 'selection': ["downloads"],
+            'categories': {"downloads": {
+                'files': entries,
+                'dirs': [str(self.root / "System32"), str(self.root / "System32" / "drivers")],
+            }},
+        })
+        self.assertFalse(plan.trusted)
+        results = CleanScheduler().run_plan(plan)
+        self.assertEqual(results["downloads"].freed, 10)
+        self.assertEqual(results["downloads"].skipped, 2)
+        self.assertTrue((self.root / "Downloads" / "tool.exe").exists())
+        self.assertTrue((self.root / "System32" / "drivers" / "x.log").exists())
+        self.assertFalse((self.root / "Temp" / "a.tmp").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
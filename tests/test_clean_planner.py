@@ -0,0 +1,94 @@
+"""
+Tests du planificateur de cibles du nettoyeur
+Vérifie la fusion des cibles qui se chevauchent
+"""
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.clean_planner import plan_targets
+from utils.fs_scanner import scan_categories
+from utils.clean_scheduler import CleanScheduler
+from tests.test_fs_scanner import make_tree
+
+
+class TestPlanner(unittest.TestCase):
+    """Tests pour la déduplication des cibles"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.explorer = self.root / "Explorer"
+        self.profiles = self.root / "Firefox" / "Profiles"
+        make_tree(self.root, {
+            "Explorer/iconcache_16.db": 10,
+            "Explorer/thumbcache_32.db": 20,
+            "Explorer/thumbcache_96.db": 30,
+            "Explorer/other.dat": 40,
+            "Firefox/Profiles/abc.default/cache2/entry": 50,
+            "Firefox/Profiles/abc.default/places.sqlite": 60,
+        })
+        self.targets = {
+            "windows_cache": [(self.explorer, "*.db")],
+            "thumbnails": [(self.explorer, "thumbcache_*.db")],
+            "browser_cache": [
+                (self.profiles, "*"),
+                (self.profiles / "abc.default" / "cache2", "*"),
+            ],
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shared_root_walked_once(self):
+        """Test qu'une racine partagée n'est parcourue qu'une fois"""
+        roots = plan_targets(self.targets)
+        paths = [Path(r.path) for r in roots]
+        self.assertEqual(sorted(paths), sorted([self.explorer, self.profiles]))
+
+        explorer = next(r for r in roots if Path(r.path) == self.explorer)
+        # Le motif le plus spécifique gagne
+        self.assertEqual(explorer.classify("thumbcache_32.db"), "thumbnails")
+        self.assertEqual(explorer.classify("iconcache_16.db"), "windows_cache")
+        self.assertIsNone(explorer.classify("other.dat"))
+
+    def test_covered_descendant_dropped(self):
+        """Test qu'une cible incluse dans une autre est ignorée"""
+        roots = plan_targets({"a": [(self.root, "*")], "b": [(self.explorer, "*.db")]})
+        self.assertEqual([Path(r.path) for r in roots], [self.root])
+
+    def test_uncovered_descendant_kept(self):
+        """Test qu'un motif parent qui ne couvre pas le sous-dossier le conserve"""
+        roots = plan_targets({"a": [(self.root, "*.log")], "b": [(self.explorer, "*.db")]})
+        self.assertEqual(sorted(Path(r.path) for r in roots), sorted([self.root, self.explorer]))
+
+    def test_duplicate_rules_merged(self):
+        """Test fusion des règles identiques"""
+        roots = plan_targets({"a": [(self.explorer, "*.db")], "b": [(self.explorer / ".", "*.db")]})
+        self.assertEqual(len(roots), 1)
+        self.assertEqual(roots[0].rules, [("a", "*.db")])
+
+    def test_scan_counts_each_file_once(self):
+        """Test absence de double comptage au scan"""
+        results = scan_categories(self.targets)
+        self.assertEqual(results["thumbnails"].size, 50)
+        self.assertEqual(results["windows_cache"].size, 10)
+        self.assertEqual(results["browser_cache"].size, 110)
+        self.assertEqual(sum(r.count for r in results.values()), 5)
+
+    def test_clean_matches_scan(self):
+        """Test que le nettoyage libère exactement ce que le scan annonce"""
+        scanned = scan_categories(self.targets)
+        cleaned = CleanScheduler(max_workers=4).run(self.targets)
+        for category, result in scanned.items():
+            self.assertEqual(cleaned[category].freed, result.size)
+        self.assertTrue((self.explorer / "other.dat").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests du planificateur de nettoyage concurrent
+Vérifie les totaux et la progression par catégorie
+"""
+
+import unittest
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.clean_scheduler import CleanScheduler, resolve_worker_count, DEFAULT_CLEAN_WORKERS
+from tests.test_fs_scanner import make_tree
+
+
+class TestCleanScheduler(unittest.TestCase):
+    """Tests pour le nettoyage multi-racines"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "Temp/a.tmp": 10,
+            "Temp/sub/b.tmp": 20,
+            "Temp2/c.tmp": 30,
+            "Cache/d.bin": 40,
+            "Logs/e.log": 50,
+            "Logs/f.txt": 60,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_totals_per_category(self):
+        """Test totaux corrects par catégorie"""
+        targets = {
+            "temp_files": [(self.root / "Temp", "*"), (self.root / "Temp2", "*")],
+            "browser_cache": [(self.root / "Cache", "*")],
+            "log_files": [(self.root / "Logs", "*.log")],
+            "missing": [(self.root / "Nope", "*")],
+        }
+        progress = []
+
+        results = CleanScheduler(max_workers=3).run(
+            targets,
+            actions={"recycle_bin": lambda: 7},
+            on_progress=lambda cat, rep, done, total: progress.append((cat, rep.freed, done, total)),
+        )
+
+        self.assertEqual(results["temp_files"].freed, 60)
+        self.assertEqual(results["browser_cache"].freed, 40)
+        self.assertEqual(results["log_files"].freed, 50)
+        self.assertEqual(results["recycle_bin"].freed, 7)
+        self.assertEqual(results["missing"].freed, 0)
+        self.assertTrue((self.root / "Logs" / "f.txt").exists())
+
+        # Chaque catégorie est signalée une fois, dans l'ordre de fin
+        self.assertEqual(sorted(p[0] for p in progress), sorted(results))
+        self.assertEqual([p[2] for p in progress], [1, 2, 3, 4, 5])
+        self.assertTrue(all(p[3] == 5 for p in progress))
+
+    def test_roots_run_concurrently(self):
+        """Test exécution parallèle des actions"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def action():
+            barrier.wait()
+            return 1
+
+        results = CleanScheduler(max_workers=2).run({}, {"a": action, "b": action})
+        self.assertEqual(results["a"].freed + results["b"].freed, 2)
+
+    def test_failing_action(self):
+        """Test qu'une action en erreur n'interrompt pas les autres"""
+        def boom():
+            raise RuntimeError("boom")
+
+        results = CleanScheduler().run({"temp": [(self.root / "Temp", "*")]}, {"bad": boom})
+        self.assertEqual(results["bad"].failed, 1)
+        self.assertEqual(results["temp"].freed, 30)
+
+    def test_worker_count(self):
+        """Test bornes du nombre de workers"""
+        self.assertEqual(resolve_worker_count(None), DEFAULT_CLEAN_WORKERS)
+        self.assertEqual(resolve_worker_count("abc"), DEFAULT_CLEAN_WORKERS)
+        self.assertEqual(resolve_worker_count(-3), 1)
+        self.assertLessEqual(resolve_worker_count(1000), 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests du cache des commandes en lecture seule
+Vérifie la durée de validité, l'invalidation par sous-système et les
+statistiques
+"""
+
+import unittest
+import sys
+import subprocess
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.safe_commands import (
+    SCOPE_ANY, CommandCache, command_scope, get_command_cache, run_command
+)
+
+
+def completed(command, stdout="out"):
+    return subprocess.CompletedProcess(command, 0, stdout, "")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCommandScope(unittest.TestCase):
+    """Tests du sous-système associé à une commande"""
+
+    def test_scopes(self):
+        self.assertEqual(command_scope(['sc', 'query', 'Spooler']), ('service', 'spooler'))
+        self.assertEqual(command_scope(['SC.EXE', 'stop', 'spooler']), ('service', 'spooler'))
+        self.assertEqual(command_scope(['sc', 'query']), ('service',))
+        self.assertEqual(command_scope(['net', 'stop', 'Spooler']), ('service', 'spooler'))
+        self.assertEqual(command_scope(['powercfg', '-list']), ('power',))
+        self.assertEqual(command_scope(['powershell', '-Command', 'Get-NetAdapter']), ('network',))
+        self.assertEqual(command_scope(['powershell', '-Command', 'Get-Date']), SCOPE_ANY)
+        self.assertEqual(command_scope(['unknown.exe']), SCOPE_ANY)
+
+
+class TestCommandCache(unittest.TestCase):
+    """Tests pour la mémoïsation à durée limitée"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = CommandCache(ttl=30, clock=self.clock)
+
+    def store(self, command, stdout="out"):
+        self.cache.put(command, completed(command, stdout), self.cache.generation())
+
+    def test_ttl(self):
+        """Un résultat est réutilisé jusqu'à expiration"""
+        query = ['powercfg', '-list']
+        self.assertIsNone(self.cache.get(query))
+        self.store(query, "plans")
+        self.clock.now = 29
+        self.assertEqual(self.cache.get(query).stdout, "plans")
+        self.clock.now = 31
+        self.assertIsNone(self.cache.get(query))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_invalidation_by_subsystem(self):
+        """'sc stop X' invalide 'sc query X' et 'sc query', pas 'sc query Y' ni powercfg"""
+        queries = [['sc', 'query', 'Spooler'], ['sc', 'query'], ['sc', 'query', 'Audiosrv'],
+                   ['powercfg', '-list']]
+        for query in queries:
+            self.store(query)
+        self.assertEqual(self.cache.invalidate(['sc', 'stop', 'spooler']), 2)
+        self.assertEqual([self.cache.get(q) is not None for q in queries],
+                         [False, False, True, True])
+
+    def test_unknown_mutation_clears_everything(self):
+        """Une commande de portée inconnue vide tout le cache"""
+        self.store(['sc', 'query', 'Spooler'])
+        self.store(['powercfg', '-list'])
+        self.assertEqual(self.cache.invalidate(['powershell', '-Command', 'Restart-Computer']), 2)
+
+    def test_query_racing_a_mutation(self):
+        """Une requête lancée avant une modification n'est pas mémorisée"""
+        query = ['sc', 'query', 'Spooler']
+        generation = self.cache.generation()
+        self.cache.invalidate(['sc', 'stop', 'Spooler'])
+        self.cache.put(query, completed(query, "RUNNING"), generation)
+        self.assertIsNone(self.cache.get(query))
+
+
+class TestRunCommandCache(unittest.TestCase):
+    """Tests de run_command(read_only=True) avec de vrais processus"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.counter = Path(self.tmp.name) / "runs"
+        get_command_cache().clear()
+
+    def tearDown(self):
+        get_command_cache().clear()
+        self.tmp.cleanup()
+
+    def test_read_only_reused_until_mutation(self):
+        """La requête n'est exécutée qu'une fois, puis de nouveau après une modification"""
+        query = [sys.executable, '-c',
+                 f"f = open({str(self.counter)!r}, 'a'); f.write('x'); f.close(); print('state')"]
+        for _ in range(3):
+            self.assertEqual(run_command(query, read_only=True).stdout, "state\n")
+        self.assertEqual(self.counter.read_text(), "x")
+
+        run_command([sys.executable, '-c', 'pass'])
+        run_command(query, read_only=True)
+        self.assertEqual(self.counter.read_text(), "xx")
+
+    def test_failed_query_not_cached(self):
+        """Une requête en échec est relancée à l'appel suivant"""
+        query = [sys.executable, '-c',
+                 f"import sys; f = open({str(self.counter)!r}, 'a'); f.write('x'); f.close(); "
+                 "sys.exit(1)"]
+        for _ in range(2):
+            self.assertEqual(run_command(query, read_only=True).returncode, 1)
+        self.assertEqual(self.counter.read_text(), "xx")
+
+
+if __name__ == '__main__':
+    unittest.main()
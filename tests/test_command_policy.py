@@ -0,0 +1,142 @@
+"""
+Tests de la politique de commandes
+Corpus de commandes autorisées, signalées et bloquées, et règles du registre
+et des services
+"""
+
+import unittest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.command_policy import (
+    ALLOW, BLOCK, DEFAULT_POLICY, SERVICE_DISABLE, SERVICE_STOP, WARN, CommandPolicy,
+    PolicyDecision, normalize_registry_key
+)
+
+# Commandes réellement utilisées par les modules : autorisées
+ALLOWED = [
+    ['ipconfig', '/flushdns'],
+    ['netsh', 'int', 'tcp', 'set', 'global', 'autotuninglevel=normal'],
+    ['powercfg', '-setactive', '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'],
+    ['powercfg', '-list'],
+    ['sc', 'query', 'wuauserv'],
+    ['net', 'stop', 'wuauserv'],
+    ['DISM', '/Online', '/Cleanup-Image', '/RestoreHealth'],
+    ['sfc', '/scannow'],
+    ['wmic', 'diskdrive', 'get', 'status'],
+    ['C:\\Windows\\System32\\chkdsk.exe', 'C:', '/scan'],
+    ['RadeonSettings.exe'],
+    ['powershell', '-Command', 'Get-NetAdapter | Select-Object -ExpandProperty InterfaceGuid'],
+    ['powershell', '-Command', 'Get-Service | Format-Table -AutoSize'],
+    ['powershell', '-OutputFormat', 'Text', '-Command', 'Get-Date'],
+    ['reg', 'delete', 'HKCU\\Software\\Example', '/f'],
+    ['reg', 'query', 'HKLM\\SOFTWARE\\Microsoft'],
+    ['cmd', '/c', 'echo formatted output'],
+]
+
+# Exécutables inconnus : exécutés mais signalés (la recherche par
+# sous-chaîne acceptait 'scary' grâce à 'sc', 'internet' grâce à 'net')
+WARNED = [
+    ['scary.exe'],
+    ['internet'],
+    ['C:\\Tools\\evil.exe', '/x'],
+    ['python', '-c', 'print(1)'],
+]
+
+# Commandes dangereuses : bloquées
+BLOCKED = [
+    (['format', 'c:', '/q'], "format"),
+    (['FORMAT.COM', 'D:'], "format"),
+    (['cmd', '/c', 'format', 'c:'], "format"),
+    (['del', '/f', '/s', '/q', 'c:\\'], "del /f /s /q c:\\"),
+    (['cmd', '/c', 'del  /F /S /Q C:\\Windows'], "del /f /s /q c:\\"),
+    (['rd', '/s', '/q', 'c:\\'], "rd /s /q c:\\"),
+    (['reg', 'delete', 'HKLM\\SOFTWARE\\Foo', '/f'], "reg delete hklm"),
+    (['reg.exe', 'delete', 'HKEY_LOCAL_MACHINE\\SOFTWARE\\Foo'], "reg delete hklm"),
+    (['diskpart'], "diskpart"),
+    (['bcdedit', '/delete', '{current}'], "bcdedit /delete"),
+    (['powershell', '-Command', 'Get-Disk 1 | Clear-Disk -RemoveData'], "clear-disk"),
+    (['powershell', '-Command', 'Format-Volume -DriveLetter D'], "format-volume"),
+    (['powershell', '-Command', 'Remove-Item -Recurse C:\\'], "remove-item -recurse c:\\"),
+    (['powershell', '-Command', 'Get-Partition | Remove-Partition'], "remove-partition"),
+]
+
+
+class TestCommandPolicy(unittest.TestCase):
+    """Tests du corpus de décisions"""
+
+    def test_allowed(self):
+        for command in ALLOWED:
+            with self.subTest(command=command):
+                self.assertEqual(DEFAULT_POLICY.check(command).action, ALLOW)
+
+    def test_warned(self):
+        for command in WARNED:
+            with self.subTest(command=command):
+                decision = DEFAULT_POLICY.check(command)
+                self.assertEqual(decision.action, WARN)
+                self.assertTrue(decision.allowed)
+
+    def test_blocked(self):
+        for command, reason in BLOCKED:
+            with self.subTest(command=command):
+                decision = DEFAULT_POLICY.check(command)
+                self.assertEqual((decision.action, decision.reason), (BLOCK, reason))
+                self.assertFalse(decision.allowed)
+
+    def test_shell_commands(self):
+        """Avec shell=True, seule la liste noire s'applique"""
+        self.assertEqual(DEFAULT_POLICY.check(['echo hello'], shell=True).action, ALLOW)
+        self.assertEqual(DEFAULT_POLICY.check(['format c:'], shell=True).action, BLOCK)
+
+    def test_powershell_scripts(self):
+        self.assertEqual(DEFAULT_POLICY.check_powershell("Get-Volume | Format-Table").action, ALLOW)
+        self.assertEqual(DEFAULT_POLICY.check_powershell("FORMAT-VOLUME -DriveLetter E").action,
+                         BLOCK)
+
+    def test_registry(self):
+        """Les clés critiques, leurs sous-clés et leurs parents ne sont pas supprimés"""
+        tcpip = 'HKLM\\SYSTEM\\CurrentControlSet\\Services\\Tcpip'
+        for key in (tcpip, tcpip + '\\Parameters', 'HKEY_LOCAL_MACHINE\\SYSTEM\\CurrentControlSet',
+                    'hklm\\system\\currentcontrolset\\services\\tcpip\\'):
+            with self.subTest(key=key):
+                self.assertEqual(DEFAULT_POLICY.check_registry('delete', key).action, BLOCK)
+        for key in (tcpip + 'ip6', 'HKLM\\SYSTEM\\CurrentControlSet\\Services\\Spooler'):
+            with self.subTest(key=key):
+                self.assertEqual(DEFAULT_POLICY.check_registry('delete', key).action, ALLOW)
+        self.assertEqual(DEFAULT_POLICY.check_registry('add', tcpip).action, ALLOW)
+        self.assertEqual(normalize_registry_key('HKEY_CURRENT_USER\\Software\\'), 'hkcu\\software')
+
+    def test_services(self):
+        """Les services critiques sont protégés quelle que soit la casse"""
+        self.assertEqual(DEFAULT_POLICY.check_service(SERVICE_STOP, 'bits').action, BLOCK)
+        self.assertEqual(DEFAULT_POLICY.check_service(SERVICE_STOP, 'wuauserv').action, BLOCK)
+        self.assertEqual(DEFAULT_POLICY.check_service(SERVICE_DISABLE, 'wuauserv').action, ALLOW)
+        self.assertEqual(DEFAULT_POLICY.check_service(SERVICE_STOP, 'SysMain').action, ALLOW)
+
+    def test_custom_policy(self):
+        """Une politique peut être construite avec d'autres règles"""
+        policy = CommandPolicy(dangerous_commands=[("shutdown", r"\bshutdown\b")],
+                               dangerous_powershell=[], allowed_executables=['shutdown'])
+        self.assertEqual(policy.check(['shutdown', '/s']), PolicyDecision(BLOCK, "shutdown"))
+        self.assertEqual(policy.check(['format', 'c:']).action, WARN)
+
+    def test_decision_cache(self):
+        """Les décisions mémorisées sont identiques et le cache reste borné"""
+        policy = CommandPolicy(cache_size=2)
+        for command in [command for command, _ in BLOCKED[:3]] + WARNED[:1]:
+            decision = policy.check(list(command))
+            self.assertIs(policy.check(list(command)), decision)
+            self.assertLessEqual(len(policy._decisions), 2)
+        # Même argv, mais via le shell : décision distincte
+        self.assertEqual(policy.check(WARNED[0], shell=True).action, ALLOW)
+        uncached = CommandPolicy(cache_size=0)
+        self.assertEqual(uncached.check(ALLOWED[0]).action, ALLOW)
+        self.assertEqual(uncached._decisions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests du dédoublonnage (liens physiques et quarantaine)
+Vérifie la comparaison octet par octet, l'enregistrement dans l'index des
+backups et l'annulation
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.backup_manager import BackupManager
+from utils.duplicates import find_duplicates
+from utils.dedup import (
+    BACKUP_TYPE, DEDUP_HARDLINK, DEDUP_QUARANTINE, DedupJob, same_contents, undo_dedup
+)
+
+DATA = b"duplicate contents " * 1000
+
+
+class TestDedup(unittest.TestCase):
+    """Tests pour le remplacement et la mise en quarantaine des doublons"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "data"
+        self.backups = BackupManager(str(Path(self.tmp.name) / "backups"))
+        self.paths = [self.write(f"dir{i}/copy.bin", DATA) for i in range(4)]
+        os.utime(self.paths[2], ns=(1_000_000_000, 1_000_000_000))
+        self.write("other.bin", b"x" * len(DATA))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel, data):
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def inodes(self):
+        return {os.stat(p).st_ino for p in self.paths}
+
+    def test_same_contents(self):
+        """La comparaison détecte une différence d'un seul octet"""
+        self.assertTrue(same_contents(self.paths[0], self.paths[1]))
+        changed = self.write("changed.bin", DATA[:-1] + b"!")
+        self.assertFalse(same_contents(self.paths[0], changed))
+        self.assertFalse(same_contents(self.paths[0], self.root / "other.bin"))
+
+    def test_hardlink_and_undo(self):
+        """Les copies deviennent des liens physiques, puis redeviennent indépendantes"""
+        duplicates = find_duplicates([self.root])
+        report = DedupJob(DEDUP_HARDLINK, self.backups, workers=2).run(duplicates)
+        self.assertEqual(report.files, 3)
+        self.assertEqual(report.reclaimed, 3 * len(DATA))
+        self.assertEqual(len(self.inodes()), 1)
+        self.assertEqual(find_duplicates([self.root]), [])
+
+        entry = self.backups.list_backups()[-1]
+        self.assertEqual(entry["type"], BACKUP_TYPE)
+        self.assertEqual(entry["files"], 3)
+        # L'index est relu depuis le disque
+        reloaded = BackupManager(str(self.backups.backup_dir))
+        self.assertTrue(reloaded.restore_dedup_backup(entry["name"]))
+        self.assertEqual(len(self.inodes()), 4)
+        for path in self.paths:
+            self.assertEqual(path.read_bytes(), DATA)
+        self.assertEqual(os.stat(self.paths[2]).st_mtime_ns, 1_000_000_000)
+
+    def test_quarantine_and_undo(self):
+        """Les copies sont déplacées en quarantaine, puis remises en place"""
+        duplicates = find_duplicates([self.root])
+        job = DedupJob(DEDUP_QUARANTINE, self.backups)
+        report = job.run(duplicates, keep=lambda d: sorted(d.paths)[-1])
+        self.assertEqual(report.files, 3)
+        self.assertEqual([p.exists() for p in self.paths], [False, False, False, True])
+        self.assertEqual(len(list(job.quarantine_dir.iterdir())), 3)
+
+        restored = undo_dedup(job.journal_path)
+        self.assertEqual(restored.files, 3)
+        for path in self.paths:
+            self.assertEqual(path.read_bytes(), DATA)
+
+    def test_changed_copy_is_kept(self):
+        """Une copie modifiée depuis la recherche n'est pas touchée"""
+        duplicates = find_duplicates([self.root])
+        self.paths[3].write_bytes(DATA[:-1] + b"!")
+        report = DedupJob(DEDUP_HARDLINK, self.backups).run(duplicates)
+        self.assertEqual(report.files, 2)
+        self.assertEqual(report.skipped, {str(self.paths[3]): "contents differ"})
+        self.assertEqual(len(self.inodes()), 2)
+
+    def test_vanished_extra_name(self):
+        """Un second nom disparu arrête la copie sans perdre le premier dans le journal"""
+        os.link(self.paths[1], self.root / "dir1" / "zlink.bin")
+        duplicates = find_duplicates([self.root])
+        (self.root / "dir1" / "zlink.bin").unlink()
+        job = DedupJob(DEDUP_HARDLINK, self.backups)
+        report = job.run(duplicates)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(len(self.inodes()), 1)
+
+        restored = undo_dedup(job.journal_path)
+        self.assertEqual(restored.files, report.files)
+        self.assertEqual(len(self.inodes()), 4)
+
+    def test_cancelled(self):
+        """Un dédoublonnage annulé avant le premier lot ne touche à rien"""
+        cancel = threading.Event()
+        cancel.set()
+        report = DedupJob(DEDUP_HARDLINK, self.backups, cancel=cancel).run(
+            find_duplicates([self.root]))
+        self.assertEqual(report.files, 0)
+        self.assertEqual(len(self.inodes()), 4)
+
+    def test_unknown_mode(self):
+        """Un mode inconnu est refusé"""
+        with self.assertRaises(ValueError):
+            DedupJob("delete", self.backups)
+
+
+if __name__ == '__main__':
+    unittest.main()
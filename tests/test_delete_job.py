@@ -0,0 +1,129 @@
+"""
+Tests des suppressions reprenables
+Vérifie le journal de points de contrôle et la reprise après interruption
+"""
+
+import unittest
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.delete_job import DeleteJob
+from utils.progress import BATCH_SIZE
+from tests.test_fs_scanner import make_tree
+
+
+class TestDeleteJob(unittest.TestCase):
+    """Tests pour les suppressions avec journal"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = Path(self.tmp.name)
+        self.root = self.base / "Windows.old"
+        self.journal = self.base / "job.jsonl"
+        make_tree(self.root, {
+            f"dir{d}/sub/f{i}.bin": 10
+            for d in range(4) for i in range(BATCH_SIZE)
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_complete_run(self):
+        """Test suppression complète et retrait du journal"""
+        events = []
+        job = DeleteJob(self.root, remove_root=True, journal_path=self.journal,
+                        on_progress=events.append)
+        report = job.run()
+        self.assertTrue(job.complete)
+        self.assertEqual(report.files, 4 * BATCH_SIZE)
+        self.assertEqual(report.freed, 40 * BATCH_SIZE)
+        self.assertFalse(self.root.exists())
+        self.assertFalse(self.journal.exists())
+        self.assertTrue(events[-1].done)
+        self.assertGreater(events[-1].files_per_second, 0)
+
+    def test_resume_after_stop(self):
+        """Test reprise avec des totaux cumulés après un arrêt"""
+        job = DeleteJob(self.root, journal_path=self.journal, interval=0)
+        job.on_progress = lambda event: job.stop()
+        job.run()
+        self.assertFalse(job.complete)
+        self.assertTrue(self.journal.exists())
+        first_files = job.report.files
+        self.assertGreater(first_files, 0)
+
+        resumed = DeleteJob(self.root, journal_path=self.journal)
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.report.files, first_files)
+        report = resumed.run()
+        self.assertTrue(resumed.complete)
+        self.assertEqual(report.files, 4 * BATCH_SIZE)
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_journaled_subtree_skipped(self):
+        """Test qu'un sous-arbre journalisé n'est pas reparcouru"""
+        with open(self.journal, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'dir': 'dir0', 'freed': 5, 'files': 1}) + '\n')
+            f.write('{"dir": "trunc')
+        report = DeleteJob(self.root, journal_path=self.journal).run()
+        self.assertEqual(report.files, 3 * BATCH_SIZE + 1)
+        self.assertTrue((self.root / "dir0" / "sub" / "f0.bin").exists())
+        self.assertFalse((self.root / "dir1").exists())
+
+    def test_budget_exhausted(self):
+        """Test arrêt immédiat si le budget de temps est nul"""
+        job = DeleteJob(self.root, journal_path=self.journal)
+        job.run(time_budget=0)
+        self.assertFalse(job.complete)
+        self.assertTrue((self.root / "dir0").exists())
+
+    def test_binaries_deleted(self):
+        """Test que les binaires de l'arbre sont supprimés (pas de garde .dll/.exe)"""
+        make_tree(self.root, {"Windows/System32/kernel32.dll": 10, "Windows/explorer.exe": 20})
+        job = DeleteJob(self.root, remove_root=True, journal_path=self.journal)
+        job.run()
+        self.assertTrue(job.complete)
+        self.assertFalse(self.root.exists())
+
+    def test_leftovers_not_complete(self):
+        """Test qu'un arbre incomplètement supprimé n'est pas terminé et sera repris"""
+        real_unlink = os.unlink
+
+        def flaky_unlink(path, *args, **kwargs):
+            if os.fspath(path).endswith("f0.bin"):
+                raise PermissionError("locked")
+            return real_unlink(path, *args, **kwargs)
+
+        job = DeleteJob(self.root, remove_root=True, journal_path=self.journal)
+        with mock.patch("utils.fs_cleaner.os.unlink", side_effect=flaky_unlink):
+            report = job.run()
+        self.assertFalse(job.complete)
+        self.assertEqual(report.failed, 4)
+        self.assertTrue(self.journal.exists())
+
+        resumed = DeleteJob(self.root, remove_root=True, journal_path=self.journal)
+        self.assertEqual(resumed.report.files, 4 * BATCH_SIZE - 4)
+        report = resumed.run()
+        self.assertTrue(resumed.complete)
+        self.assertEqual(report.files, 4 * BATCH_SIZE)
+        self.assertFalse(self.root.exists())
+        self.assertFalse(self.journal.exists())
+
+    def test_stop_before_run(self):
+        """Test qu'un arrêt demandé avant le lancement est respecté"""
+        job = DeleteJob(self.root, journal_path=self.journal)
+        job.stop()
+        job.run()
+        self.assertFalse(job.complete)
+        self.assertTrue((self.root / "dir0").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
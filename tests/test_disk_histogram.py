@@ -0,0 +1,69 @@
+"""
+Tests des histogrammes d'espace disque
+Vérifie les répartitions par extension, âge et classe de taille
+"""
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.disk_usage import analyze_tree
+from utils.disk_histogram import DAY, DiskHistogram, NO_EXTENSION
+from tests.test_fs_scanner import make_tree
+
+
+class TestDiskHistogram(unittest.TestCase):
+    """Tests pour les histogrammes collectés pendant l'analyse"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "a.MKV": 5000,
+            "b.mkv": 3000,
+            "docs/c.txt": 100,
+            "docs/README": 10,
+            "docs/.bashrc": 20,
+            "docs/empty.txt": 0,
+        })
+        self.now = time.time()
+        old = self.now - 400 * DAY
+        os.utime(self.root / "b.mkv", (old, old))
+        os.utime(self.root / "docs" / "c.txt", (self.now - 3 * DAY,) * 2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, histogram):
+        self.assertEqual(histogram.total_files(), 6)
+        self.assertEqual(histogram.total_bytes(), 8130)
+        self.assertEqual(histogram.by_extension(2), [(".mkv", 8000, 2), (".txt", 100, 2)])
+        self.assertIn((NO_EXTENSION, 30, 2), histogram.by_extension())
+        ages = dict((label, (size, files)) for label, size, files in histogram.by_age())
+        self.assertEqual(ages["< 1 day"], (5030, 4))
+        self.assertEqual(ages["< 1 week"], (100, 1))
+        self.assertEqual(ages["< 2 years"], (3000, 1))
+        sizes = dict((label, files) for label, _, files in histogram.by_size_class())
+        self.assertEqual((sizes["empty"], sizes["< 4 KB"], sizes["< 64 KB"]), (1, 4, 1))
+
+    def test_collector(self):
+        """Test histogrammes remplis pendant le parcours"""
+        histogram = DiskHistogram(self.now)
+        analyze_tree(self.root, collectors=[histogram.add_listing])
+        self.check(histogram)
+
+    def test_from_tree(self):
+        """Test mêmes histogrammes depuis un arbre déjà construit"""
+        histogram = DiskHistogram(self.now)
+        histogram.add_tree(analyze_tree(self.root))
+        self.check(histogram)
+
+
+if __name__ == '__main__':
+    unittest.main()
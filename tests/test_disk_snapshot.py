@@ -0,0 +1,110 @@
+"""
+Tests des instantanés d'espace disque
+Vérifie la sérialisation en colonnes et le diff entre deux instantanés
+"""
+
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.disk_usage import analyze_tree
+from utils.disk_snapshot import DAY, DiskSnapshot, SnapshotStore, diff_snapshots
+from tests.test_fs_scanner import make_tree
+
+
+class TestDiskSnapshot(unittest.TestCase):
+    """Tests pour les instantanés et leur comparaison"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "disk"
+        make_tree(self.root, {
+            "docs/a.txt": 100,
+            "docs/old/b.txt": 50,
+            "media/c.mkv": 1000,
+            "temp/d.tmp": 300,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def snapshot(self, taken_at):
+        return DiskSnapshot.from_tree(analyze_tree(self.root), taken_at)
+
+    def test_round_trip(self):
+        """Test sérialisation compacte et chemins relatifs triés"""
+        snapshot = self.snapshot(1000.0)
+        loaded = DiskSnapshot.from_bytes(snapshot.to_bytes())
+        self.assertEqual(loaded.root, snapshot.root)
+        self.assertEqual(loaded.taken_at, 1000.0)
+        self.assertEqual(loaded.total(), 1450)
+        self.assertEqual([loaded.path(i) for i in range(len(loaded))],
+                         ["", "docs", os.path.join("docs", "old"), "media", "temp"])
+        self.assertEqual(list(loaded.size), list(snapshot.size))
+        with self.assertRaises(ValueError):
+            DiskSnapshot.from_bytes(b"garbage")
+
+    def test_diff(self):
+        """Test dossiers en croissance, en baisse, ajoutés et supprimés"""
+        before = self.snapshot(1000.0)
+        make_tree(self.root, {"media/e.mkv": 4000, "new/f.bin": 10})
+        for name in ("temp/d.tmp", "docs/old/b.txt"):
+            os.remove(self.root / name)
+        os.rmdir(self.root / "temp")
+        after = self.snapshot(2000.0)
+
+        diff = diff_snapshots(before, after, limit=3)
+        self.assertEqual(diff.delta, 4000 + 10 - 300 - 50)
+        self.assertEqual(diff.elapsed, 1000.0)
+        self.assertEqual((diff.added, diff.removed), (1, 1))
+        self.assertEqual([(c.path, c.delta) for c in diff.grown], [
+            (str(self.root / "media"), 4000),
+            (str(self.root), 3660),
+            (str(self.root / "new"), 10),
+        ])
+        self.assertEqual([(c.path, c.delta) for c in diff.shrunk], [
+            (str(self.root / "temp"), -300),
+            (str(self.root / "docs"), -50),
+            (str(self.root / "docs" / "old"), -50),
+        ])
+        self.assertEqual(diff.shrunk[0].new_size, 0)
+
+    def test_store(self):
+        """Test stockage et instantané de référence"""
+        store = SnapshotStore(Path(self.tmp.name) / "snapshots")
+        now = float(int(time.time()))
+        for taken_at in (now - 3000, now - 2000, now - 1000):
+            store.save(self.snapshot(taken_at))
+        self.assertEqual([t for t, _ in store.list(self.root)],
+                         [now - 3000, now - 2000, now - 1000])
+        self.assertEqual(store.latest(self.root).taken_at, now - 1000)
+        self.assertEqual(store.latest(self.root, before=now - 2500).taken_at, now - 3000)
+        # Aucun instantané assez ancien: le plus ancien sert de référence
+        self.assertEqual(store.baseline(self.root, 10 ** 12).taken_at, now - 3000)
+
+    def test_retention_by_age(self):
+        """Test conservation des récents, un par jour ensuite, rien au-delà de l'âge maximal"""
+        store = SnapshotStore(Path(self.tmp.name) / "snapshots", keep_all=DAY, max_age=30 * DAY)
+        # Midi local, pour que les décalages d'heures restent dans la même journée
+        noon = time.mktime(time.localtime()[:3] + (12, 0, 0, 0, 0, -1))
+        hourly = [noon - 10 * DAY + hour * 3600 for hour in range(-3, 4)]
+        recent = [noon - hour * 3600 for hour in (3, 2, 1)]
+        for taken_at in [noon - 40 * DAY] + hourly + recent:
+            store.save(self.snapshot(taken_at))
+        store.prune(self.root, now=noon)
+        self.assertEqual([t for t, _ in store.list(self.root)], [hourly[-1]] + recent)
+        self.assertEqual(store.baseline(self.root, 7 * DAY).taken_at, hourly[-1])
+
+        # Le dernier instantané est conservé même trop ancien
+        store.prune(self.root, now=noon + 100 * DAY)
+        self.assertEqual([t for t, _ in store.list(self.root)], [recent[-1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
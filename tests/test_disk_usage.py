@@ -0,0 +1,99 @@
+"""
+Tests de l'analyseur d'espace disque
+Vérifie l'arbre des tailles en tableaux et la navigation dans les dossiers
+"""
+
+import unittest
+import sys
+import os
+import threading
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.disk_usage import SizeTree, analyze_tree, FLAG_DIR
+from tests.test_fs_scanner import make_tree
+
+
+class TestSizeTree(unittest.TestCase):
+    """Tests pour l'arbre des tailles"""
+
+    def test_manual_tree(self):
+        """Test agrégation et table de noms"""
+        tree = SizeTree("root")
+        first = tree.add_children(0, [("dir", FLAG_DIR, 0, 0), ("é.txt", 0, 5, 0)])
+        tree.add_children(first, [("a", 0, 7, 0), ("b", 0, 3, 0)])
+        tree.aggregate()
+        self.assertEqual(tree.size[0], 15)
+        self.assertEqual(tree.count[0], 3)
+        self.assertEqual(tree.name(first + 1), "é.txt")
+        self.assertEqual(list(tree.children(first)), [3, 4])
+        self.assertEqual(tree.largest_children(0), [first, first + 1])
+        self.assertEqual(tree.path(4), os.path.join("root", "dir", "b"))
+
+
+class TestAnalyzer(unittest.TestCase):
+    """Tests pour l'analyse parallèle"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "a.bin": 100,
+            "docs/b.txt": 20,
+            "docs/old/c.txt": 30,
+            "media/d.mkv": 1000,
+            "media/e.mkv": 500,
+            "empty/.keep": 0,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_totals(self):
+        """Test les tailles cumulées de chaque dossier"""
+        for workers in (1, 4):
+            tree = analyze_tree(self.root, workers=workers)
+            self.assertEqual(tree.size[0], 1650)
+            self.assertEqual(tree.count[0], 6)
+            self.assertEqual(tree.size[tree.find(self.root / "docs")], 50)
+            self.assertEqual(tree.count[tree.find(self.root / "docs" / "old")], 1)
+
+    def test_drill_down(self):
+        """Test la navigation par dossier"""
+        tree = analyze_tree(self.root)
+        names = [tree.name(i) for i in tree.largest_children(0)]
+        self.assertEqual(names, ["media", "a.bin", "docs", "empty"])
+        media = tree.find(self.root / "media")
+        self.assertEqual(tree.path(tree.largest_children(media)[0]),
+                         str(self.root / "media" / "d.mkv"))
+        with self.assertRaises(KeyError):
+            tree.find(self.root / "missing")
+
+    @unittest.skipIf(os.name == 'nt', "symlinks need privileges on Windows")
+    def test_links_not_followed(self):
+        """Test qu'un lien symbolique n'est pas parcouru"""
+        os.symlink(self.root / "media", self.root / "link")
+        tree = analyze_tree(self.root)
+        self.assertEqual(tree.size[0], 1650 + os.lstat(self.root / "link").st_size)
+        self.assertEqual(len(tree.children(tree.find(self.root / "link"))), 0)
+
+    def test_cancel(self):
+        """Test l'arrêt anticipé"""
+        cancel = threading.Event()
+        cancel.set()
+        tree = analyze_tree(self.root, cancel=cancel)
+        self.assertEqual(len(tree), 1)
+
+    def test_progress(self):
+        """Test l'événement final"""
+        events = []
+        analyze_tree(self.root, on_progress=events.append)
+        self.assertTrue(events[-1].done)
+        self.assertEqual(events[-1].files, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
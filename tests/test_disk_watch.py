@@ -0,0 +1,91 @@
+"""
+Tests des mises à jour en direct de l'analyseur d'espace disque
+Vérifie la propagation des tailles et la latence de détection sur un
+dossier temporaire
+"""
+
+import unittest
+import sys
+import os
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.disk_usage import analyze_tree
+from utils.disk_watch import LiveTree, PollingWatcher
+from tests.test_fs_scanner import make_tree
+
+# Latence maximale tolérée entre une modification et les totaux à jour
+MAX_LATENCY = 3.0
+
+
+class TestLiveTree(unittest.TestCase):
+    """Tests pour l'arbre des tailles mis à jour en direct"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "a.bin": 100,
+            "docs/b.txt": 20,
+            "docs/old/c.txt": 30,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def totals(self, live):
+        with live.lock:
+            return live.tree.size[0], live.tree.count[0]
+
+    def test_apply(self):
+        """Test propagation des tailles aux dossiers parents"""
+        live = LiveTree(analyze_tree(self.root))
+        make_tree(self.root, {"docs/old/d.txt": 500, "new/sub/e.bin": 7})
+        os.remove(self.root / "a.bin")
+        changes = live.apply([str(self.root), str(self.root / "docs" / "old")])
+
+        self.assertEqual(self.totals(live), (20 + 30 + 500 + 7, 4))
+        self.assertEqual(sorted((c.size_delta, c.count_delta) for c in changes), [(-93, 0), (500, 1)])
+        tree = live.tree
+        self.assertEqual(tree.size[tree.find(self.root / "docs")], 550)
+        self.assertEqual(tree.path(tree.find(self.root / "new" / "sub" / "e.bin")),
+                         str(self.root / "new" / "sub" / "e.bin"))
+
+        shutil.rmtree(self.root / "docs")
+        live.apply([str(self.root)])
+        self.assertEqual(self.totals(live), (7, 1))
+        # Une copie compacte donne les mêmes totaux que la nouvelle analyse
+        self.assertEqual(live.snapshot().size[0], analyze_tree(self.root).size[0])
+
+    def test_polling_latency(self):
+        """Test créations et suppressions visibles en temps borné"""
+        live = LiveTree(analyze_tree(self.root), PollingWatcher(), interval=0.05)
+        live.start()
+        try:
+            def wait_for(expected):
+                deadline = time.monotonic() + MAX_LATENCY
+                while time.monotonic() < deadline:
+                    if self.totals(live) == expected:
+                        return True
+                    time.sleep(0.01)
+                return False
+
+            make_tree(self.root, {"docs/old/new.bin": 1000})
+            self.assertTrue(wait_for((1150, 4)))
+            os.remove(self.root / "docs" / "b.txt")
+            self.assertTrue(wait_for((1130, 3)))
+            make_tree(self.root, {"added/x/y.bin": 5})
+            self.assertTrue(wait_for((1135, 4)))
+            shutil.rmtree(self.root / "added")
+            self.assertTrue(wait_for((1130, 3)))
+        finally:
+            live.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests de la recherche de doublons
+Vérifie les étapes taille, hachage partiel et complet, et les liens physiques
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.duplicates import (
+    DuplicateFinder, PARTIAL_BLOCK, find_duplicates, partial_hash, reclaimable_bytes
+)
+
+
+class TestDuplicateFinder(unittest.TestCase):
+    """Tests pour le pipeline de détection"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel, data):
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def test_small_duplicates(self):
+        """Test doublons de petite taille (hachage partiel suffisant)"""
+        self.write("a/one.txt", b"hello" * 10)
+        self.write("b/two.txt", b"hello" * 10)
+        self.write("b/other.txt", b"world" * 10)
+        self.write("empty1", b"")
+        self.write("empty2", b"")
+
+        finder = DuplicateFinder()
+        sets = finder.find([self.root])
+        self.assertEqual(len(sets), 1)
+        self.assertEqual(sets[0].reclaimable, 50)
+        self.assertEqual(finder.full_hashed, 0)
+
+    def test_large_same_ends(self):
+        """Test fichiers aux extrémités identiques mais au milieu différent"""
+        head = b"h" * PARTIAL_BLOCK
+        tail = b"t" * PARTIAL_BLOCK
+        self.write("x.bin", head + b"A" * 1000 + tail)
+        self.write("y.bin", head + b"B" * 1000 + tail)
+        self.write("z.bin", head + b"A" * 1000 + tail)
+
+        finder = DuplicateFinder(workers=2)
+        sets = finder.find([self.root])
+        self.assertEqual(finder.full_hashed, 3)
+        self.assertEqual(len(sets), 1)
+        self.assertEqual(sorted(Path(p).name for p in sets[0].paths), ["x.bin", "z.bin"])
+        self.assertEqual(reclaimable_bytes(sets), 2 * PARTIAL_BLOCK + 1000)
+
+    def test_partial_hash_covers_small_file(self):
+        """Test que le hachage partiel couvre tout le fichier sous 128 Kio"""
+        a = self.write("a", b"x" * PARTIAL_BLOCK + b"1" * 10)
+        b = self.write("b", b"x" * PARTIAL_BLOCK + b"2" * 10)
+        self.assertNotEqual(partial_hash(str(a), 10 + PARTIAL_BLOCK),
+                            partial_hash(str(b), 10 + PARTIAL_BLOCK))
+
+    def test_hard_links_not_duplicates(self):
+        """Test qu'un lien physique n'est pas compté comme doublon"""
+        original = self.write("data/file.bin", b"z" * 4096)
+        try:
+            os.link(original, self.root / "data" / "link.bin")
+        except (OSError, NotImplementedError):
+            self.skipTest("hard links not supported")
+
+        self.assertEqual(find_duplicates([self.root]), [])
+
+        self.write("copy.bin", b"z" * 4096)
+        sets = find_duplicates([self.root])
+        self.assertEqual(len(sets), 1)
+        self.assertEqual(len(sets[0].paths), 2)
+        self.assertEqual(sets[0].reclaimable, 4096)
+        self.assertEqual(sum(len(v) for v in sets[0].links.values()), 1)
+
+    def test_nested_roots_walked_once(self):
+        """Test qu'un dossier inclus dans un autre n'est pas compté deux fois"""
+        self.write("sub/a.txt", b"same")
+        self.assertEqual(find_duplicates([self.root, self.root / "sub"]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests du catalogue de fichiers persistant
+Vérifie le rafraîchissement incrémental et la réutilisation des empreintes
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.file_catalog import FileCatalog
+from utils.disk_usage import analyze_tree
+from utils.duplicates import DuplicateFinder
+from tests.test_fs_scanner import make_tree
+from tests.test_scan_index import age_directories
+
+
+class TestFileCatalog(unittest.TestCase):
+    """Tests pour le catalogue SQLite"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "data"
+        self.db = Path(self.tmp.name) / "catalog.db"
+        make_tree(self.root, {
+            "a/one.bin": 100,
+            "a/two.bin": 100,
+            "b/c/three.bin": 300,
+            "b/é.txt": 7,
+        })
+        age_directories(self.root)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_tree_reused(self):
+        """Test qu'un arbre inchangé n'est pas relu"""
+        cold = FileCatalog(self.db).analyze(self.root)
+        catalog = FileCatalog(self.db)
+        warm = catalog.analyze(self.root)
+        self.assertEqual(catalog.misses, 0)
+        self.assertEqual(catalog.hits, 4)
+        self.assertEqual((warm.size[0], warm.count[0]), (cold.size[0], cold.count[0]))
+        self.assertEqual(warm.size[warm.find(self.root / "b" / "é.txt")], 7)
+
+    def test_changed_directory_relisted(self):
+        """Test que seuls les dossiers modifiés sont relus"""
+        FileCatalog(self.db).analyze(self.root)
+        (self.root / "b" / "c" / "new.bin").write_bytes(b"n" * 50)
+        shutil.rmtree(self.root / "a")
+
+        catalog = FileCatalog(self.db)
+        tree = catalog.analyze(self.root)
+        self.assertEqual(tree.size[0], 357)
+        self.assertEqual(tree.size[0], analyze_tree(self.root).size[0])
+        self.assertEqual(catalog.misses, 2)
+        self.assertNotIn(str(self.root / "a"), FileCatalog(self.db)._listings)
+
+    def test_hashes_reused(self):
+        """Test la réutilisation des empreintes tant que taille et date sont identiques"""
+        catalog = FileCatalog(self.db)
+        first = DuplicateFinder(cache=catalog)
+        self.assertEqual(len(first.find([self.root])), 1)
+        catalog.save()
+
+        second = DuplicateFinder(cache=FileCatalog(self.db))
+        self.assertEqual(len(second.find([self.root])), 1)
+        self.assertEqual(second.reused, 2)
+
+        with open(self.root / "a" / "two.bin", "wb") as f:
+            f.write(b"y" * 100)
+        os.utime(self.root / "a" / "two.bin", ns=(1, 1))
+        third = DuplicateFinder(cache=FileCatalog(self.db))
+        self.assertEqual(third.find([self.root]), [])
+        self.assertEqual(third.reused, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
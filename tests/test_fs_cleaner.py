@@ -0,0 +1,106 @@
+"""
+Tests du moteur de suppression du nettoyeur
+Vérifie la suppression en une passe et le comptage des octets réellement libérés
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.fs_cleaner import delete_contents, delete_targets
+from tests.test_fs_scanner import make_tree
+
+
+class TestDeleteEngine(unittest.TestCase):
+    """Tests pour la suppression ascendante"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "Temp"
+        make_tree(self.root, {
+            "a.tmp": 10,
+            "b.log": 20,
+            "sub/c.tmp": 30,
+            "sub/deep/d.log": 40,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_delete_everything(self):
+        """Test suppression complète du contenu"""
+        report = delete_contents(self.root)
+        self.assertEqual(report.freed, 100)
+        self.assertEqual(report.files, 4)
+        self.assertEqual(report.dirs, 2)
+        self.assertTrue(self.root.exists())
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_pattern(self):
+        """Test suppression filtrée au premier niveau"""
+        report = delete_contents(self.root, "*.log")
+        self.assertEqual((report.freed, report.files), (20, 1))
+        self.assertTrue((self.root / "sub" / "deep" / "d.log").exists())
+
+    def test_single_file(self):
+        """Test suppression d'un fichier isolé"""
+        report = delete_contents(self.root / "a.tmp")
+        self.assertEqual(report.freed, 10)
+        self.assertFalse((self.root / "a.tmp").exists())
+
+    def test_failed_files_not_counted(self):
+        """Test que les fichiers non supprimés ne sont pas comptés"""
+        real_unlink = os.unlink
+
+        def flaky_unlink(path, *args, **kwargs):
+            if os.fspath(path).endswith("c.tmp"):
+                raise PermissionError("locked")
+            return real_unlink(path, *args, **kwargs)
+
+        with mock.patch("utils.fs_cleaner.os.unlink", side_effect=flaky_unlink):
+            report = delete_contents(self.root)
+
+        self.assertEqual(report.freed, 70)
+        self.assertEqual(report.failed, 1)
+        # Le dossier contenant le fichier verrouillé reste en place
+        self.assertTrue((self.root / "sub" / "c.tmp").exists())
+        self.assertFalse((self.root / "sub" / "deep").exists())
+
+    def test_binaries_only_guarded_at_top_level(self):
+        """Test que seuls les binaires du premier niveau sont conservés"""
+        root = Path(self.tmp.name) / "Downloads"
+        make_tree(root, {"tool.exe": 10, "sub/setup.exe": 20, "sub/lib/x.dll": 30})
+        report = delete_contents(root)
+        self.assertEqual((report.freed, report.skipped), (50, 1))
+        self.assertEqual([p.name for p in root.iterdir()], ["tool.exe"])
+
+    def test_protected_folder_blocked(self):
+        """Test blocage des dossiers critiques"""
+        report = delete_contents("C:\\Windows\\System32")
+        self.assertEqual(report.freed, 0)
+
+    @unittest.skipIf(os.name == "nt", "Liens symboliques POSIX")
+    def test_symlink_target_kept(self):
+        """Test que la cible d'un lien symbolique n'est jamais supprimée"""
+        outside = Path(self.tmp.name) / "keep"
+        make_tree(outside, {"precious.txt": 5})
+        os.symlink(outside, self.root / "link")
+        delete_contents(self.root)
+        self.assertTrue((outside / "precious.txt").exists())
+        self.assertFalse(os.path.lexists(self.root / "link"))
+
+    def test_delete_targets_per_path(self):
+        """Test rapport par chemin"""
+        reports = delete_targets([(self.root, "*.tmp"), (self.root, "*.log")])
+        self.assertEqual(list(reports), [str(self.root)])
+        self.assertEqual(reports[str(self.root)].freed, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
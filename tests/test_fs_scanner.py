@@ -0,0 +1,104 @@
+"""
+Tests du moteur de scan du nettoyeur
+Vérifie le parcours os.scandir en une passe et l'agrégation par catégorie
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.fs_scanner import (
+    iter_files, scan_path, scan_categories, is_protected_folder, format_size
+)
+
+
+def make_tree(root: Path, files: dict):
+    """Crée une arborescence {chemin relatif: taille}"""
+    for rel_path, size in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+
+
+class TestScanEngine(unittest.TestCase):
+    """Tests pour le parcours en une passe"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {
+            "a.tmp": 10,
+            "b.log": 20,
+            "sub/c.tmp": 30,
+            "sub/deep/d.log": 40,
+            "cache.db/e.bin": 50,
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan_path_counts_every_file(self):
+        """Test taille et nombre de fichiers"""
+        size, count = scan_path(self.root)
+        self.assertEqual(size, 150)
+        self.assertEqual(count, 5)
+
+    def test_pattern_applies_to_top_level(self):
+        """Test filtre glob appliqué au premier niveau seulement"""
+        self.assertEqual(scan_path(self.root, "*.log"), (20, 1))
+        # Un dossier correspondant est compté entièrement
+        self.assertEqual(scan_path(self.root, "*.db"), (50, 1))
+
+    def test_single_file(self):
+        """Test scan d'un fichier isolé"""
+        self.assertEqual(scan_path(self.root / "a.tmp"), (10, 1))
+
+    def test_missing_folder(self):
+        """Test dossier inexistant"""
+        self.assertEqual(scan_path(self.root / "missing"), (0, 0))
+
+    @unittest.skipIf(os.name == "nt", "Liens symboliques POSIX")
+    def test_symlinks_not_followed(self):
+        """Test que les liens symboliques ne sont pas suivis"""
+        os.symlink(self.root / "sub", self.root / "link")
+        names = sorted(entry.name for entry in iter_files(self.root))
+        self.assertEqual(names, ["a.tmp", "b.log", "c.tmp", "d.log", "e.bin", "link"])
+
+    def test_scan_categories(self):
+        """Test agrégation par catégorie"""
+        targets = {
+            "temp": [(self.root, "*.tmp"), (self.root / "sub", "*.tmp")],
+            "logs": [(self.root, "*.log")],
+            "missing": [(self.root / "nope", "*")],
+        }
+        results = scan_categories(targets)
+        self.assertEqual((results["temp"].size, results["temp"].count), (40, 2))
+        self.assertEqual((results["logs"].size, results["logs"].count), (20, 1))
+        self.assertEqual(results["missing"].count, 0)
+
+        only_logs = scan_categories(targets, ["logs"])
+        self.assertEqual(list(only_logs), ["logs"])
+
+
+class TestHelpers(unittest.TestCase):
+    """Tests pour les fonctions utilitaires"""
+
+    def test_protected_folder(self):
+        """Test protection des dossiers système"""
+        self.assertTrue(is_protected_folder("C:\\Windows\\System32"))
+        self.assertFalse(is_protected_folder("C:\\Windows\\System32\\Temp"))
+        self.assertFalse(is_protected_folder("C:\\Users\\me\\AppData\\Local\\Temp"))
+
+    def test_format_size(self):
+        """Test formatage des tailles"""
+        self.assertEqual(format_size(5 * 1024 * 1024), "5.00 MB")
+        self.assertEqual(format_size(3 * 1024 ** 3), "3.00 GB")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests du mode de nettoyage en arrière-plan
+Vérifie les seaux à jetons et la limitation du débit de suppression
+"""
+
+import unittest
+import sys
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.io_throttle import IOThrottle, TokenBucket, throttle_from_settings
+from utils.clean_scheduler import CleanScheduler
+from tests.test_fs_scanner import make_tree
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests pour les seaux à jetons"""
+
+    def test_debt_and_refill(self):
+        """Test la dette puis le remplissage au débit configuré"""
+        clock = [10.0]
+        with mock.patch("utils.io_throttle.time.monotonic", side_effect=lambda: clock[0]):
+            bucket = TokenBucket(100, burst=0.5)
+            self.assertEqual(bucket.take(30), 0.0)
+            self.assertAlmostEqual(bucket.take(40), 0.2)
+            clock[0] += 0.2
+            self.assertAlmostEqual(bucket.take(0), 0.0)
+
+    def test_settings(self):
+        """Test la construction depuis les paramètres"""
+        self.assertIsNone(throttle_from_settings({"clean_mode": "foreground"}))
+        throttle = throttle_from_settings({
+            "clean_mode": "background",
+            "background_files_per_second": 200,
+            "background_mb_per_second": 0,
+        })
+        self.assertEqual(throttle.files.rate, 200)
+        self.assertIsNone(throttle.bytes)
+        self.assertIsNotNone(throttle_from_settings({}, mode="background").bytes)
+
+
+class TestBackgroundCleaning(unittest.TestCase):
+    """Tests pour le nettoyage limité"""
+
+    def test_files_per_second_cap(self):
+        """Test que le débit de fichiers respecte la limite"""
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            make_tree(root, {f"d{i % 4}/f{i}.tmp": 1 for i in range(300)})
+            throttle = IOThrottle(files_per_second=1000, burst=0.05)
+
+            start = time.monotonic()
+            results = CleanScheduler(4, throttle).run({"temp_files": [(root, '*')]})
+            elapsed = time.monotonic() - start
+
+            self.assertEqual(results["temp_files"].files, 300)
+            # 300 files at 1000/s with a 50-file burst: at least 0.25s
+            self.assertGreaterEqual(elapsed, 0.2)
+            self.assertGreater(throttle.waited, 0)
+
+    def test_bytes_per_second_cap(self):
+        """Test que les sommeils couvrent la dette en octets"""
+        throttle = IOThrottle(bytes_per_second=1000, burst=0.1)
+        with mock.patch("utils.io_throttle.time.sleep") as sleep:
+            throttle.consume(1, 100)
+            sleep.assert_not_called()
+            throttle.consume(1, 500)
+            self.assertAlmostEqual(sleep.call_args[0][0], 0.5, places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests de la recherche de fichiers volumineux
+Vérifie le tas borné, les filtres et les instantanés incrémentaux
+"""
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.large_files import LargeFileFinder, find_large_files, normalize_extensions
+from utils.disk_usage import analyze_tree
+from tests.test_fs_scanner import make_tree
+
+
+class TestLargeFileFinder(unittest.TestCase):
+    """Tests pour le top-K borné"""
+
+    def test_bounded_heap(self):
+        """Test que seuls les K plus gros fichiers sont gardés"""
+        finder = LargeFileFinder(limit=3)
+        for size in [5, 1, 9, 7, 3, 8, 2]:
+            finder.add(f"f{size}", size)
+        self.assertEqual(finder.top(), [(9, "f9"), (8, "f8"), (7, "f7")])
+        self.assertEqual(len(finder._heap), 3)
+        self.assertEqual(finder.seen, 7)
+
+    def test_filters(self):
+        """Test taille minimale et extensions"""
+        finder = LargeFileFinder(limit=10, min_size=100, extensions=["ISO", ".mkv"])
+        finder.add("a.iso", 500)
+        finder.add("b.mkv", 50)
+        finder.add("c.txt", 900)
+        finder.add("d.MKV", 100)
+        self.assertEqual(finder.top(), [(500, "a.iso"), (100, "d.MKV")])
+        self.assertIsNone(normalize_extensions(["", " "]))
+
+
+class TestFindLargeFiles(unittest.TestCase):
+    """Tests pour la recherche sur disque"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {f"d{i % 5}/f{i}.bin": i * 10 for i in range(50)})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshots(self):
+        """Test les instantanés pendant le scan et le résultat final"""
+        snapshots = []
+        top = find_large_files(self.root, limit=5, on_snapshot=snapshots.append, interval=0)
+        self.assertEqual([size for size, _ in top], [490, 480, 470, 460, 450])
+        self.assertGreater(len(snapshots), 1)
+        self.assertEqual(snapshots[-1], top)
+        self.assertTrue(top[0][1].endswith("f49.bin"))
+
+    def test_analyzer_collector(self):
+        """Test l'alimentation par l'analyseur dans la même passe"""
+        finder = LargeFileFinder(limit=2)
+        analyze_tree(self.root, collectors=[finder.add_listing])
+        self.assertEqual(finder.top(), find_large_files(self.root, limit=2))
+
+    def test_from_tree(self):
+        """Test le top-K calculé depuis un arbre déjà construit"""
+        finder = LargeFileFinder(limit=3, extensions=["bin"])
+        finder.add_tree(analyze_tree(self.root))
+        self.assertEqual(finder.top(), find_large_files(self.root, limit=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
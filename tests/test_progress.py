@@ -0,0 +1,84 @@
+"""
+Tests des événements de progression
+Vérifie la limitation de fréquence et le flux du scan et du nettoyage
+"""
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.progress import ProgressThrottle, BATCH_SIZE
+from utils.fs_scanner import iter_scan
+from utils.clean_scheduler import CleanScheduler
+from tests.test_fs_scanner import make_tree
+
+
+class TestProgressThrottle(unittest.TestCase):
+    """Tests pour la limitation de fréquence"""
+
+    def test_rate_limited(self):
+        """Test qu'au plus un événement est émis par intervalle"""
+        events = []
+        clock = [100.0]
+        throttle = ProgressThrottle(events.append, interval=0.1)
+
+        with mock.patch("utils.progress.time.monotonic", side_effect=lambda: clock[0]):
+            for _ in range(50):
+                throttle.add(10, 1, "root")
+            clock[0] += 0.2
+            throttle.add(10, 1, "root")
+
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[-1].files, 51)
+        self.assertEqual(events[-1].bytes, 510)
+
+    def test_finish(self):
+        """Test l'événement final"""
+        events = []
+        throttle = ProgressThrottle(events.append, phase="clean")
+        throttle.add(5, 1)
+        throttle.finish({"x": 1})
+        self.assertTrue(events[-1].done)
+        self.assertEqual(events[-1].results, {"x": 1})
+        self.assertEqual(events[-1].phase, "clean")
+
+
+class TestStreaming(unittest.TestCase):
+    """Tests pour le flux de progression du scan et du nettoyage"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        make_tree(self.root, {f"Temp/d{i % 7}/f{i}.tmp": 3 for i in range(BATCH_SIZE * 4)})
+        self.targets = {"temp_files": [(self.root / "Temp", "*")]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_scan_events(self):
+        """Test événements intermédiaires puis résultat final"""
+        events = list(iter_scan(self.targets, interval=0))
+        self.assertGreater(len(events), 1)
+        self.assertTrue(events[-1].done)
+        self.assertTrue(all(not e.done for e in events[:-1]))
+        self.assertEqual(events[-1].files, BATCH_SIZE * 4)
+        self.assertEqual(events[-1].results["temp_files"].size, BATCH_SIZE * 12)
+        files = [e.files for e in events]
+        self.assertEqual(files, sorted(files))
+
+    def test_clean_stream(self):
+        """Test flux de progression pendant le nettoyage"""
+        events = []
+        results = CleanScheduler(2).run(self.targets, on_stream=events.append)
+        self.assertTrue(events[-1].done)
+        self.assertEqual(events[-1].bytes, results["temp_files"].freed)
+        self.assertEqual(events[-1].files, BATCH_SIZE * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
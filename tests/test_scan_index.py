@@ -0,0 +1,98 @@
+"""
+Tests de l'index de scan incrémental
+Vérifie la réutilisation des totaux et la détection des changements
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.scan_index import ScanIndex
+from utils.fs_scanner import scan_categories
+from tests.test_fs_scanner import make_tree
+
+
+def age_directories(root: Path, seconds: int = 3600):
+    """Recule le mtime des dossiers pour rendre les changements détectables"""
+    past = os.stat(root).st_mtime - seconds
+    for folder, dirs, _ in os.walk(root):
+        os.utime(folder, (past, past))
+
+
+class TestScanIndex(unittest.TestCase):
+    """Tests pour le scan incrémental"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        base = Path(self.tmp.name)
+        self.db = base / "index.db"
+        self.root = base / "Temp"
+        make_tree(self.root, {
+            "a.tmp": 10,
+            "sub/b.tmp": 20,
+            "sub/deep/c.tmp": 30,
+            "other/d.tmp": 40,
+        })
+        age_directories(self.root)
+        self.targets = {"temp_files": [(self.root, "*")]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self):
+        index = ScanIndex(self.db)
+        result = index.scan_categories(self.targets)["temp_files"]
+        return index, (result.size, result.count)
+
+    def test_matches_full_scan(self):
+        """Test résultat identique au scan complet"""
+        _, totals = self.scan()
+        expected = scan_categories(self.targets)["temp_files"]
+        self.assertEqual(totals, (expected.size, expected.count))
+
+    def test_second_scan_reuses_index(self):
+        """Test qu'un second scan ne relit aucun dossier inchangé"""
+        first, totals = self.scan()
+        self.assertEqual(first.misses, 3)
+
+        second, again = self.scan()
+        self.assertEqual(again, totals)
+        self.assertEqual(second.misses, 0)
+        self.assertEqual(second.hits, 3)
+
+    def test_nested_change_detected(self):
+        """Test détection d'un ajout et d'une suppression en profondeur"""
+        self.scan()
+        (self.root / "sub" / "deep" / "new.tmp").write_bytes(b"x" * 5)
+        (self.root / "other" / "d.tmp").unlink()
+
+        index, totals = self.scan()
+        self.assertEqual(totals, (65, 4))
+        self.assertEqual(index.misses, 2)
+
+    def test_removed_subtree_forgotten(self):
+        """Test oubli des dossiers supprimés"""
+        self.scan()
+        for path in (self.root / "sub" / "deep").iterdir():
+            path.unlink()
+        (self.root / "sub" / "deep").rmdir()
+
+        index, totals = self.scan()
+        self.assertEqual(totals, (70, 3))
+        self.assertNotIn(str(self.root / "sub" / "deep"), ScanIndex(self.db)._records)
+
+    def test_max_age_forces_refresh(self):
+        """Test rafraîchissement des entrées trop anciennes"""
+        self.scan()
+        index = ScanIndex(self.db, max_age=0)
+        index.scan_categories(self.targets)
+        self.assertEqual(index.hits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests du contrôle groupé des services
+Vérifie l'instantané unique, les transitions minimales, la concurrence
+bornée et l'attente avec délais croissants (contrôleur simulé)
+"""
+
+import unittest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.safe_commands import disable_service, start_service, stop_service
+from utils.service_control import (
+    DISABLED, MANUAL, RUNNING, STOPPED, FakeServiceController, apply_service_states,
+    plan_transitions
+)
+
+
+def gaming_services(**kwargs):
+    return FakeServiceController({
+        'wuauserv': (RUNNING, MANUAL),
+        'BITS': (STOPPED, MANUAL),
+        'Spooler': (RUNNING, 'automatic'),
+        'WSearch': (STOPPED, 'automatic'),
+        'SysMain': (RUNNING, 'automatic'),
+    }, **kwargs)
+
+
+class TestServiceControl(unittest.TestCase):
+    """Tests de apply_service_states avec FakeServiceController"""
+
+    def test_minimal_transitions(self):
+        """Seuls les services à changer reçoivent une commande"""
+        fake = gaming_services()
+        report = apply_service_states(
+            {name: STOPPED for name in ('Spooler', 'WSearch', 'SysMain', 'Missing')},
+            controller=fake)
+        self.assertEqual(sorted(fake.calls), [('stop', 'Spooler'), ('stop', 'SysMain')])
+        self.assertEqual(sorted(report.changed), ['Spooler', 'SysMain'])
+        self.assertEqual(report.unchanged, ['WSearch'])
+        self.assertEqual(report.skipped, {'Missing': "not installed"})
+        self.assertTrue(report.success)
+        # Un instantané, puis une requête d'attente pour tous les services
+        self.assertEqual(fake.queries, 2)
+        self.assertEqual(report.queries, 2)
+        self.assertEqual(fake.services['spooler'].state, STOPPED)
+
+    def test_nothing_to_do(self):
+        """Des services déjà dans l'état voulu ne coûtent qu'une requête"""
+        fake = gaming_services()
+        report = apply_service_states({'Spooler': RUNNING, 'WSearch': STOPPED}, controller=fake)
+        self.assertEqual(fake.calls, [])
+        self.assertEqual(fake.queries, 1)
+        self.assertEqual(sorted(report.unchanged), ['Spooler', 'WSearch'])
+
+    def test_protected_services(self):
+        """Les services critiques de la politique ne sont pas arrêtés"""
+        fake = gaming_services()
+        report = apply_service_states({'wuauserv': STOPPED, 'BITS': RUNNING}, controller=fake)
+        self.assertEqual(report.skipped, {'wuauserv': "critical service"})
+        self.assertEqual(fake.calls, [('start', 'BITS')])
+        self.assertEqual(report.changed, ['BITS'])
+
+    def test_bounded_concurrency(self):
+        """Les commandes partent en parallèle, sans dépasser la limite"""
+        fake = FakeServiceController({f"svc{i}": (RUNNING, MANUAL) for i in range(8)},
+                                     latency=0.05)
+        report = apply_service_states({f"svc{i}": STOPPED for i in range(8)},
+                                      controller=fake, workers=3)
+        self.assertEqual(len(report.changed), 8)
+        self.assertEqual(fake.max_active, 3)
+
+    def test_waits_with_backoff(self):
+        """L'attente interroge de moins en moins souvent jusqu'à l'état voulu"""
+        fake = gaming_services(delay=0.5)
+        report = apply_service_states({'Spooler': STOPPED, 'SysMain': STOPPED}, controller=fake)
+        self.assertEqual(sorted(report.changed), ['Spooler', 'SysMain'])
+        # 0.1 + 0.2 + 0.4 s : quatre requêtes d'attente au plus
+        self.assertLessEqual(fake.queries, 5)
+
+    def test_timeout(self):
+        """Un service encore en transition au délai est signalé en échec"""
+        fake = gaming_services(delay=10)
+        report = apply_service_states({'Spooler': STOPPED}, controller=fake, timeout=0.2)
+        self.assertEqual(report.failed, {'Spooler': "still stoppending"})
+        self.assertFalse(report.success)
+
+    def test_start_types(self):
+        """Le type de démarrage change avant un démarrage et après un arrêt"""
+        fake = FakeServiceController({'Off': (STOPPED, DISABLED), 'On': (RUNNING, MANUAL)})
+        report = apply_service_states({'Off': RUNNING, 'On': STOPPED},
+                                      start_types={'Off': MANUAL, 'On': DISABLED},
+                                      controller=fake, workers=1)
+        self.assertEqual(fake.calls, [('set_start_type', 'Off', MANUAL), ('start', 'Off'),
+                                      ('stop', 'On'), ('set_start_type', 'On', DISABLED)])
+        self.assertEqual(sorted(report.changed), ['Off', 'On'])
+        self.assertEqual(fake.services['off'].state, RUNNING)
+
+    def test_disabled_and_failing(self):
+        """Un service désactivé est ignoré, une commande refusée est un échec"""
+        fake = FakeServiceController({'Off': (STOPPED, DISABLED), 'Bad': (RUNNING, MANUAL)},
+                                     failing=['Bad'])
+        report = apply_service_states({'Off': RUNNING, 'Bad': STOPPED}, controller=fake)
+        self.assertEqual(report.skipped, {'Off': "disabled"})
+        self.assertEqual(report.failed, {'Bad': "could not stop"})
+
+    def test_plan(self):
+        """Le plan est calculé sur l'instantané, sans agir"""
+        fake = gaming_services()
+        snapshot = fake.query(['Spooler', 'WSearch'])
+        transitions = plan_transitions(snapshot, {'Spooler': STOPPED, 'WSearch': STOPPED})
+        self.assertEqual([(t.name, t.state) for t in transitions], [('Spooler', STOPPED)])
+        self.assertEqual(fake.calls, [])
+
+    def test_single_service_helpers(self):
+        """Les fonctions unitaires renvoient un booléen quand sc est absent"""
+        self.assertFalse(stop_service('Spooler'))
+        self.assertFalse(start_service('Spooler'))
+        self.assertFalse(disable_service('Spooler'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Tests des sessions shell persistantes
+Vérifie le découpage des sorties par marqueurs, les délais et la reprise
+après un plantage, avec sh et un faux interpréteur PowerShell
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.safe_commands import (
+    ShellPool, ShellSession, ShellSessionError, ShellUnavailable, _poolable_powershell,
+    frame_powershell, frame_sh, run_powershell
+)
+
+# Faux PowerShell : lit les lignes de frame_powershell, décode le script et
+# interprète quelques commandes (echo, warn, exit, sleep, crash)
+FAKE_POWERSHELL = r'''
+import base64, re, sys, time
+for line in sys.stdin:
+    script = re.search(r"FromBase64String\('([^']*)'\)", line)
+    marker = re.search(r'"`n(__OPTIWIN_END_\w+__)', line)
+    if not script or not marker:
+        continue
+    status = 0
+    for command in base64.b64decode(script.group(1)).decode('utf-8').splitlines():
+        name, _, arg = command.partition(' ')
+        if name == 'echo':
+            print(arg)
+        elif name == 'warn':
+            print(arg, file=sys.stderr)
+        elif name == 'exit':
+            status = int(arg)
+        elif name == 'sleep':
+            time.sleep(float(arg))
+        elif name == 'crash':
+            sys.exit(3)
+    print(f"\n{marker.group(1)} {status}", flush=True)
+    print(f"\n{marker.group(1)}", file=sys.stderr, flush=True)
+'''
+
+
+@unittest.skipIf(shutil.which('sh') is None, "sh requis")
+class TestShSession(unittest.TestCase):
+    """Tests d'une session avec sh comme interpréteur"""
+
+    def setUp(self):
+        self.session = ShellSession(['sh'], frame_sh)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_outputs_and_status(self):
+        """Sorties standard et d'erreur séparées par script, code de retour conservé"""
+        self.assertEqual(self.session.execute("echo hello; echo oops >&2"), (0, "hello\n", "oops\n"))
+        self.assertEqual(self.session.execute("printf 'no newline'; exit 4"), (4, "no newline", ""))
+        self.assertEqual(self.session.execute("true"), (0, "", ""))
+        self.assertTrue(self.session.alive)
+
+    def test_script_isolation(self):
+        """Les variables et les délimiteurs d'un script ne fuient pas dans la session"""
+        self.session.execute("X=1; cd /")
+        status, stdout, _ = self.session.execute("echo \"[$X]\"; pwd")
+        self.assertEqual(stdout, f"[]\n{os.getcwd()}\n")
+        tricky = "cat <<'EOF'\n__OPTIWIN_END_fake_1__ 0\nEOF"
+        self.assertEqual(self.session.execute(tricky)[1], "__OPTIWIN_END_fake_1__ 0\n")
+
+    def test_timeout_closes_session(self):
+        """Un script trop long lève TimeoutExpired et ferme la session"""
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.session.execute("sleep 5", timeout=0.3)
+        self.assertFalse(self.session.alive)
+
+    def test_crash(self):
+        """Une session tuée pendant un script lève ShellSessionError"""
+        with self.assertRaises(ShellSessionError):
+            self.session.execute("kill -9 $$")
+
+
+class TestFakePowerShell(unittest.TestCase):
+    """Tests du protocole PowerShell avec un faux interpréteur"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        fake = Path(self.tmp.name) / "fake_powershell.py"
+        fake.write_text(FAKE_POWERSHELL, encoding='utf-8')
+        self.argv = [sys.executable, str(fake)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_frame_round_trip(self):
+        """Le script encodé arrive intact, y compris les guillemets et l'unicode"""
+        pool = ShellPool(self.argv, frame_powershell, size=1)
+        try:
+            self.assertEqual(pool.run("echo it's \"quoted\" é\nwarn careful\nexit 2"),
+                             (2, "it's \"quoted\" é\n", "careful\n"))
+            self.assertEqual(pool.run("echo again"), (0, "again\n", ""))
+            self.assertEqual(pool.started, 1)
+        finally:
+            pool.close()
+
+    def test_pool_replaces_dead_sessions(self):
+        """Une session plantée est remplacée au script suivant"""
+        pool = ShellPool(self.argv, frame_powershell, size=1)
+        try:
+            with self.assertRaises(ShellSessionError):
+                pool.run("crash")
+            self.assertEqual(pool.run("echo back"), (0, "back\n", ""))
+            self.assertEqual(pool.started, 2)
+        finally:
+            pool.close()
+
+    def test_pool_bounds_sessions(self):
+        """Les scripts concurrents se partagent au plus size sessions"""
+        pool = ShellPool(self.argv, frame_powershell, size=2)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(pool.run(f"sleep 0.1\necho {i}")))
+                   for i in range(6)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sorted(r[1] for r in results), [f"{i}\n" for i in range(6)])
+            self.assertLessEqual(pool.started, 2)
+        finally:
+            pool.close()
+
+    def test_unavailable_interpreter(self):
+        """Un interpréteur introuvable lève ShellUnavailable"""
+        pool = ShellPool(["/nonexistent/powershell"], frame_powershell)
+        with self.assertRaises(ShellUnavailable):
+            pool.run("echo hi")
+
+
+class TestPowerShellCalls(unittest.TestCase):
+    """Tests du routage des appels PowerShell vers le pool"""
+
+    def test_poolable_commands(self):
+        """Seuls les appels '-Command <script>' sans autre option passent par le pool"""
+        self.assertEqual(_poolable_powershell(['powershell', '-Command', 'Get-Date']), 'Get-Date')
+        self.assertEqual(_poolable_powershell(
+            ['powershell', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', 'x']), 'x')
+        self.assertIsNone(_poolable_powershell(['powershell', '-File', 'a.ps1', '-Command', 'x']))
+        self.assertIsNone(_poolable_powershell(['powershell', '-Command', '-']))
+        self.assertIsNone(_poolable_powershell(['cmd', '/c', 'dir']))
+
+    def test_deny_list_kept(self):
+        """Les scripts dangereux restent bloqués"""
+        self.assertEqual(run_powershell("Get-Disk | Clear-Disk -RemoveData"),
+                         (False, "", "Script blocked for security"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests du calcul des tailles (apparente ou allouée sur le disque)
+Vérifie qu'un fichier creux ne compte que ses blocs écrits et que les
+caches de tailles sont vidés quand le mode change
+"""
+
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.size_accounting import (
+    SIZE_ALLOCATED, SIZE_APPARENT, allocated_size, bind_cache_accounting,
+    set_size_accounting, size_accounting_from_settings
+)
+from utils.fs_scanner import scan_path
+from utils.disk_usage import analyze_tree
+from utils.scan_index import ScanIndex
+from tests.test_fs_scanner import make_tree
+
+SPARSE_SIZE = 10 * 1024 * 1024
+
+
+class TestSizeAccounting(unittest.TestCase):
+    """Tests pour les modes de calcul des tailles"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        # Fichier creux : 10 Mo apparents, un seul bloc écrit
+        self.sparse = self.root / "sparse.bin"
+        with open(self.sparse, "wb") as f:
+            f.write(b"x")
+            f.truncate(SPARSE_SIZE)
+        make_tree(self.root, {"small.txt": 10})
+
+    def tearDown(self):
+        set_size_accounting(SIZE_APPARENT)
+        self.tmp.cleanup()
+
+    def test_sparse_file_allocated(self):
+        """Un fichier creux occupe moins que sa taille apparente"""
+        st = os.lstat(self.sparse)
+        self.assertEqual(st.st_size, SPARSE_SIZE)
+        self.assertLess(allocated_size(str(self.sparse), st), SPARSE_SIZE)
+
+    def test_small_file_rounded_up(self):
+        """Un petit fichier occupe au moins sa taille"""
+        path = self.root / "small.txt"
+        self.assertGreaterEqual(allocated_size(str(path), os.lstat(path)), 10)
+
+    def test_unknown_mode(self):
+        """Un mode inconnu est refusé, ou remplacé par la taille apparente depuis les paramètres"""
+        with self.assertRaises(ValueError):
+            set_size_accounting("compressed")
+        self.assertEqual(size_accounting_from_settings({"size_accounting": "compressed"}),
+                         SIZE_APPARENT)
+        self.assertEqual(size_accounting_from_settings(None), SIZE_APPARENT)
+
+    def test_scans_follow_mode(self):
+        """Le scan et l'analyse comptent la taille du mode courant"""
+        apparent, count = scan_path(self.root)
+        self.assertEqual(apparent, SPARSE_SIZE + 10)
+        self.assertEqual(analyze_tree(str(self.root)).size[0], apparent)
+
+        set_size_accounting(SIZE_ALLOCATED)
+        allocated, allocated_count = scan_path(self.root)
+        self.assertEqual(allocated_count, count)
+        self.assertLess(allocated, apparent)
+        self.assertEqual(analyze_tree(str(self.root)).size[0], allocated)
+
+    def test_bind_cache_accounting(self):
+        """Les tables de tailles sont vidées quand le mode enregistré diffère"""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE sizes (path TEXT, size INTEGER)")
+        conn.execute("INSERT INTO sizes VALUES ('a', 1)")
+        # Cache sans mode enregistré : antérieur au calcul des tailles
+        self.assertTrue(bind_cache_accounting(conn, ["sizes"]))
+        conn.execute("INSERT INTO sizes VALUES ('a', 1)")
+        self.assertFalse(bind_cache_accounting(conn, ["sizes"]))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM sizes").fetchone()[0], 1)
+
+        set_size_accounting(SIZE_ALLOCATED)
+        self.assertTrue(bind_cache_accounting(conn, ["sizes"]))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM sizes").fetchone()[0], 0)
+        conn.close()
+
+    def test_scan_index_mode_change(self):
+        """L'index de scan ne réutilise pas les totaux d'un autre mode"""
+        data = self.root / "data"
+        data.mkdir()
+        os.replace(self.sparse, data / "sparse.bin")
+        db_path = self.root / "index.db"
+        index = ScanIndex(db_path)
+        self.assertEqual(index.scan_tree(data), (SPARSE_SIZE, 1))
+        index.save()
+
+        set_size_accounting(SIZE_ALLOCATED)
+        allocated = index.scan_tree(data)[0]
+        self.assertLess(allocated, SPARSE_SIZE)
+        self.assertEqual(index.hits, 0)
+        # Totaux enregistrés sous l'autre mode : ignorés au rechargement
+        set_size_accounting(SIZE_APPARENT)
+        index.save()
+        reloaded = ScanIndex(db_path)
+        self.assertEqual(reloaded.scan_tree(data), (SPARSE_SIZE, 1))
+
+if __name__ == '__main__':
+    unittest.main()
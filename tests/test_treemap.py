@@ -0,0 +1,92 @@
+"""
+Tests du calcul de treemap
+Vérifie la disposition squarifiée, les seuils et le calcul en arrière-plan
+"""
+
+import unittest
+import sys
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.disk_usage import SizeTree, FLAG_DIR
+from utils.treemap import OTHER, TreemapWorker, hit_test, layout_treemap, squarify
+
+
+def wide_tree(dirs: int, files: int, big: int = 10 ** 9) -> SizeTree:
+    """Racine de dirs dossiers de files fichiers, plus un gros fichier"""
+    tree = SizeTree("root")
+    first = tree.add_children(0, [(f"d{i}", FLAG_DIR, 0, 0) for i in range(dirs)] + [("big", 0, big, 0)])
+    for d in range(dirs):
+        tree.add_children(first + d, [(f"f{i}", 0, 100 + i, 0) for i in range(files)])
+    tree.aggregate()
+    return tree
+
+
+class TestSquarify(unittest.TestCase):
+    """Tests pour l'algorithme squarified"""
+
+    def test_fills_area(self):
+        """Test surfaces respectées et rectangles dans la zone"""
+        areas = [6, 6, 4, 3, 2, 2, 1]
+        rects = squarify([a * 100 for a in areas], 0, 0, 60, 40)
+        for area, (x, y, w, h) in zip(areas, rects):
+            self.assertAlmostEqual(w * h, area * 100)
+            self.assertGreaterEqual(x, -1e-9)
+            self.assertLessEqual(x + w, 60 + 1e-9)
+            self.assertLessEqual(y + h, 40 + 1e-9)
+        # Les rectangles restent proches du carré
+        self.assertLess(max(max(w / h, h / w) for _, _, w, h in rects), 3)
+
+
+class TestLayout(unittest.TestCase):
+    """Tests pour la disposition de l'arbre"""
+
+    def test_thresholds(self):
+        """Test petits fichiers regroupés et profondeur limitée"""
+        tree = wide_tree(50, 2000)
+        rects = layout_treemap(tree, 800, 600, max_depth=2, min_area=100)
+        self.assertLess(len(rects), len(tree) // 50)
+        self.assertTrue(all(w * h >= 100 - 1e-6 for _, _, w, h, _, _ in rects))
+        self.assertEqual(max(depth for *_, depth in rects), 2)
+        self.assertIn(OTHER, [node for *_, node, _ in rects])
+
+        big = tree.find("root/big")
+        x, y, w, h, node, depth = hit_test(rects, 3, 3)
+        self.assertEqual(node, big)
+        self.assertEqual(depth, 1)
+
+    def test_depth_one(self):
+        """Test disposition limitée aux enfants directs"""
+        tree = wide_tree(3, 10, big=500)
+        rects = layout_treemap(tree, 100, 100, max_depth=1, min_area=1, padding=0)
+        self.assertEqual(len(rects), 1 + 4)
+        total = sum(w * h for _, _, w, h, _, depth in rects if depth == 1)
+        self.assertAlmostEqual(total, 100 * 100)
+
+
+class TestWorker(unittest.TestCase):
+    """Tests pour le calcul en arrière-plan"""
+
+    def test_latest_request_wins(self):
+        """Test une demande remplacée n'est jamais livrée"""
+        delivered = []
+        done = threading.Event()
+
+        def on_layout(tree, index, rects):
+            delivered.append(index)
+            done.set()
+
+        worker = TreemapWorker(on_layout)
+        big = wide_tree(200, 2000)
+        worker.request(big, 4000, 4000, min_area=1)
+        worker.request(big, 400, 300, big.find("root/d0"))
+        self.assertTrue(done.wait(5))
+        threading.Event().wait(0.2)
+        self.assertEqual(delivered, [big.find("root/d0")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -262,6 +262,45 @@ class BackupManager:
             print(f"✗ Erreur: {e}")
             return False
     
+    def restore_dedup_backup(self, backup_name: str) -> bool:
+        """
+        Annule un dédoublonnage (liens physiques ou quarantaine)
+        
+        Args:
+            backup_name: Nom du backup à restaurer
+        
+        Returns:
+            True si tous les fichiers ont été restaurés
+        """
+        from utils.dedup import BACKUP_TYPE, undo_dedup
+        
+        try:
+            backup = next((b for b in self.backups if b.get('name') == backup_name), None)
+            
+            if not backup or backup.get('type') != BACKUP_TYPE:
+                print(f"✗ Dédoublonnage introuvable: {backup_name}")
+                return False
+            
+            journal = Path(backup.get('file'))
+            if not journal.exists():
+                print(f"✗ Journal introuvable: {journal}")
+                return False
+            
+            report = undo_dedup(journal)
+            backup["restored"] = datetime.now().isoformat()
+            self.save_backup_index()
+            
+            quarantine = backup.get('quarantine')
+            if quarantine and Path(quarantine).is_dir() and not any(Path(quarantine).iterdir()):
+                Path(quarantine).rmdir()
+            
+            print(f"✓ Dédoublonnage annulé: {report.files} fichier(s) restauré(s)")
+            return not report.skipped and not report.errors
+            
+        except Exception as e:
+            print(f"✗ Erreur: {e}")
+            return False
+    
     def clean_old_backups(self, days: int = 30) -> int:
         """
         Supprime les backups plus anciens que X jours
@@ -288,6 +327,13 @@ class BackupManager:
                         file_path = Path(backup.get('backup', backup.get('file', '')))
                         if file_path.exists():
                             file_path.unlink()
+                    elif backup.get('type') == 'dedup':
+                        # Les fichiers en quarantaine sont supprimés définitivement
+                        if backup.get('quarantine'):
+                            shutil.rmtree(backup['quarantine'], ignore_errors=True)
+                        journal = Path(backup.get('file', ''))
+                        if journal.is_file():
+                            journal.unlink()
                     count += 1
                 else:
                     new_backups.append(backup)
@@ -0,0 +1,202 @@
+"""
+Cleaning filters
+Compiles per-category rules ("age > 7d", "size > 10MB", "unlocked"...) into
+a single predicate evaluated on the stat data already read by the walkers
+"""
+
+import os
+import re
+import time
+import operator
+import fnmatch
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+from utils.logger import get_logger
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+# predicate(path, stat_result) -> True if the file may be cleaned
+FilePredicate = Callable[[str, os.stat_result], bool]
+
+AGE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+SIZE_UNITS = {'b': 1, 'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3, 'tb': 1024 ** 4}
+
+_NUMBER_RULE = re.compile(r'^(age|size)\s*(<=|>=|<|>)\s*(\d+(?:\.\d+)?)\s*([a-z]*)$')
+_NAME_RULE = re.compile(r'^name\s*(!=|=)\s*(.+)$', re.IGNORECASE)
+
+
+_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+class FilterSyntaxError(ValueError):
+    """Raised when a cleaning rule cannot be parsed"""
+
+
+def snapshot_open_files() -> Set[str]:
+    """
+    Collect the paths currently held open by running processes
+
+    One snapshot is taken per run so that the "unlocked" rule costs a set
+    lookup per file. Returns an empty set if psutil is not available.
+    """
+    locked: Set[str] = set()
+    if not PSUTIL_AVAILABLE:
+        logger.warning("psutil not available: 'unlocked' filter has no effect")
+        return locked
+
+    for proc in psutil.process_iter():
+        try:
+            for opened in proc.open_files():
+                locked.add(os.path.normcase(opened.path))
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, OSError):
+            continue
+    return locked
+
+
+def _compile_rule(rule: str, now: float, locked: Optional[Set[str]]) -> FilePredicate:
+    """Translate one rule into a predicate over (path, st)"""
+    text = rule.strip().lower()
+
+    if text in ('unlocked', 'not locked'):
+        normcase = os.path.normcase
+        return lambda path, st: normcase(path) not in locked
+
+    match = _NUMBER_RULE.match(text)
+    if match:
+        field, comparison, value, unit = match.groups()
+        compare = _OPERATORS[comparison]
+        if field == 'age':
+            factor = AGE_UNITS.get(unit or 's')
+            if factor is None:
+                raise FilterSyntaxError(f"Unknown age unit '{unit}' in rule: {rule}")
+            limit = float(value) * factor
+            return lambda path, st: compare(now - st.st_mtime, limit)
+        factor = SIZE_UNITS.get(unit or 'b')
+        if factor is None:
+            raise FilterSyntaxError(f"Unknown size unit '{unit}' in rule: {rule}")
+        size = int(float(value) * factor)
+        return lambda path, st: compare(st.st_size, size)
+
+    # Name patterns keep their original case (matching is case-insensitive
+    # on Windows through normcase)
+    match = _NAME_RULE.match(rule.strip())
+    if match:
+        comparison, pattern = match.groups()
+        name_match = re.compile(fnmatch.translate(os.path.normcase(pattern.strip()))).match
+        normcase = os.path.normcase
+        basename = os.path.basename
+        if comparison == '=':
+            return lambda path, st: name_match(normcase(basename(path))) is not None
+        return lambda path, st: name_match(normcase(basename(path))) is None
+
+    raise FilterSyntaxError(f"Invalid cleaning rule: {rule}")
+
+
+def _all_of(tests: List[FilePredicate]) -> FilePredicate:
+    """Predicate true when every test is (stops at the first failing one)"""
+    if len(tests) == 1:
+        return tests[0]
+
+    def predicate(path: str, st: os.stat_result) -> bool:
+        for test in tests:
+            if not test(path, st):
+                return False
+        return True
+    return predicate
+
+
+def _match_nothing(path: str, st: os.stat_result) -> bool:
+    """Predicate of a category whose rules could not be compiled"""
+    return False
+
+
+def compile_filter(
+    rules: Union[str, Iterable[str], None],
+    locked: Optional[Set[str]] = None,
+    now: Optional[float] = None
+) -> Optional[FilePredicate]:
+    """
+    Compile cleaning rules into one predicate
+
+    Rules are combined with AND; a single string may also contain several
+    rules separated by "and". Supported rules:
+        age > 7d, age <= 12h     (last modification; units s, m, h, d, w)
+        size > 10MB, size < 1KB  (units B, KB, MB, GB, TB)
+        name = *.log, name != thumbcache_*
+        unlocked                 (skip files opened by a running process)
+
+    Args:
+        rules: Rule strings (None or empty: no filtering)
+        locked: Paths held open (snapshot_open_files() if needed and None)
+        now: Reference time for age rules (current time by default)
+
+    Returns:
+        predicate(path, stat_result), or None if there is nothing to filter
+
+    Raises:
+        FilterSyntaxError: If a rule is invalid
+    """
+    if not rules:
+        return None
+    if isinstance(rules, str):
+        rules = [rules]
+
+    parts: List[str] = []
+    for rule in rules:
+        parts.extend(p for p in re.split(r'\s+and\s+', rule, flags=re.IGNORECASE) if p.strip())
+    if not parts:
+        return None
+
+    if locked is None and any(p.strip().lower() in ('unlocked', 'not locked') for p in parts):
+        locked = snapshot_open_files()
+    now = time.time() if now is None else now
+    return _all_of([_compile_rule(rule, now, locked) for rule in parts])
+
+
+def compile_category_filters(
+    config: Optional[Dict[str, Union[str, List[str]]]],
+    locked: Optional[Set[str]] = None,
+    now: Optional[float] = None,
+    errors: Optional[Dict[str, str]] = None
+) -> Dict[str, FilePredicate]:
+    """
+    Compile the per-category rules found in the settings
+
+    A category with invalid rules gets a predicate matching nothing, so
+    none of its files are deleted. The open-files snapshot is shared by
+    all categories.
+
+    Args:
+        errors: Filled with category -> error message for invalid rules
+
+    Returns:
+        Mapping of category -> predicate (categories without rules omitted)
+    """
+    filters: Dict[str, FilePredicate] = {}
+    if not config:
+        return filters
+
+    needs_locks = any(
+        'locked' in (rules if isinstance(rules, str) else ' '.join(rules)).lower()
+        for rules in config.values() if rules
+    )
+    if needs_locks and locked is None:
+        locked = snapshot_open_files()
+
+    for category, rules in config.items():
+        try:
+            predicate = compile_filter(rules, locked, now)
+        except FilterSyntaxError as e:
+            logger.error(f"Not cleaning {category}, invalid filters: {e}")
+            if errors is not None:
+                errors[category] = str(e)
+            filters[category] = _match_nothing
+            continue
+        if predicate is not None:
+            filters[category] = predicate
+    return filters
@@ -0,0 +1,276 @@
+"""
+Dry-run clean plans
+A CleanPlan lists every file (with size and mtime) and directory that a
+cleaning run would remove, grouped by category. It is computed once, can be
+previewed or saved, and is executed later without rescanning.
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, ScanResult, is_protected_folder, iter_classified
+from utils.fs_cleaner import (
+    PROTECTED_EXTENSIONS, DeleteReport, _is_protected_file, force_remove, remove_file
+)
+from utils.clean_planner import plan_targets
+from utils.clean_filters import FilePredicate
+from utils.io_throttle import IOThrottle
+from utils.size_accounting import file_size, get_size_provider
+from utils.progress import BATCH_SIZE, DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+
+logger = get_logger(__name__)
+
+PLAN_FORMAT_VERSION = 1
+
+# (path, size, mtime_ns)
+PlanFile = Tuple[str, int, int]
+
+
+class CategoryPlan:
+    """Files and directories planned for removal in one category"""
+
+    def __init__(self, files: Optional[List[PlanFile]] = None, dirs: Optional[List[str]] = None):
+        self.files: List[PlanFile] = files or []
+        # Parents before children: removed in reverse order
+        self.dirs: List[str] = dirs or []
+
+    @property
+    def size(self) -> int:
+        """Total bytes planned"""
+        return sum(size for _, size, _ in self.files)
+
+
+class CleanPlan:
+    """Serialisable dry-run result, executed later without rescanning"""
+
+    def __init__(self, selection: Optional[List[str]] = None, created_at: Optional[float] = None):
+        self.selection = list(selection or [])
+        self.created_at = time.time() if created_at is None else created_at
+        self.categories: Dict[str, CategoryPlan] = {}
+        # Only plans built by build_plan() in this process skip the
+        # protected-path checks at execution; loaded plans are re-screened
+        self.trusted = False
+
+    def totals(self) -> Dict[str, ScanResult]:
+        """Bytes and file count per category"""
+        return {
+            category: ScanResult(category, plan.size, len(plan.files))
+            for category, plan in self.categories.items()
+        }
+
+    @property
+    def total_size(self) -> int:
+        """Total bytes planned over all categories"""
+        return sum(plan.size for plan in self.categories.values())
+
+    @property
+    def file_count(self) -> int:
+        """Total number of planned files"""
+        return sum(len(plan.files) for plan in self.categories.values())
+
+    def matches(self, selection: List[str]) -> bool:
+        """Check if the plan was computed for this category selection"""
+        return set(self.selection) == set(selection)
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'version': PLAN_FORMAT_VERSION,
+            'created_at': self.created_at,
+            'selection': self.selection,
+            'categories': {
+                category: {'files': [list(f) for f in plan.files], 'dirs': plan.dirs}
+                for category, plan in self.categories.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CleanPlan':
+        """Rebuild a plan from to_dict() output"""
+        if data.get('version') != PLAN_FORMAT_VERSION:
+            raise ValueError(f"Unsupported clean plan version: {data.get('version')}")
+        plan = cls(data.get('selection', []), data.get('created_at'))
+        for category, content in data.get('categories', {}).items():
+            plan.categories[category] = CategoryPlan(
+                [(path, int(size), int(mtime_ns)) for path, size, mtime_ns in content.get('files', [])],
+                list(content.get('dirs', []))
+            )
+        return plan
+
+    def save(self, filepath: PathLike) -> bool:
+        """Write the plan as JSON"""
+        try:
+            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            return True
+        except (OSError, TypeError) as e:
+            logger.error(f"Could not save clean plan: {e}")
+            return False
+
+    @classmethod
+    def load(cls, filepath: PathLike) -> 'CleanPlan':
+        """Read a plan written by save()"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_plan(
+    targets: Dict[str, List[Tuple[PathLike, str]]],
+    categories: Optional[List[str]] = None,
+    filters: Optional[Dict[str, FilePredicate]] = None,
+    on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+    interval: float = DEFAULT_INTERVAL
+) -> CleanPlan:
+    """
+    Compute a clean plan in a single walk of the planned roots
+
+    Args:
+        targets: Mapping of category -> list of (path, pattern)
+        categories: Categories to include (all if None)
+        filters: Mapping of category -> predicate(path, stat)
+        on_progress: Receives rate-limited ProgressEvent updates
+        interval: Minimum delay in seconds between two progress events
+
+    Returns:
+        CleanPlan with every file and directory to remove
+    """
+    if categories is not None:
+        targets = {cat: paths for cat, paths in targets.items() if cat in categories}
+
+    plan = CleanPlan(list(targets))
+    plan.trusted = True
+    for category in targets:
+        plan.categories[category] = CategoryPlan()
+    progress = ProgressThrottle(on_progress, "plan", interval) if on_progress else None
+    filters = filters or {}
+    sized = get_size_provider()
+
+    def add_dir(category: str, path: str):
+        plan.categories[category].dirs.append(path)
+
+    for root in plan_targets(targets):
+        if is_protected_folder(root.path):
+            logger.warning(f"Skipping critical folder: {root.path}")
+            continue
+
+        if os.path.isfile(root.path):
+            category = root.classify(os.path.basename(root.path))
+            try:
+                st = os.lstat(root.path)
+            except OSError:
+                continue
+            predicate = filters.get(category)
+            if _is_protected_file(root.path):
+                logger.warning(f"Skipping system file: {root.path}")
+                continue
+            if category is not None and (predicate is None or predicate(root.path, st)):
+                plan.categories[category].files.append(
+                    (root.path, file_size(root.path, st), st.st_mtime_ns)
+                )
+            continue
+
+        batch_size = 0
+        batch_count = 0
+        for category, entry in iter_classified(root.path, root.classify, add_dir):
+            # Binaries are refused among top-level matches only, as in
+            # utils.fs_cleaner.delete_classified
+            if (entry.name.lower().endswith(PROTECTED_EXTENSIONS)
+                    and os.path.dirname(entry.path) == root.path and _is_protected_file(entry.path)):
+                logger.warning(f"Skipping system file: {entry.path}")
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            predicate = filters.get(category)
+            if predicate is not None and not predicate(entry.path, st):
+                continue
+            size = sized(entry.path, st)
+            plan.categories[category].files.append((entry.path, size, st.st_mtime_ns))
+
+            if progress is not None:
+                batch_size += size
+                batch_count += 1
+                if batch_count >= BATCH_SIZE:
+                    progress.add(batch_size, batch_count, root.path)
+                    batch_size = batch_count = 0
+
+        if progress is not None and batch_count:
+            progress.add(batch_size, batch_count, root.path)
+
+    if progress is not None:
+        progress.finish(plan.totals())
+    return plan
+
+
+def execute_files(
+    files: List[PlanFile],
+    category: str,
+    progress: Optional[ProgressThrottle] = None,
+    throttle: Optional[IOThrottle] = None,
+    guard: bool = True
+) -> DeleteReport:
+    """
+    Delete planned files whose size and mtime did not change since planning
+
+    Changed or vanished entries are skipped and counted in report.changed.
+    guard refuses files in critical folders and system binaries; it may
+    only be turned off for plans screened by build_plan().
+    """
+    report = DeleteReport(category)
+    batch_size = 0
+    batch_count = 0
+
+    for path, size, mtime_ns in files:
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            report.changed += 1
+            continue
+        except OSError as e:
+            logger.debug(f"Cannot read {path}: {e}")
+            report.failed += 1
+            continue
+
+        if st.st_mtime_ns != mtime_ns or file_size(path, st) != size:
+            logger.debug(f"Skipping {path}: changed since planning")
+            report.changed += 1
+            continue
+
+        if guard and is_protected_folder(os.path.dirname(path)):
+            logger.warning(f"Skipping file in critical folder: {path}")
+            report.skipped += 1
+            continue
+        if not remove_file(path, size, report, guard=guard):
+            continue
+        if throttle is not None:
+            throttle.consume(1, size)
+        if progress is not None:
+            batch_size += size
+            batch_count += 1
+            if batch_count >= BATCH_SIZE:
+                progress.add(batch_size, batch_count, os.path.dirname(path))
+                batch_size = batch_count = 0
+
+    if progress is not None and batch_count:
+        progress.add(batch_size, batch_count, category)
+    return report
+
+
+def remove_planned_dirs(dirs: List[str], report: DeleteReport, guard: bool = True):
+    """Remove planned directories, children first; non-empty ones are kept"""
+    for path in reversed(dirs):
+        if guard and is_protected_folder(path):
+            logger.warning(f"Skipping critical folder: {path}")
+            continue
+        try:
+            force_remove(os.rmdir, path)
+            report.dirs += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug(f"Could not remove {path}: {e}")
@@ -0,0 +1,118 @@
+"""
+Cleaning target planner
+Merges overlapping (root, glob) targets so that every file is visited once
+"""
+
+import os
+import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (category, pattern) applied to the direct children of a root
+Rule = Tuple[str, str]
+
+
+def split_path(path: Union[str, Path]) -> Tuple[str, ...]:
+    """Normalize a path (case, separators, '..') into its components"""
+    normalized = os.path.normcase(os.path.normpath(os.path.abspath(os.fspath(path))))
+    drive, rest = os.path.splitdrive(normalized)
+    parts = [part for part in rest.split(os.sep) if part]
+    return (drive + os.sep,) + tuple(parts)
+
+
+def _specificity(rule: Rule) -> Tuple[bool, int]:
+    """Sort key putting the most specific patterns first"""
+    pattern = rule[1]
+    literal = len(pattern.replace('*', '').replace('?', ''))
+    return (pattern == '*', -literal)
+
+
+class PlannedRoot:
+    """A deduplicated root with the rules selecting its direct children"""
+
+    def __init__(self, path: str, rules: List[Rule]):
+        self.path = path
+        self.rules = sorted(rules, key=_specificity)
+
+    @property
+    def categories(self) -> List[str]:
+        """Categories cleaned below this root"""
+        return list(dict.fromkeys(category for category, _ in self.rules))
+
+    def classify(self, name: str) -> Optional[str]:
+        """Category owning a direct child (first most specific match)"""
+        for category, pattern in self.rules:
+            if pattern == '*' or fnmatch.fnmatch(name, pattern):
+                return category
+        return None
+
+    def __repr__(self):
+        return f"PlannedRoot({self.path!r}, rules={self.rules})"
+
+
+class _TrieNode:
+    """Path component node of the planner trie"""
+
+    __slots__ = ('children', 'path', 'rules')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.path: Optional[str] = None
+        self.rules: List[Rule] = []
+
+
+def plan_targets(targets: Dict[str, List[Tuple[Union[str, Path], str]]]) -> List[PlannedRoot]:
+    """
+    Build the deduplicated list of roots to walk for a set of targets
+
+    Targets are inserted in a prefix trie of normalized path components.
+    Identical rules are merged, rules sharing a root are walked together,
+    and a root already covered by one of its ancestors' rules is dropped
+    (its files are attributed to the ancestor's category).
+
+    Args:
+        targets: Mapping of category -> list of (path, pattern)
+
+    Returns:
+        Roots to walk, each with the rules for its direct children
+    """
+    trie = _TrieNode()
+
+    for category, paths in targets.items():
+        for path, pattern in paths:
+            if not str(path):
+                continue
+            node = trie
+            for part in split_path(path):
+                node = node.children.setdefault(part, _TrieNode())
+            if node.path is None:
+                node.path = os.fspath(path)
+            if all(rule_pattern != pattern for _, rule_pattern in node.rules):
+                node.rules.append((category, pattern))
+
+    planned: List[PlannedRoot] = []
+    # (node, nearest ancestor holding rules, component right below that ancestor)
+    stack: List[Tuple[_TrieNode, Optional[_TrieNode], Optional[str]]] = [(trie, None, None)]
+
+    while stack:
+        node, ancestor, first_part = stack.pop()
+
+        if node.rules:
+            if ancestor is not None and any(
+                pattern == '*' or fnmatch.fnmatch(first_part, pattern)
+                for _, pattern in ancestor.rules
+            ):
+                logger.debug(f"Target {node.path} already covered by {ancestor.path}")
+                # Everything below is covered as well
+                continue
+            planned.append(PlannedRoot(node.path, node.rules))
+            ancestor = node
+            first_part = None
+
+        for part, child in node.children.items():
+            stack.append((child, ancestor, first_part if first_part is not None or ancestor is None else part))
+
+    return planned
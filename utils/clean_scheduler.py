@@ -0,0 +1,220 @@
+"""
+Concurrent cleaning scheduler
+Fans cleaning categories and their roots out over a bounded thread pool
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike
+from utils.fs_cleaner import DeleteReport, delete_classified
+from utils.clean_planner import plan_targets
+from utils.clean_plan import CleanPlan, execute_files, remove_planned_dirs
+from utils.progress import ProgressEvent, ProgressThrottle
+from utils.clean_filters import FilePredicate
+from utils.io_throttle import IOThrottle
+
+logger = get_logger(__name__)
+
+DEFAULT_CLEAN_WORKERS = 4
+MAX_CLEAN_WORKERS = 32
+
+# Planned files handed to a worker at once
+PLAN_CHUNK_SIZE = 4096
+
+# Called with (category, report, categories_done, categories_total)
+ProgressCallback = Callable[[str, DeleteReport, int, int], None]
+
+
+def resolve_worker_count(workers: Optional[int]) -> int:
+    """Clamp a configured worker count to a sane range"""
+    if not workers:
+        return DEFAULT_CLEAN_WORKERS
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        return DEFAULT_CLEAN_WORKERS
+    return max(1, min(workers, MAX_CLEAN_WORKERS, (os.cpu_count() or 1) * 4))
+
+
+class CleanScheduler:
+    """Run cleaning jobs concurrently while keeping per-category totals"""
+
+    def __init__(self, max_workers: Optional[int] = None, throttle: Optional[IOThrottle] = None):
+        """
+        Args:
+            max_workers: Size of the thread pool (see resolve_worker_count)
+            throttle: Shared throughput cap for background cleaning (None
+                      for full speed)
+        """
+        self.max_workers = resolve_worker_count(max_workers)
+        self.throttle = throttle
+        # Per-path reports of the last run
+        self.path_reports: Dict[str, DeleteReport] = {}
+
+    def run(
+        self,
+        targets: Dict[str, List[Tuple[PathLike, str]]],
+        actions: Optional[Dict[str, Callable[[], Optional[int]]]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        on_stream: Optional[Callable[[ProgressEvent], None]] = None,
+        filters: Optional[Dict[str, FilePredicate]] = None
+    ) -> Dict[str, DeleteReport]:
+        """
+        Clean every target and run every action on the pool
+
+        Targets are planned first (see utils.clean_planner): overlapping
+        roots are walked once and each file is attributed to one category.
+
+        Args:
+            targets: Mapping of category -> list of (path, pattern) to delete
+            actions: Mapping of category -> callable returning bytes freed
+                     (for categories that are not plain folders)
+            on_progress: Called from the calling thread when a category is done
+            on_stream: Receives rate-limited freed bytes/files events from
+                       the workers, then a final event with done=True
+            filters: Mapping of category -> predicate(path, stat) selecting
+                     the files that may be deleted
+
+        Returns:
+            Mapping of category -> merged DeleteReport
+        """
+        actions = actions or {}
+        categories = list(dict.fromkeys(list(targets) + list(actions)))
+        results = {category: DeleteReport(category) for category in categories}
+        pending = {category: 0 for category in categories}
+        done = 0
+        self.path_reports = {}
+        stream = ProgressThrottle(on_stream, "clean") if on_stream else None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="cleaner") as pool:
+            futures = {}
+            for root in plan_targets(targets):
+                if not os.path.exists(root.path):
+                    continue
+                future = pool.submit(delete_classified, root.path, root.classify,
+                                     stream, filters, self.throttle)
+                futures[future] = root.categories
+                for category in root.categories:
+                    pending[category] += 1
+            for category, action in actions.items():
+                futures[pool.submit(_run_action, category, action)] = [category]
+                pending[category] += 1
+
+            # Categories without any existing root are complete right away
+            for category in categories:
+                if pending[category] == 0:
+                    done += 1
+                    if on_progress:
+                        on_progress(category, results[category], done, len(categories))
+
+            for future in as_completed(futures):
+                root_categories = futures[future]
+                try:
+                    reports = future.result()
+                except Exception as e:
+                    logger.error(f"Cleaning {', '.join(root_categories)} failed: {e}")
+                    reports = {}
+                    for category in root_categories:
+                        results[category].failed += 1
+
+                for category, report in reports.items():
+                    results[category].merge(report)
+                    if report.path in self.path_reports:
+                        self.path_reports[report.path].merge(report)
+                    else:
+                        self.path_reports[report.path] = report
+
+                for category in root_categories:
+                    pending[category] -= 1
+                    if pending[category] == 0:
+                        done += 1
+                        if on_progress:
+                            on_progress(category, results[category], done, len(categories))
+
+        if stream is not None:
+            stream.finish(results)
+        return results
+
+    def run_plan(
+        self,
+        plan: CleanPlan,
+        actions: Optional[Dict[str, Callable[[], Optional[int]]]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        on_stream: Optional[Callable[[ProgressEvent], None]] = None
+    ) -> Dict[str, DeleteReport]:
+        """
+        Execute a CleanPlan on the pool without rescanning
+
+        Planned files are split in chunks; each file is checked against its
+        planned size and mtime before deletion. The planned directories of a
+        category are removed once all its chunks are done. Plans that were
+        loaded rather than built in this process are re-screened for
+        protected folders and binaries.
+
+        Returns:
+            Mapping of category -> merged DeleteReport
+        """
+        actions = actions or {}
+        categories = list(dict.fromkeys(list(plan.categories) + list(actions)))
+        results = {category: DeleteReport(category) for category in categories}
+        pending = {category: 0 for category in categories}
+        done = 0
+        stream = ProgressThrottle(on_stream, "clean") if on_stream else None
+
+        def category_done(category: str):
+            nonlocal done
+            category_plan = plan.categories.get(category)
+            if category_plan is not None:
+                remove_planned_dirs(category_plan.dirs, results[category], not plan.trusted)
+            done += 1
+            if on_progress:
+                on_progress(category, results[category], done, len(categories))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="cleaner") as pool:
+            futures = {}
+            for category, category_plan in plan.categories.items():
+                files = category_plan.files
+                for start in range(0, len(files), PLAN_CHUNK_SIZE):
+                    chunk = files[start:start + PLAN_CHUNK_SIZE]
+                    futures[pool.submit(execute_files, chunk, category, stream,
+                                          self.throttle, not plan.trusted)] = category
+                    pending[category] += 1
+            for category, action in actions.items():
+                futures[pool.submit(_action_report, category, action)] = category
+                pending[category] += 1
+
+            for category in categories:
+                if pending[category] == 0:
+                    category_done(category)
+
+            for future in as_completed(futures):
+                category = futures[future]
+                try:
+                    results[category].merge(future.result())
+                except Exception as e:
+                    logger.error(f"Cleaning {category} failed: {e}")
+                    results[category].failed += 1
+
+                pending[category] -= 1
+                if pending[category] == 0:
+                    category_done(category)
+
+        if stream is not None:
+            stream.finish(results)
+        return results
+
+
+def _action_report(category: str, action: Callable[[], Optional[int]]) -> DeleteReport:
+    """Run a custom cleaning action and wrap its result in a report"""
+    report = DeleteReport(category)
+    report.freed = action() or 0
+    return report
+
+
+def _run_action(category: str, action: Callable[[], Optional[int]]) -> Dict[str, DeleteReport]:
+    """Same as _action_report, keyed by category like delete_classified"""
+    return {category: _action_report(category, action)}
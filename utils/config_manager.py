@@ -167,7 +167,13 @@ class ConfigManager:
             "optimization": {
                 "create_restore_point": True,
                 "aggressive_cleaning": False,
-                "deep_scan": True
+                "deep_scan": True,
+                "clean_workers": 4,
+                "clean_filters": {},
+                "clean_mode": "foreground",
+                "background_files_per_second": 500,
+                "background_mb_per_second": 10,
+                "size_accounting": "allocated"
             },
             "privacy": {
                 "disable_telemetry": True,
@@ -0,0 +1,374 @@
+"""
+Duplicate reclaiming
+Replaces verified duplicates with hard links to the kept copy, or moves
+them to a quarantine folder. Every action is journaled and the journal is
+registered in the BackupManager index, so that a run can be undone
+"""
+
+import os
+import json
+import stat
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.backup_manager import BackupManager
+from utils.duplicates import DuplicateSet
+from utils.progress import DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+
+logger = get_logger(__name__)
+
+DEDUP_HARDLINK = "hardlink"
+DEDUP_QUARANTINE = "quarantine"
+DEDUP_MODES = (DEDUP_HARDLINK, DEDUP_QUARANTINE)
+
+# Type of the BackupManager index entries written by dedup runs
+BACKUP_TYPE = "dedup"
+
+DEFAULT_DEDUP_WORKERS = 4
+
+# Read buffer of the byte comparison (per file)
+COMPARE_BUFFER = 1024 * 1024
+
+# Files handed to the pool at once; the journal is flushed after each batch
+DEDUP_BATCH = 256
+
+# Suffix of the temporary name a hard link is created under
+_LINK_SUFFIX = ".dedup-link"
+
+# Suffix of the temporary copy written when a hard link is undone
+_COPY_SUFFIX = ".dedup-copy"
+
+
+class DedupSkipped(Exception):
+    """A duplicate left in place (changed since the search, other volume...)"""
+
+
+def same_contents(first: str, second: str) -> bool:
+    """Byte-by-byte comparison of two files"""
+    with open(first, 'rb', buffering=0) as a, open(second, 'rb', buffering=0) as b:
+        # Small files: one read of each (the extra byte hits the end of file)
+        length = min(COMPARE_BUFFER, os.fstat(a.fileno()).st_size + 1)
+        buffer_a = bytearray(length)
+        buffer_b = bytearray(length)
+        view_a = memoryview(buffer_a)
+        view_b = memoryview(buffer_b)
+        while True:
+            # Unbuffered reads of regular files only come back short at the end
+            read = a.readinto(buffer_a)
+            if b.readinto(buffer_b) != read:
+                return False
+            if not read:
+                return True
+            if view_a[:read] != view_b[:read]:
+                return False
+
+
+class DedupReport:
+    """Outcome of a dedup run (or of its undo)"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        # Files linked or moved (names of the same file count once)
+        self.files = 0
+        self.reclaimed = 0
+        # Path -> reason it was left in place
+        self.skipped: Dict[str, str] = {}
+        self.errors: List[Tuple[str, str]] = []
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'mode': self.mode,
+            'files': self.files,
+            'reclaimed': self.reclaimed,
+            'skipped': len(self.skipped),
+            'errors': len(self.errors),
+        }
+
+    def __repr__(self):
+        return (f"DedupReport({self.mode}, files={self.files}, reclaimed={self.reclaimed}, "
+                f"skipped={len(self.skipped)}, errors={len(self.errors)})")
+
+
+def _identity(st: os.stat_result) -> Tuple[int, int]:
+    return st.st_dev, st.st_ino
+
+
+class DedupJob:
+    """
+    Reclaim the space of duplicate sets
+
+    For every set, one copy is kept and each other copy is compared byte by
+    byte with it before being replaced by a hard link to the kept copy
+    (hard link mode) or moved to the quarantine folder (quarantine mode).
+    Copies whose size or mtime changed since the search, or during the
+    comparison, are left in place. Extra names of a copy (hard links found
+    by the search) are handled with it, since the space is only freed once
+    every name is gone.
+
+    Files are processed in batches on a thread pool. Each batch is appended
+    to a JSON-lines journal, registered in the BackupManager index before
+    the first action: an interrupted run can be undone as well.
+    """
+
+    def __init__(
+        self,
+        mode: str = DEDUP_HARDLINK,
+        backup_manager: Optional[BackupManager] = None,
+        workers: Optional[int] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+        interval: float = DEFAULT_INTERVAL,
+        cancel: Optional[threading.Event] = None
+    ):
+        """
+        Args:
+            mode: DEDUP_HARDLINK or DEDUP_QUARANTINE
+            backup_manager: Index the run is recorded in (default BackupManager())
+            workers: Number of comparison threads
+            on_progress: Receives the bytes reclaimed as rate-limited events
+            interval: Minimum delay in seconds between two progress events
+            cancel: Set to stop after the current batch
+
+        Raises:
+            ValueError: If the mode is unknown
+        """
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.mode = mode
+        self.backup_manager = backup_manager or BackupManager()
+        self.workers = workers or DEFAULT_DEDUP_WORKERS
+        self.on_progress = on_progress
+        self.interval = interval
+        self.cancel = cancel
+        self.name = f"dedup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        folder = self.backup_manager.backup_dir / BACKUP_TYPE
+        self.journal_path = folder / f"{self.name}.jsonl"
+        self.quarantine_dir = folder / self.name
+        self._slot = 0
+        self._slot_lock = threading.Lock()
+
+    def _cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    def _quarantine_path(self, path: str) -> Path:
+        """Unique name in the quarantine folder"""
+        with self._slot_lock:
+            self._slot += 1
+            slot = self._slot
+        return self.quarantine_dir / f"{slot:08d}_{os.path.basename(path)}"
+
+    def _reclaim(self, keep: str, names: List[str], size: int) -> List[Dict]:
+        """
+        Verify one copy (with all its names) and link or move it
+
+        Returns:
+            Journal records, one per name
+        """
+        keep_st = os.stat(keep, follow_symlinks=False)
+        st = os.stat(names[0], follow_symlinks=False)
+        if not stat.S_ISREG(st.st_mode) or st.st_size != size or keep_st.st_size != size:
+            raise DedupSkipped("changed since the search")
+        if _identity(st) == _identity(keep_st):
+            raise DedupSkipped("already linked to the kept copy")
+        if self.mode == DEDUP_HARDLINK and st.st_dev != keep_st.st_dev:
+            raise DedupSkipped("not on the volume of the kept copy")
+        if not same_contents(keep, names[0]):
+            raise DedupSkipped("contents differ")
+        if os.stat(names[0], follow_symlinks=False).st_mtime_ns != st.st_mtime_ns:
+            raise DedupSkipped("modified during the comparison")
+
+        records = []
+        for position, name in enumerate(names):
+            record = {
+                'action': self.mode,
+                'path': name,
+                'keep': keep,
+                'size': size,
+                'mtime_ns': st.st_mtime_ns,
+                'st_mode': stat.S_IMODE(st.st_mode),
+            }
+            try:
+                if position and _identity(os.stat(name, follow_symlinks=False)) != _identity(st):
+                    continue
+                if self.mode == DEDUP_HARDLINK:
+                    temporary = name + _LINK_SUFFIX
+                    os.link(keep, temporary)
+                    try:
+                        os.replace(temporary, name)
+                    except OSError:
+                        os.unlink(temporary)
+                        raise
+                else:
+                    target = self._quarantine_path(name)
+                    shutil.move(name, target)
+                    record['quarantine'] = str(target)
+            except OSError as e:
+                if not records:
+                    raise
+                # Names already handled must still be journaled
+                logger.warning(f"Dedup stopped at {name}: {e}")
+                break
+            records.append(record)
+        return records
+
+    def _register(self) -> Dict:
+        """Add the run to the backup index before the first action"""
+        backup_info = {
+            "type": BACKUP_TYPE,
+            "name": self.name,
+            "mode": self.mode,
+            "file": str(self.journal_path),
+            "quarantine": str(self.quarantine_dir) if self.mode == DEDUP_QUARANTINE else None,
+            "timestamp": datetime.now().isoformat(),
+            "files": 0,
+            "size": 0,
+        }
+        self.backup_manager.backups.append(backup_info)
+        self.backup_manager.save_backup_index()
+        return backup_info
+
+    def run(self, duplicates: Iterable[DuplicateSet],
+            keep: Optional[Callable[[DuplicateSet], str]] = None) -> DedupReport:
+        """
+        Reclaim every set
+
+        Args:
+            duplicates: Sets from utils.duplicates.DuplicateFinder
+            keep: Chooses the copy kept in a set (its first path by default)
+
+        Returns:
+            DedupReport
+        """
+        report = DedupReport(self.mode)
+        tasks = []
+        for duplicate in duplicates:
+            kept = keep(duplicate) if keep is not None else duplicate.paths[0]
+            for path in duplicate.paths:
+                if path != kept:
+                    tasks.append((kept, [path] + duplicate.links.get(path, []), duplicate.size))
+        if not tasks:
+            return report
+
+        progress = ProgressThrottle(self.on_progress, "dedup", self.interval) \
+            if self.on_progress else None
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.mode == DEDUP_QUARANTINE:
+            self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        backup_info = self._register()
+
+        def reclaim(task):
+            kept, names, size = task
+            try:
+                return task, self._reclaim(kept, names, size), None
+            except (DedupSkipped, OSError) as e:
+                return task, None, e
+
+        with open(self.journal_path, 'a', encoding='utf-8') as journal, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dedup") as pool:
+            for start in range(0, len(tasks), DEDUP_BATCH):
+                if self._cancelled():
+                    break
+                lines = []
+                for (kept, names, size), records, error in pool.map(
+                        reclaim, tasks[start:start + DEDUP_BATCH]):
+                    if isinstance(error, DedupSkipped):
+                        report.skipped[names[0]] = str(error)
+                    elif error is not None:
+                        report.errors.append((names[0], str(error)))
+                    if records:
+                        lines.extend(json.dumps(record, ensure_ascii=False) for record in records)
+                        report.files += 1
+                        report.reclaimed += size
+                        if progress is not None:
+                            progress.add(size, 1, names[0])
+                if lines:
+                    journal.write('\n'.join(lines) + '\n')
+                    journal.flush()
+
+        backup_info["files"] = report.files
+        backup_info["size"] = report.reclaimed
+        self.backup_manager.save_backup_index()
+        if progress is not None:
+            progress.finish({'report': report})
+        logger.info(f"Dedup {self.name}: {report}")
+        for path, reason in list(report.skipped.items())[:20]:
+            logger.debug(f"Dedup kept {path}: {reason}")
+        for path, error in report.errors[:20]:
+            logger.warning(f"Dedup failed on {path}: {error}")
+        return report
+
+
+def _undo_record(record: Dict):
+    """Give a duplicate back its own data at its original path"""
+    path = record['path']
+    if record['action'] == DEDUP_QUARANTINE:
+        if os.path.lexists(path):
+            raise DedupSkipped("path reused since the dedup")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(record['quarantine'], path)
+        return
+
+    try:
+        linked = _identity(os.stat(path, follow_symlinks=False)) == \
+            _identity(os.stat(record['keep'], follow_symlinks=False))
+    except FileNotFoundError:
+        linked = False
+    if not linked:
+        raise DedupSkipped("no longer linked to the kept copy")
+    temporary = path + _COPY_SUFFIX
+    try:
+        shutil.copyfile(record['keep'], temporary)
+        os.chmod(temporary, record['st_mode'])
+        os.utime(temporary, ns=(record['mtime_ns'], record['mtime_ns']))
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.lexists(temporary):
+            os.unlink(temporary)
+        raise
+
+
+def undo_dedup(journal_path: os.PathLike, workers: Optional[int] = None) -> DedupReport:
+    """
+    Undo a dedup run from its journal
+
+    Hard links are replaced by copies of the kept file (with the original
+    permissions and mtime; names that shared a file get one copy each),
+    quarantined files are moved back. Paths that changed since the run are
+    left alone.
+
+    Returns:
+        DedupReport of the restored files
+    """
+    records = []
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Line cut by a crash: that action was not journaled
+                continue
+    report = DedupReport(records[0]['action'] if records else DEDUP_HARDLINK)
+
+    def undo(record):
+        try:
+            _undo_record(record)
+            return record, None
+        except (DedupSkipped, OSError) as e:
+            return record, e
+
+    with ThreadPoolExecutor(max_workers=workers or DEFAULT_DEDUP_WORKERS,
+                            thread_name_prefix="dedup-undo") as pool:
+        for record, error in pool.map(undo, records):
+            if isinstance(error, DedupSkipped):
+                report.skipped[record['path']] = str(error)
+            elif error is not None:
+                report.errors.append((record['path'], str(error)))
+            else:
+                report.files += 1
+                report.reclaimed += record['size']
+    logger.info(f"Dedup undone from {journal_path}: {report}")
+    return report
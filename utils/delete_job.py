@@ -0,0 +1,295 @@
+"""
+Checkpointed deletion jobs
+Removes very large trees (Windows.old, SoftwareDistribution...) in a job
+that journals completed subtrees, so that an interrupted run resumes where
+it stopped instead of starting over
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, is_link, is_protected_folder
+from utils.fs_cleaner import DeleteReport, _remove_link, force_remove, remove_file
+from utils.progress import BATCH_SIZE, DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+from utils.scan_index import CACHE_DIR
+from utils.io_throttle import IOThrottle
+from utils.size_accounting import file_size, get_size_provider
+
+logger = get_logger(__name__)
+
+JOURNAL_DIR = CACHE_DIR / "delete_jobs"
+
+# Maximum delay in seconds between two journal flushes: a crash loses at
+# most this much progress (those directories are simply walked again)
+CHECKPOINT_INTERVAL = 1.0
+
+
+def journal_path_for(root: PathLike) -> Path:
+    """Journal file used for a root (one per normalized path)"""
+    key = os.path.normcase(os.path.abspath(os.fspath(root)))
+    return JOURNAL_DIR / (hashlib.sha1(key.encode('utf-8')).hexdigest() + ".jsonl")
+
+
+class DeleteJob:
+    """
+    Resumable bottom-up deletion of a directory tree
+
+    Every directory whose contents have been fully processed is appended to
+    a JSON-lines journal together with the bytes/files freed since the
+    previous checkpoint. When a job is run again after a crash, a time-out
+    or a stop request, journaled subtrees are not walked again (they are
+    either gone or only hold files that could not be deleted) and the
+    totals continue from the journaled values. The job is complete, and the
+    journal removed, only once the tree is actually gone (root emptied when
+    it is kept). A walk that leaves files behind keeps the totals but forgets
+    the walked directories, so that the next run retries them.
+
+    The job deletes the whole tree it is given: unlike the pattern-based
+    cleaner, it does not spare .exe/.dll/.sys files.
+    """
+
+    def __init__(
+        self,
+        root: PathLike,
+        remove_root: bool = False,
+        journal_path: Optional[PathLike] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+        interval: float = DEFAULT_INTERVAL,
+        throttle: Optional[IOThrottle] = None
+    ):
+        """
+        Args:
+            root: Tree to delete
+            remove_root: Also remove root itself once empty (like rd /s)
+            journal_path: Journal file (cache/delete_jobs/<hash>.jsonl by default)
+            on_progress: Receives rate-limited ProgressEvent updates, with
+                         files/s and MB/s available on each event
+            interval: Minimum delay in seconds between two progress events
+            throttle: Caps the deletion throughput (background mode)
+        """
+        self.root = os.fspath(root)
+        self.remove_root = remove_root
+        self.journal_path = Path(journal_path) if journal_path else journal_path_for(root)
+        self.on_progress = on_progress
+        self.interval = interval
+        self.throttle = throttle
+        self.report = DeleteReport(self.root)
+        self.complete = False
+        self._done: Set[str] = set()
+        self._stop = False
+        self._load()
+
+    @property
+    def resumed(self) -> bool:
+        """True if a previous run of this job left a journal"""
+        return bool(self._done) or self.report.files > 0
+
+    def stop(self):
+        """Ask a running job to stop at the next directory (thread-safe)"""
+        self._stop = True
+
+    def _load(self):
+        """Read the checkpoints of a previous interrupted run"""
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Truncated last line after a crash
+                        continue
+                    if 'dir' in record:
+                        self._done.add(record['dir'])
+                    self.report.freed += record.get('freed', 0)
+                    self.report.files += record.get('files', 0)
+                    self.report.dirs += record.get('dirs', 0)
+                    self.report.failed += record.get('failed', 0)
+                    self.report.skipped += record.get('skipped', 0)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.warning(f"Cannot read deletion journal {self.journal_path}: {e}")
+        if self._done:
+            logger.info(f"Resuming deletion of {self.root}: {len(self._done)} directories "
+                        f"already processed")
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root)
+
+    def _tree_gone(self) -> bool:
+        """True once nothing is left to delete"""
+        if self.remove_root or not os.path.isdir(self.root):
+            return not os.path.lexists(self.root)
+        try:
+            with os.scandir(self.root) as it:
+                return next(it, None) is None
+        except OSError:
+            return False
+
+    def _restart_journal(self):
+        """Keep the totals so far, but walk every directory again next run"""
+        report = self.report
+        record = {'freed': report.freed, 'files': report.files, 'dirs': report.dirs,
+                  'failed': report.failed, 'skipped': report.skipped}
+        try:
+            with open(self.journal_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"Cannot rewrite deletion journal {self.journal_path}: {e}")
+        self._done.clear()
+
+    def run(self, time_budget: Optional[float] = None) -> DeleteReport:
+        """
+        Delete the tree, checkpointing completed directories
+
+        Args:
+            time_budget: Seconds after which the job stops cleanly (it can be
+                         resumed by running a new job on the same root)
+
+        Returns:
+            DeleteReport with the totals of this and previous runs; check
+            self.complete to know whether the whole tree was processed
+        """
+        if is_protected_folder(self.root):
+            logger.error(f"BLOCKED: Attempted to delete critical folder: {self.root}")
+            return self.report
+        if not os.path.lexists(self.root):
+            self._finish_journal()
+            self.complete = True
+            return self.report
+
+        if not os.path.isdir(self.root) or os.path.islink(self.root):
+            try:
+                remove_file(self.root, file_size(self.root, os.lstat(self.root)), self.report,
+                            guard=False)
+            except OSError as e:
+                logger.debug(f"Cannot read {self.root}: {e}")
+                self.report.failed += 1
+            self.complete = not os.path.lexists(self.root)
+            return self.report
+
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        progress = ProgressThrottle(self.on_progress, "delete", self.interval) if self.on_progress else None
+        report = self.report
+        # Totals freed since the last checkpoint
+        pending = DeleteReport(self.root)
+        lines: List[str] = []
+        last_flush = time.monotonic()
+        batch = [0, 0]
+        sized = get_size_provider()
+
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        journal = open(self.journal_path, 'a', encoding='utf-8')
+
+        def checkpoint(path: Optional[str]):
+            record = {
+                'freed': pending.freed,
+                'files': pending.files,
+                'dirs': pending.dirs,
+                'failed': pending.failed,
+                'skipped': pending.skipped,
+            }
+            if path is not None:
+                record['dir'] = self._relative(path)
+            lines.append(json.dumps(record))
+            report.merge(pending)
+            pending.freed = pending.files = pending.dirs = pending.failed = pending.skipped = 0
+
+        def flush():
+            if lines:
+                journal.write('\n'.join(lines) + '\n')
+                journal.flush()
+                lines.clear()
+
+        # (path, visited): a directory is pushed back once its children are
+        # queued so that it is checkpointed and removed after them
+        stack: List[Tuple[str, bool]] = [(self.root, False)]
+        try:
+            while stack:
+                current, visited = stack.pop()
+
+                if visited:
+                    if current != self.root or self.remove_root:
+                        try:
+                            force_remove(os.rmdir, current)
+                            pending.dirs += 1
+                        except FileNotFoundError:
+                            pass
+                        except OSError as e:
+                            logger.debug(f"Could not remove {current}: {e}")
+                    checkpoint(current)
+                    now = time.monotonic()
+                    if now - last_flush >= CHECKPOINT_INTERVAL:
+                        flush()
+                        last_flush = now
+                    continue
+
+                if self._stop or (deadline is not None and time.monotonic() >= deadline):
+                    logger.info(f"Deletion of {self.root} paused, it will resume on next run")
+                    return report
+
+                stack.append((current, True))
+                try:
+                    with os.scandir(current) as it:
+                        for entry in it:
+                            try:
+                                if is_link(entry):
+                                    _remove_link(entry, pending)
+                                    continue
+                                if entry.is_dir(follow_symlinks=False):
+                                    if self._relative(entry.path) not in self._done:
+                                        stack.append((entry.path, False))
+                                    continue
+                                size = sized(entry.path, entry.stat(follow_symlinks=False))
+                            except OSError as e:
+                                logger.debug(f"Cannot read {entry.path}: {e}")
+                                pending.failed += 1
+                                continue
+                            if not remove_file(entry.path, size, pending, guard=False):
+                                continue
+                            if self.throttle is not None:
+                                self.throttle.consume(1, size)
+                            if progress is not None:
+                                batch[0] += size
+                                batch[1] += 1
+                                if batch[1] >= BATCH_SIZE:
+                                    progress.add(batch[0], batch[1], current)
+                                    batch = [0, 0]
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.debug(f"Error deleting contents of {current}: {e}")
+                    pending.failed += 1
+        finally:
+            if pending.files or pending.dirs or pending.failed or pending.skipped:
+                # Totals of the unfinished directories, kept for the next run
+                checkpoint(None)
+            flush()
+            journal.close()
+            if progress is not None:
+                if batch[1]:
+                    progress.add(batch[0], batch[1], self.root)
+                progress.finish({self.root: report})
+
+        if not self._tree_gone():
+            self._restart_journal()
+            logger.warning(f"Deletion of {self.root} left files behind ({report.failed} failed), "
+                           f"they will be retried on next run")
+            return report
+        self.complete = True
+        self._finish_journal()
+        logger.info(f"Deleted {self.root}: {report.files} files, {report.freed} bytes")
+        return report
+
+    def _finish_journal(self):
+        """Remove the journal of a completed job"""
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Cannot remove deletion journal {self.journal_path}: {e}")
@@ -0,0 +1,185 @@
+"""
+Disk usage histograms
+Bytes by extension, bytes by last-modified age and file counts by size
+class, accumulated in array counters while the analyzer lists directories
+"""
+
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+from utils.disk_usage import SizeTree
+
+DAY = 86400
+
+# Upper bounds of the age buckets, in seconds since the scan
+AGE_BOUNDS = (DAY, 7 * DAY, 30 * DAY, 90 * DAY, 365 * DAY, 2 * 365 * DAY, 5 * 365 * DAY)
+AGE_LABELS = ("< 1 day", "< 1 week", "< 1 month", "< 3 months", "< 1 year",
+              "< 2 years", "< 5 years", "5 years +")
+
+# Upper bounds of the size classes, in bytes
+SIZE_BOUNDS = (1, 4 * 1024, 64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3)
+SIZE_LABELS = ("empty", "< 4 KB", "< 64 KB", "< 1 MB", "< 16 MB", "< 256 MB", "< 1 GB", "1 GB +")
+
+_AGE_COUNT = len(AGE_BOUNDS)
+
+# Size class of every bit length (a size of n bits is below 2 ** n)
+_SIZE_CLASS = [bisect_right(SIZE_BOUNDS, (1 << bits) - 1) for bits in range(65)]
+
+# Distinct extensions counted separately; the others share OTHER_EXTENSIONS
+MAX_EXTENSIONS = 4096
+NO_EXTENSION = ""
+OTHER_EXTENSIONS = "*"
+
+# (label, bytes, files)
+HistogramRow = Tuple[str, int, int]
+
+
+def _extension(name: str) -> str:
+    """Lower-case extension with its dot ("" for none, dot files included)"""
+    stem, dot, ext = name.rpartition('.')
+    return '.' + ext.lower() if dot and stem else NO_EXTENSION
+
+
+class DiskHistogram:
+    """
+    Where the space goes by type, age and size
+
+    Every bucket is a slot of 'Q' arrays (bytes and file counts), so the
+    per-file cost is a dictionary lookup and two bisections. Feed it either
+    as an analyze_tree collector (add_listing, same pass as the scan) or
+    from an already built tree (add_tree, e.g. one returned by the catalog).
+    Regular files only: links and unreadable entries are not counted.
+    """
+
+    def __init__(self, now: Optional[float] = None):
+        """
+        Args:
+            now: Reference time for ages (time of the scan by default)
+        """
+        self.now = int(time.time() if now is None else now)
+        self.extensions: Dict[str, int] = {}
+        self.ext_bytes = array('Q')
+        self.ext_files = array('Q')
+        self.age_bytes = array('Q', [0]) * len(AGE_LABELS)
+        self.age_files = array('Q', [0]) * len(AGE_LABELS)
+        self.size_bytes = array('Q', [0]) * len(SIZE_LABELS)
+        self.size_files = array('Q', [0]) * len(SIZE_LABELS)
+        # Ages compared as mtimes, oldest limit first
+        self._age_limits = [self.now - bound for bound in reversed(AGE_BOUNDS)]
+
+    def _slot(self, extension: str) -> int:
+        slot = self.extensions.get(extension)
+        if slot is None:
+            if len(self.extensions) >= MAX_EXTENSIONS:
+                extension = OTHER_EXTENSIONS
+                slot = self.extensions.get(extension)
+            if slot is None:
+                slot = len(self.ext_bytes)
+                self.extensions[extension] = slot
+                self.ext_bytes.append(0)
+                self.ext_files.append(0)
+        return slot
+
+    def add_file(self, name: str, size: int, mtime: int):
+        """Count one regular file"""
+        self._add(self._slot(_extension(name)), size, mtime)
+
+    def _add(self, slot: int, size: int, mtime: int):
+        self.ext_bytes[slot] += size
+        self.ext_files[slot] += 1
+        age = _AGE_COUNT - bisect_left(self._age_limits, mtime)
+        self.age_bytes[age] += size
+        self.age_files[age] += 1
+        size_class = _SIZE_CLASS[size.bit_length()]
+        self.size_bytes[size_class] += size
+        self.size_files[size_class] += 1
+
+    def add_listing(self, directory: str, entries: List[Tuple[str, int, int, int]]):
+        """Count the files of a (name, flags, size, mtime) listing (collector interface)"""
+        add = self._add
+        slot = self._slot
+        for name, flags, size, mtime in entries:
+            if flags == 0:
+                add(slot(_extension(name)), size, mtime)
+
+    def add_tree(self, tree: SizeTree):
+        """
+        Count every regular file of a tree, without touching the filesystem
+
+        Extensions are cut from the UTF-8 name table directly (only distinct
+        ones are decoded) and the counters are plain lists during the loop.
+        """
+        flags = tree.flags
+        sizes = tree.size
+        mtimes = tree.mtime
+        offsets = tree.name_offset
+        names = bytes(tree.names)
+        limits = self._age_limits
+        size_class = _SIZE_CLASS
+        slots: Dict[bytes, int] = {}
+        # One extra slot for OTHER_EXTENSIONS
+        ext_bytes = [0] * (MAX_EXTENSIONS + 1)
+        ext_files = [0] * (MAX_EXTENSIONS + 1)
+        age_bytes = [0] * len(AGE_LABELS)
+        age_files = [0] * len(AGE_LABELS)
+        size_bytes = [0] * len(SIZE_LABELS)
+        size_files = [0] * len(SIZE_LABELS)
+
+        for index in range(1, len(tree)):
+            if flags[index]:
+                continue
+            start = offsets[index]
+            end = offsets[index + 1]
+            dot = names.rfind(b'.', start, end)
+            raw = names[dot:end] if dot > start else b''
+            slot = slots.get(raw)
+            if slot is None:
+                slot = slots[raw] = self._slot(
+                    raw.decode('utf-8', 'surrogatepass').lower() if raw else NO_EXTENSION
+                )
+            size = sizes[index]
+            ext_bytes[slot] += size
+            ext_files[slot] += 1
+            age = _AGE_COUNT - bisect_left(limits, mtimes[index])
+            age_bytes[age] += size
+            age_files[age] += 1
+            cls = size_class[size.bit_length()]
+            size_bytes[cls] += size
+            size_files[cls] += 1
+
+        for counters, values in ((self.ext_bytes, ext_bytes), (self.ext_files, ext_files),
+                                 (self.age_bytes, age_bytes), (self.age_files, age_files),
+                                 (self.size_bytes, size_bytes), (self.size_files, size_files)):
+            for slot in range(len(counters)):
+                counters[slot] += values[slot]
+
+    def total_bytes(self) -> int:
+        return sum(self.size_bytes)
+
+    def total_files(self) -> int:
+        return sum(self.size_files)
+
+    def by_extension(self, limit: Optional[int] = None) -> List[HistogramRow]:
+        """Extensions, most bytes first"""
+        rows = sorted(
+            ((ext, self.ext_bytes[slot], self.ext_files[slot]) for ext, slot in self.extensions.items()),
+            key=lambda row: row[1], reverse=True
+        )
+        return rows[:limit] if limit is not None else rows
+
+    def by_age(self) -> List[HistogramRow]:
+        """Age buckets, most recent first"""
+        return list(zip(AGE_LABELS, self.age_bytes, self.age_files))
+
+    def by_size_class(self) -> List[HistogramRow]:
+        """Size classes, smallest first"""
+        return list(zip(SIZE_LABELS, self.size_bytes, self.size_files))
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'extensions': self.by_extension(),
+            'ages': self.by_age(),
+            'sizes': self.by_size_class(),
+        }
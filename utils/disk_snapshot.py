@@ -0,0 +1,395 @@
+"""
+Disk usage snapshots
+Stores the directory sizes of an analyzed tree as compact sorted columns,
+so that two snapshots can be compared in one linear pass without touching
+the filesystem ("what grew since last week")
+"""
+
+import os
+import time
+import zlib
+import heapq
+import struct
+import hashlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike
+from utils.disk_usage import FLAG_DIR, SizeTree
+from utils.scan_index import CACHE_DIR
+
+logger = get_logger(__name__)
+
+SNAPSHOT_DIR = CACHE_DIR / "disk_snapshots"
+
+DAY = 86400
+
+# Every snapshot of a root taken within this many seconds is kept
+SNAPSHOT_KEEP_ALL = 2 * DAY
+
+# Older snapshots are thinned to one per day, and dropped past this age
+# (the most recent snapshot of a root is always kept)
+SNAPSHOT_MAX_AGE = 365 * DAY
+
+DEFAULT_DIFF_LIMIT = 20
+
+# Snapshot header: magic, version, taken_at, directories, path table bytes, root bytes
+_HEADER = struct.Struct('<4sHdQQQ')
+_MAGIC = b'OWSS'
+_FORMAT_VERSION = 1
+
+_PATH_ERRORS = 'surrogatepass'
+
+# Paths compare as raw bytes unless normcase folds them (Windows)
+_CASE_SENSITIVE = os.path.normcase("A") == "A"
+
+
+class DiskSnapshot:
+    """
+    Directory sizes of one analysis, sorted by relative path
+
+    Columns: path_offset (n + 1 entries into a single UTF-8 path table),
+    size and count. Files are not kept, only their totals per directory;
+    the root directory has the empty relative path. Sorting by normalized
+    path once when the snapshot is taken is what makes diffs linear.
+    """
+
+    def __init__(self, root: str, taken_at: float):
+        self.root = root
+        self.taken_at = taken_at
+        self.path_offset = array('Q', [0])
+        self.paths = bytearray()
+        self.size = array('Q')
+        self.count = array('Q')
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    @classmethod
+    def from_tree(cls, tree: SizeTree, taken_at: Optional[float] = None) -> 'DiskSnapshot':
+        """Take the snapshot of an aggregated tree"""
+        if not tree.aggregated:
+            tree.aggregate()
+        snapshot = cls(tree.name(0), time.time() if taken_at is None else taken_at)
+
+        flags = tree.flags
+        parent = tree.parent
+        relative = {0: ""}
+        for index in range(1, len(tree)):
+            if flags[index] & FLAG_DIR:
+                base = relative[parent[index]]
+                name = tree.name(index)
+                relative[index] = os.path.join(base, name) if base else name
+
+        ordered = sorted(relative.items(), key=lambda item: os.path.normcase(item[1]))
+        encoded = [path.encode('utf-8', _PATH_ERRORS) for _, path in ordered]
+        offset = 0
+        for path in encoded:
+            offset += len(path)
+            snapshot.path_offset.append(offset)
+        snapshot.paths = bytearray(b''.join(encoded))
+        snapshot.size = array('Q', (tree.size[index] for index, _ in ordered))
+        snapshot.count = array('Q', (tree.count[index] for index, _ in ordered))
+        return snapshot
+
+    def path(self, index: int) -> str:
+        """Relative path of a directory ("" for the root)"""
+        start = self.path_offset[index]
+        end = self.path_offset[index + 1]
+        return self.paths[start:end].decode('utf-8', _PATH_ERRORS)
+
+    def full_path(self, index: int) -> str:
+        relative = self.path(index)
+        return os.path.join(self.root, relative) if relative else self.root
+
+    def total(self) -> int:
+        """Size of the root directory"""
+        return self.size[0] if len(self) else 0
+
+    def _keys(self) -> Iterator[bytes]:
+        """Sort keys in column order (UTF-8 bytes order like code points)"""
+        offsets = self.path_offset
+        paths = bytes(self.paths)
+        if _CASE_SENSITIVE:
+            return (paths[offsets[i]:offsets[i + 1]] for i in range(len(self)))
+        return (os.path.normcase(self.path(i)).encode('utf-8', _PATH_ERRORS)
+                for i in range(len(self)))
+
+    def to_bytes(self) -> bytes:
+        """Serialize the columns, zlib-compressed"""
+        root = self.root.encode('utf-8', _PATH_ERRORS)
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.taken_at, len(self),
+                              len(self.paths), len(root))
+        body = b''.join([self.path_offset.tobytes(), self.size.tobytes(),
+                         self.count.tobytes(), root, bytes(self.paths)])
+        return header + zlib.compress(body, 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DiskSnapshot':
+        """
+        Rebuild a snapshot serialized by to_bytes()
+
+        Raises:
+            ValueError: If the data is not a snapshot of this version
+        """
+        try:
+            magic, version, taken_at, dirs, paths, root = _HEADER.unpack_from(data)
+            body = memoryview(zlib.decompress(data[_HEADER.size:]))
+        except (struct.error, zlib.error) as e:
+            raise ValueError(f"Invalid disk snapshot data: {e}")
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("Unsupported disk snapshot format")
+
+        snapshot = cls("", taken_at)
+        offset = 0
+        for target, length in ((snapshot.path_offset, dirs + 1), (snapshot.size, dirs),
+                               (snapshot.count, dirs)):
+            end = offset + length * target.itemsize
+            del target[:]
+            target.frombytes(body[offset:end])
+            offset = end
+        snapshot.root = bytes(body[offset:offset + root]).decode('utf-8', _PATH_ERRORS)
+        snapshot.paths = bytearray(body[offset + root:])
+        if offset + root + paths != len(body) or len(snapshot.path_offset) != dirs + 1:
+            raise ValueError("Truncated disk snapshot data")
+        return snapshot
+
+    def __repr__(self):
+        return (f"DiskSnapshot({self.root!r}, taken_at={self.taken_at:.0f}, "
+                f"dirs={len(self)}, size={self.total()})")
+
+
+class DirectoryChange:
+    """Size of one directory in two snapshots (0 where it did not exist)"""
+
+    __slots__ = ('path', 'old_size', 'new_size', 'old_count', 'new_count')
+
+    def __init__(self, path: str, old_size: int, new_size: int, old_count: int, new_count: int):
+        self.path = path
+        self.old_size = old_size
+        self.new_size = new_size
+        self.old_count = old_count
+        self.new_count = new_count
+
+    @property
+    def delta(self) -> int:
+        return self.new_size - self.old_size
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'path': self.path,
+            'old_size': self.old_size,
+            'new_size': self.new_size,
+            'delta': self.delta,
+            'old_count': self.old_count,
+            'new_count': self.new_count,
+        }
+
+    def __repr__(self):
+        return f"DirectoryChange({self.path!r}, delta={self.delta:+d})"
+
+
+class SnapshotDiff:
+    """Result of diff_snapshots()"""
+
+    def __init__(self, old: DiskSnapshot, new: DiskSnapshot):
+        self.old = old
+        self.new = new
+        self.grown: List[DirectoryChange] = []
+        self.shrunk: List[DirectoryChange] = []
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+
+    @property
+    def delta(self) -> int:
+        """Growth of the root directory"""
+        return self.new.total() - self.old.total()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds between the two snapshots"""
+        return self.new.taken_at - self.old.taken_at
+
+
+def _bounded_push(heap: List[Tuple[int, int, int, int]], limit: int, item: Tuple[int, int, int, int]):
+    """Keep the limit largest items (by first field) in a min-heap"""
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item[0] > heap[0][0]:
+        heapq.heapreplace(heap, item)
+
+
+def diff_snapshots(old: DiskSnapshot, new: DiskSnapshot,
+                   limit: int = DEFAULT_DIFF_LIMIT) -> SnapshotDiff:
+    """
+    Compare two snapshots of the same root
+
+    Both path columns are sorted, so they are merged in a single pass;
+    only the limit largest growths and shrinks are kept (bounded heaps),
+    and paths are decoded only for them.
+
+    Args:
+        old: Earlier snapshot
+        new: Later snapshot
+        limit: Number of growing and shrinking directories returned
+
+    Returns:
+        SnapshotDiff with the growing and shrinking directories, largest
+        change first (a directory that disappeared shrinks by its old size)
+    """
+    result = SnapshotDiff(old, new)
+    grown: List[Tuple[int, int, int, int]] = []
+    shrunk: List[Tuple[int, int, int, int]] = []
+
+    old_keys = old._keys()
+    new_keys = new._keys()
+    i = j = 0
+    old_key = next(old_keys, None)
+    new_key = next(new_keys, None)
+    # Heap items: (absolute delta, tie breaker, old index or -1, new index or -1)
+    while old_key is not None or new_key is not None:
+        if new_key is None or (old_key is not None and old_key < new_key):
+            result.removed += 1
+            if old.size[i]:
+                _bounded_push(shrunk, limit, (old.size[i], -i, i, -1))
+            i += 1
+            old_key = next(old_keys, None)
+        elif old_key is None or new_key < old_key:
+            result.added += 1
+            if new.size[j]:
+                _bounded_push(grown, limit, (new.size[j], -j, -1, j))
+            j += 1
+            new_key = next(new_keys, None)
+        else:
+            delta = new.size[j] - old.size[i]
+            if delta > 0:
+                result.changed += 1
+                _bounded_push(grown, limit, (delta, -j, i, j))
+            elif delta < 0:
+                result.changed += 1
+                _bounded_push(shrunk, limit, (-delta, -j, i, j))
+            i += 1
+            j += 1
+            old_key = next(old_keys, None)
+            new_key = next(new_keys, None)
+
+    def change(item: Tuple[int, int, int, int]) -> DirectoryChange:
+        _, _, i, j = item
+        path = new.full_path(j) if j >= 0 else old.full_path(i)
+        return DirectoryChange(
+            path,
+            old.size[i] if i >= 0 else 0, new.size[j] if j >= 0 else 0,
+            old.count[i] if i >= 0 else 0, new.count[j] if j >= 0 else 0,
+        )
+
+    result.grown = [change(item) for item in sorted(grown, reverse=True)]
+    result.shrunk = [change(item) for item in sorted(shrunk, reverse=True)]
+    return result
+
+
+def _root_key(root: str) -> str:
+    key = os.path.normcase(os.path.abspath(root))
+    return hashlib.sha1(key.encode('utf-8', _PATH_ERRORS)).hexdigest()[:16]
+
+
+class SnapshotStore:
+    """
+    Snapshot files of every analyzed root, one folder per root
+
+    Retention is by age: recent snapshots are all kept, older ones are
+    thinned to the last of each day so that "since last month" still has
+    a baseline however often the tree is analyzed.
+    """
+
+    def __init__(self, directory: PathLike = SNAPSHOT_DIR,
+                 keep_all: float = SNAPSHOT_KEEP_ALL, max_age: float = SNAPSHOT_MAX_AGE):
+        self.directory = Path(directory)
+        self.keep_all = keep_all
+        self.max_age = max_age
+
+    def _root_dir(self, root: str) -> Path:
+        return self.directory / _root_key(root)
+
+    def save(self, snapshot: DiskSnapshot) -> Path:
+        """Write a snapshot and prune the older ones of its root"""
+        folder = self._root_dir(snapshot.root)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{int(snapshot.taken_at * 1000):015d}.snap"
+        temp = path.with_suffix(".tmp")
+        temp.write_bytes(snapshot.to_bytes())
+        os.replace(temp, path)
+        self.prune(snapshot.root)
+        return path
+
+    def prune(self, root: PathLike, now: Optional[float] = None):
+        """Drop the snapshots of a root that the retention policy does not keep"""
+        now = time.time() if now is None else now
+        stored = self.list(root)
+        days = set()
+        # Newest first; the latest snapshot is always kept
+        for taken_at, path in reversed(stored[:-1]):
+            age = now - taken_at
+            if age <= self.keep_all:
+                continue
+            day = time.localtime(taken_at)[:3]
+            if age <= self.max_age and day not in days:
+                days.add(day)
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.debug(f"Cannot remove snapshot {path}: {e}")
+
+    def list(self, root: PathLike) -> List[Tuple[float, Path]]:
+        """(taken_at, file) of the stored snapshots of a root, oldest first"""
+        folder = self._root_dir(os.fspath(root))
+        if not folder.is_dir():
+            return []
+        stored = []
+        for path in folder.glob("*.snap"):
+            try:
+                stored.append((int(path.stem) / 1000, path))
+            except ValueError:
+                continue
+        stored.sort()
+        return stored
+
+    def load(self, path: PathLike) -> DiskSnapshot:
+        """
+        Read a snapshot file
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If it is not a valid snapshot
+        """
+        return DiskSnapshot.from_bytes(Path(path).read_bytes())
+
+    def latest(self, root: PathLike, before: Optional[float] = None) -> Optional[DiskSnapshot]:
+        """Most recent snapshot of a root, optionally taken at or before a time"""
+        for taken_at, path in reversed(self.list(root)):
+            if before is not None and taken_at > before:
+                continue
+            try:
+                return self.load(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+    def baseline(self, root: PathLike, age: float) -> Optional[DiskSnapshot]:
+        """
+        Snapshot to compare against for "since age seconds ago"
+
+        The latest snapshot at least age old, or the oldest one if none is.
+        """
+        snapshot = self.latest(root, before=time.time() - age)
+        if snapshot is None:
+            stored = self.list(root)
+            if stored:
+                try:
+                    snapshot = self.load(stored[0][1])
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable snapshot {stored[0][1]}: {e}")
+        return snapshot
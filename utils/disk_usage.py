@@ -0,0 +1,442 @@
+"""
+Disk usage analyzer
+Lists a directory tree on a thread pool and stores it as a compact,
+array-backed size tree (no Python object per node)
+"""
+
+import os
+import struct
+import threading
+from array import array
+from collections import deque
+from itertools import accumulate
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, is_link
+from utils.progress import DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+from utils.size_accounting import get_size_provider
+
+logger = get_logger(__name__)
+
+DEFAULT_ANALYZER_WORKERS = 8
+MAX_ANALYZER_WORKERS = 64
+
+# Directories listed ahead per worker (bounds the number of pending futures)
+PREFETCH_PER_WORKER = 4
+
+FLAG_DIR = 1
+FLAG_LINK = 2
+FLAG_ERROR = 4
+
+# Serialized tree header: magic, version, nodes, name table bytes, listed dirs
+_HEADER = struct.Struct('<4sHQQQ')
+_MAGIC = b'OWST'
+_FORMAT_VERSION = 2
+
+# Modification times are stored as unsigned 32-bit seconds
+MAX_MTIME = 0xFFFFFFFF
+
+# Names are stored as UTF-8; surrogates survive the round trip (undecodable
+# bytes on POSIX, unpaired UTF-16 halves on Windows)
+_NAME_ERRORS = 'surrogatepass'
+
+# (name, flags, size, mtime) for one entry of a listed directory; mtime is
+# in whole seconds and 0 for directories
+_Listing = List[Tuple[str, int, int, int]]
+
+# Receives (directory path, listing) for every listed directory, on the
+# thread running analyze_tree (e.g. LargeFileFinder.add_listing)
+ListingCollector = Callable[[str, _Listing], None]
+
+# Lists one directory on a worker thread (None if it cannot be read)
+Lister = Callable[[str], Optional[_Listing]]
+
+
+class SizeTree:
+    """
+    Directory tree stored in parallel arrays
+
+    Node i has a parent index, a size and a file count (both cumulative
+    for directories once aggregated), flags, a modification time (files
+    only) and the offset of its name in a single UTF-8 string table. The children of a directory are stored
+    contiguously (first_child, child_count), so drilling into any folder is
+    a slice. Node 0 is the scanned root, whose name is its full path.
+    """
+
+    def __init__(self, root: str = ""):
+        self.parent = array('i')
+        self.size = array('Q')
+        self.count = array('Q')
+        self.flags = array('B')
+        self.mtime = array('I')
+        self.first_child = array('i')
+        self.child_count = array('I')
+        # name_offset has one extra trailing entry: name i ends where i + 1 starts
+        self.name_offset = array('Q', [0])
+        self.names = bytearray()
+        # Directories in the order they were listed (parents before children)
+        self.listed = array('i')
+        self.aggregated = False
+        # Nodes left unreachable by replace_children (dropped by compact)
+        self.garbage = 0
+        if root:
+            self.add(-1, root, FLAG_DIR, 0)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, parent: int, name: str, flags: int, size: int, mtime: int = 0) -> int:
+        """Append a node and return its index (children must be added together)"""
+        index = len(self.parent)
+        self.parent.append(parent)
+        self.size.append(size)
+        self.count.append(0 if flags & FLAG_DIR else 1)
+        self.flags.append(flags)
+        self.mtime.append(mtime)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.names += name.encode('utf-8', _NAME_ERRORS)
+        self.name_offset.append(len(self.names))
+        return index
+
+    def add_children(self, parent: int, entries: _Listing) -> int:
+        """Append the listing of a directory as its contiguous children"""
+        first = len(self.parent)
+        if not entries:
+            return first
+        total = len(entries)
+        names, flags, sizes, mtimes = zip(*entries)
+        encoded = [name.encode('utf-8', _NAME_ERRORS) for name in names]
+
+        # Whole-listing extends: no per-node Python object is kept
+        self.parent.extend(array('i', [parent]) * total)
+        self.size.extend(array('Q', sizes))
+        self.count.extend(array('Q', [0 if f & FLAG_DIR else 1 for f in flags]))
+        self.flags.extend(array('B', flags))
+        self.mtime.extend(array('I', mtimes))
+        self.first_child.extend(array('i', [-1]) * total)
+        self.child_count.extend(array('I', [0]) * total)
+        self.name_offset.extend(accumulate(map(len, encoded), initial=len(self.names)))
+        del self.name_offset[-total - 1]
+        self.names += b''.join(encoded)
+
+        self.first_child[parent] = first
+        self.child_count[parent] = total
+        self.listed.append(parent)
+        return first
+
+    def replace_children(self, index: int, entries: _Listing) -> int:
+        """
+        Replace the children of a listed directory by a new listing
+
+        The new listing is appended as a fresh contiguous block; directories
+        present in both listings keep their subtree, size and count (their
+        own children are re-parented). New directories are empty until
+        listed. The old block stays in the arrays but is unreachable from
+        the root: walks through children() are exact, while whole-array
+        scans (aggregate, iter_files, directory_paths...) need compact().
+
+        Returns:
+            Index of the first new child
+        """
+        old = self.children(index)
+        kept = {self.name(c): c for c in old if self.flags[c] & FLAG_DIR}
+        self.garbage += len(old)
+        first = len(self.parent)
+        self.first_child[index] = -1
+        self.child_count[index] = 0
+        if entries:
+            self.add_children(index, entries)
+            self.listed.pop()
+        for offset, (name, flags, _, _) in enumerate(entries):
+            previous = kept.get(name)
+            if previous is None or not flags & FLAG_DIR:
+                continue
+            node = first + offset
+            self.size[node] = self.size[previous]
+            self.count[node] = self.count[previous]
+            self.first_child[node] = self.first_child[previous]
+            self.child_count[node] = self.child_count[previous]
+            for child in self.children(node):
+                self.parent[child] = node
+        return first
+
+    def compact(self) -> 'SizeTree':
+        """Copy of the tree holding only the nodes reachable from the root"""
+        tree = SizeTree(self.name(0))
+        tree.flags[0] = self.flags[0]
+        pending = deque([(0, 0)])
+        while pending:
+            old, new = pending.popleft()
+            children = self.children(old)
+            if self.first_child[old] < 0:
+                continue
+            first = tree.add_children(new, [
+                (self.name(c), self.flags[c], self.size[c], self.mtime[c]) for c in children
+            ])
+            pending.extend((c, first + offset) for offset, c in enumerate(children)
+                           if self.flags[c] & FLAG_DIR)
+        tree.aggregate()
+        return tree
+
+    def aggregate(self):
+        """
+        Roll file sizes and counts up into every directory
+
+        A directory is always listed after its parent, so walking the listed
+        directories backwards sees complete subtrees; each directory costs
+        two C-level sums over its contiguous children.
+        """
+        size = self.size
+        count = self.count
+        for index in reversed(self.listed):
+            first = self.first_child[index]
+            end = first + self.child_count[index]
+            size[index] = sum(size[first:end])
+            count[index] = sum(count[first:end])
+        self.aggregated = True
+
+    def name(self, index: int) -> str:
+        """Name of a node (full path for the root)"""
+        start = self.name_offset[index]
+        end = self.name_offset[index + 1]
+        return self.names[start:end].decode('utf-8', _NAME_ERRORS)
+
+    def path(self, index: int) -> str:
+        """Full path of a node"""
+        parts = []
+        while index > 0:
+            parts.append(self.name(index))
+            index = self.parent[index]
+        parts.append(self.name(0))
+        return os.path.join(*reversed(parts))
+
+    def is_dir(self, index: int) -> bool:
+        return bool(self.flags[index] & FLAG_DIR)
+
+    def children(self, index: int) -> range:
+        """Indexes of the direct children of a node"""
+        first = self.first_child[index]
+        if first < 0:
+            return range(0)
+        return range(first, first + self.child_count[index])
+
+    def largest_children(self, index: int, limit: Optional[int] = None) -> List[int]:
+        """Direct children of a node, largest first"""
+        size = self.size
+        ordered = sorted(self.children(index), key=size.__getitem__, reverse=True)
+        return ordered[:limit] if limit is not None else ordered
+
+    def find(self, path: PathLike) -> int:
+        """
+        Index of a path inside the tree
+
+        Raises:
+            KeyError: If the path is not below the root or was not scanned
+        """
+        root = self.name(0)
+        relative = os.path.relpath(os.fspath(path), root)
+        if relative == os.curdir:
+            return 0
+        if relative.startswith(os.pardir):
+            raise KeyError(path)
+
+        index = 0
+        for part in relative.split(os.sep):
+            wanted = os.path.normcase(part)
+            for child in self.children(index):
+                if os.path.normcase(self.name(child)) == wanted:
+                    index = child
+                    break
+            else:
+                raise KeyError(path)
+        return index
+
+    def iter_files(self) -> Iterator[int]:
+        """Indexes of every file (non-directory) node"""
+        flags = self.flags
+        return (i for i in range(len(self)) if not flags[i] & FLAG_DIR)
+
+    def directory_paths(self) -> Dict[int, str]:
+        """Full path of every directory node, by index"""
+        flags = self.flags
+        parent = self.parent
+        paths = {0: self.name(0)}
+        # A directory always has a higher index than its parent
+        for index in range(1, len(self)):
+            if flags[index] & FLAG_DIR:
+                paths[index] = os.path.join(paths[parent[index]], self.name(index))
+        return paths
+
+    def _arrays(self) -> Tuple[array, ...]:
+        return (self.parent, self.size, self.count, self.flags, self.mtime, self.first_child,
+                self.child_count, self.name_offset, self.listed)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the arrays and the string table (native byte order)"""
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(self), len(self.names), len(self.listed))
+        return b''.join([header] + [a.tobytes() for a in self._arrays()] + [bytes(self.names)])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SizeTree':
+        """
+        Rebuild a tree serialized by to_bytes()
+
+        Raises:
+            ValueError: If the data is not a serialized tree of this version
+        """
+        view = memoryview(data)
+        try:
+            magic, version, nodes, names, listed = _HEADER.unpack_from(view)
+        except struct.error as e:
+            raise ValueError(f"Invalid size tree data: {e}")
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError("Unsupported size tree format")
+
+        tree = cls()
+        offset = _HEADER.size
+        lengths = (nodes, nodes, nodes, nodes, nodes, nodes, nodes, nodes + 1, listed)
+        for target, length in zip(tree._arrays(), lengths):
+            end = offset + length * target.itemsize
+            del target[:]
+            target.frombytes(view[offset:end])
+            if len(target) != length:
+                raise ValueError("Truncated size tree data")
+            offset = end
+        tree.names = bytearray(view[offset:offset + names])
+        if len(tree.names) != names:
+            raise ValueError("Truncated size tree data")
+        tree.aggregated = True
+        return tree
+
+    def memory_usage(self) -> int:
+        """Bytes used by the arrays and the string table"""
+        return sum(a.buffer_info()[1] * a.itemsize for a in self._arrays()) + len(self.names)
+
+    def __repr__(self):
+        root = self.name(0) if len(self) else ""
+        return f"SizeTree({root!r}, nodes={len(self)}, size={self.size[0] if len(self) else 0})"
+
+
+def list_directory(path: str) -> Optional[_Listing]:
+    """List one directory as (name, flags, size, mtime) entries"""
+    entries: _Listing = []
+    sized = get_size_provider()
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                size = 0
+                mtime = 0
+                try:
+                    if is_link(entry):
+                        flags = FLAG_LINK
+                    elif entry.is_dir(follow_symlinks=False):
+                        flags = FLAG_DIR
+                    else:
+                        flags = 0
+                    if flags != FLAG_DIR:
+                        st = entry.stat(follow_symlinks=False)
+                        size = sized(entry.path, st)
+                        mtime = min(max(int(st.st_mtime), 0), MAX_MTIME)
+                except OSError:
+                    flags = FLAG_ERROR
+                    size = 0
+                entries.append((entry.name, flags, size, mtime))
+    except OSError as e:
+        logger.debug(f"Cannot list {path}: {e}")
+        return None
+    return entries
+
+
+def resolve_analyzer_workers(workers: Optional[int]) -> int:
+    """Clamp a configured worker count to a sane range"""
+    if not workers:
+        return DEFAULT_ANALYZER_WORKERS
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        return DEFAULT_ANALYZER_WORKERS
+    return max(1, min(workers, MAX_ANALYZER_WORKERS))
+
+
+def analyze_tree(
+    root: PathLike,
+    workers: Optional[int] = None,
+    on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+    interval: float = DEFAULT_INTERVAL,
+    cancel: Optional[threading.Event] = None,
+    collectors: Optional[List[ListingCollector]] = None,
+    lister: Optional[Lister] = None
+) -> SizeTree:
+    """
+    Build the size tree of a directory
+
+    Directories are listed in parallel by the pool (os.scandir releases the
+    GIL); the calling thread appends each listing to the tree, so the
+    children of every directory stay contiguous. Symlinks and junctions are
+    recorded but never followed.
+
+    Args:
+        root: Directory to analyze
+        workers: Number of listing threads
+        on_progress: Receives rate-limited ProgressEvent updates, then a
+                     final event with done=True and the tree as results
+        interval: Minimum delay in seconds between two progress events
+        cancel: Set to stop the scan early (the partial tree is returned)
+        collectors: Extra consumers of each listing, fed in the same pass
+        lister: Replaces os.scandir listing (e.g. FileCatalog.list_directory)
+
+    Returns:
+        Aggregated SizeTree
+    """
+    root_path = os.path.abspath(os.fspath(root))
+    tree = SizeTree(root_path)
+    workers = resolve_analyzer_workers(workers)
+    progress = ProgressThrottle(on_progress, "analyze", interval) if on_progress else None
+
+    # Directories waiting to be listed: (node index, path)
+    waiting: Deque[Tuple[int, str]] = deque([(0, root_path)])
+    in_flight: Dict = {}
+    limit = workers * PREFETCH_PER_WORKER
+    lister = lister or list_directory
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analyzer") as pool:
+        while waiting or in_flight:
+            if cancel is not None and cancel.is_set():
+                logger.info(f"Analysis of {root_path} cancelled")
+                for future in in_flight:
+                    future.cancel()
+                break
+
+            while waiting and len(in_flight) < limit:
+                index, path = waiting.popleft()
+                in_flight[pool.submit(lister, path)] = (index, path)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, path = in_flight.pop(future)
+                entries = future.result()
+                if entries is None:
+                    tree.flags[index] |= FLAG_ERROR
+                    continue
+
+                first = tree.add_children(index, entries)
+                if collectors:
+                    for collector in collectors:
+                        collector(path, entries)
+                listed_size = 0
+                listed_files = 0
+                for offset, (name, flags, size, _) in enumerate(entries):
+                    if flags & FLAG_DIR:
+                        waiting.append((first + offset, os.path.join(path, name)))
+                    else:
+                        listed_size += size
+                        listed_files += 1
+                if progress is not None:
+                    progress.add(listed_size, listed_files, path)
+
+    tree.aggregate()
+    if progress is not None:
+        progress.finish({root_path: tree})
+    return tree
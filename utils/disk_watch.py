@@ -0,0 +1,298 @@
+"""
+Live disk usage
+Keeps an analyzed size tree current after the scan: a watcher reports the
+directories whose entries changed, only those are listed again and the
+size difference is propagated up the parent chain
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional
+from utils.logger import get_logger
+from utils.disk_usage import FLAG_DIR, FLAG_ERROR, Lister, SizeTree, list_directory
+
+logger = get_logger(__name__)
+
+# Seconds between two polls of the watched directories
+DEFAULT_POLL_INTERVAL = 2.0
+
+# compact() once unreachable nodes outnumber the live ones
+COMPACT_RATIO = 1.0
+
+
+class DirectoryWatcher(ABC):
+    """
+    Source of changed directories
+
+    Implementations report directories whose list of entries changed
+    (creation, deletion or rename inside them). Backends built on OS
+    notifications (ReadDirectoryChangesW, inotify, watchdog...) can replace
+    the default PollingWatcher.
+    """
+
+    @abstractmethod
+    def watch(self, paths: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def unwatch(self, paths: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def changes(self, timeout: float) -> List[str]:
+        """Changed directories, waiting at most timeout seconds for some"""
+
+    def close(self):
+        pass
+
+
+class PollingWatcher(DirectoryWatcher):
+    """
+    Polls the mtime of every watched directory
+
+    Costs one stat per directory and poll. A directory mtime changes when
+    an entry is created, deleted or renamed, not when a file grows in
+    place: such growth is picked up the next time its directory changes.
+    """
+
+    def __init__(self):
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError:
+            return None
+
+    def watch(self, paths: Iterable[str]):
+        mtimes = {path: self._mtime(path) for path in paths}
+        with self._lock:
+            self._mtimes.update(mtimes)
+
+    def unwatch(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                self._mtimes.pop(path, None)
+
+    def changes(self, timeout: float) -> List[str]:
+        if self._closed.wait(timeout):
+            return []
+        with self._lock:
+            watched = list(self._mtimes.items())
+        changed = []
+        for path, mtime in watched:
+            current = self._mtime(path)
+            if current != mtime:
+                changed.append(path)
+        with self._lock:
+            for path in changed:
+                if path in self._mtimes:
+                    self._mtimes[path] = self._mtime(path)
+        return changed
+
+    def close(self):
+        self._closed.set()
+
+
+class TreeChange:
+    """Size change of one relisted directory (also applied to its parents)"""
+
+    __slots__ = ('path', 'size_delta', 'count_delta')
+
+    def __init__(self, path: str, size_delta: int, count_delta: int):
+        self.path = path
+        self.size_delta = size_delta
+        self.count_delta = count_delta
+
+    def __repr__(self):
+        return f"TreeChange({self.path!r}, size={self.size_delta:+d}, files={self.count_delta:+d})"
+
+
+class LiveTree:
+    """
+    Size tree kept current by a directory watcher
+
+    Changed directories are listed again (new subdirectories are listed
+    entirely) and the difference in cumulative size and file count is
+    added to every ancestor, so the root total stays exact without a
+    rescan. Tree updates happen under lock; readers on other threads
+    (e.g. the UI) take it as well.
+    """
+
+    def __init__(
+        self,
+        tree: SizeTree,
+        watcher: Optional[DirectoryWatcher] = None,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        on_change: Optional[Callable[[List[TreeChange]], None]] = None,
+        lister: Optional[Lister] = None
+    ):
+        """
+        Args:
+            tree: Aggregated tree (from analyze_tree or the file catalog)
+            watcher: Change source (PollingWatcher by default)
+            interval: Seconds between two checks for changes
+            on_change: Receives the changes applied by each update, on the
+                       watch thread
+            lister: Replaces utils.disk_usage.list_directory
+        """
+        self.tree = tree
+        self.watcher = watcher or PollingWatcher()
+        self.interval = interval
+        self.on_change = on_change
+        self.lister = lister or list_directory
+        self.lock = threading.RLock()
+        self.updates = 0
+        # Incremented when the tree is compacted: node indexes change
+        self.compactions = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if not tree.aggregated:
+            tree.aggregate()
+        self._dirs: Dict[str, int] = {
+            path: index for index, path in tree.directory_paths().items()
+            if not tree.flags[index] & FLAG_ERROR
+        }
+        self.watcher.watch(self._dirs)
+
+    def start(self):
+        """Watch for changes on a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="disk-watch")
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching (the tree keeps its last state)"""
+        self._stop.set()
+        self.watcher.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                changed = self.watcher.changes(self.interval)
+                if changed and not self._stop.is_set():
+                    self.apply(changed)
+            except Exception as e:
+                logger.error(f"Live disk update error: {e}")
+
+    def apply(self, paths: Iterable[str]) -> List[TreeChange]:
+        """List changed directories again and update the totals"""
+        changes = []
+        with self.lock:
+            # Parents first: a directory removed with its parent is skipped
+            for path in sorted(set(paths), key=len):
+                index = self._dirs.get(path)
+                if index is None:
+                    continue
+                change = self._relist(path, index)
+                if change is not None:
+                    changes.append(change)
+            tree = self.tree
+            if tree.garbage > COMPACT_RATIO * (len(tree) - tree.garbage):
+                self._compact()
+        self.updates += 1
+        if changes and self.on_change is not None:
+            self.on_change(changes)
+        return changes
+
+    def _relist(self, path: str, index: int) -> Optional[TreeChange]:
+        """Replace the listing of one directory"""
+        entries = self.lister(path)
+        if entries is None:
+            # Gone: its parent changed too and will drop it
+            return None
+        tree = self.tree
+        size = tree.size
+        count = tree.count
+        old_size = size[index]
+        old_count = count[index]
+        # Subdirectories still in the listing are removed from this map
+        gone = {tree.name(c): c for c in tree.children(index) if tree.flags[c] & FLAG_DIR}
+
+        first = tree.replace_children(index, entries)
+        added: List[int] = []
+        for offset, (name, flags, _, _) in enumerate(entries):
+            if flags & FLAG_DIR:
+                if gone.pop(name, None) is None:
+                    added.append(first + offset)
+                else:
+                    self._dirs[os.path.join(path, name)] = first + offset
+        self._forget(gone.values(), path)
+        for node in added:
+            self._scan(node, os.path.join(path, tree.name(node)))
+
+        end = first + len(entries)
+        size[index] = sum(size[first:end])
+        count[index] = sum(count[first:end])
+        size_delta = size[index] - old_size
+        count_delta = count[index] - old_count
+        parent = tree.parent[index]
+        while parent >= 0:
+            size[parent] += size_delta
+            count[parent] += count_delta
+            parent = tree.parent[parent]
+        return TreeChange(path, size_delta, count_delta)
+
+    def _scan(self, index: int, path: str):
+        """List a new directory and its whole subtree, then aggregate it"""
+        tree = self.tree
+        listed = []
+        pending = [(index, path)]
+        while pending:
+            node, node_path = pending.pop()
+            self._dirs[node_path] = node
+            # Watched before listing: a change made meanwhile is not missed
+            self.watcher.watch([node_path])
+            entries = self.lister(node_path)
+            if entries is None:
+                tree.flags[node] |= FLAG_ERROR
+                continue
+            first = tree.add_children(node, entries)
+            listed.append(node)
+            pending.extend(
+                (first + offset, os.path.join(node_path, name))
+                for offset, (name, flags, _, _) in enumerate(entries) if flags & FLAG_DIR
+            )
+        for node in reversed(listed):
+            first = tree.first_child[node]
+            end = first + tree.child_count[node]
+            tree.size[node] = sum(tree.size[first:end])
+            tree.count[node] = sum(tree.count[first:end])
+
+    def _forget(self, removed: Iterable[int], parent_path: str):
+        """Stop watching removed directories and everything below them"""
+        tree = self.tree
+        paths = []
+        pending = [(node, os.path.join(parent_path, tree.name(node))) for node in removed]
+        while pending:
+            node, path = pending.pop()
+            paths.append(path)
+            self._dirs.pop(path, None)
+            pending.extend((c, os.path.join(path, tree.name(c)))
+                           for c in tree.children(node) if tree.flags[c] & FLAG_DIR)
+        if paths:
+            self.watcher.unwatch(paths)
+
+    def _compact(self):
+        """Drop unreachable nodes (directory indexes are renumbered)"""
+        self.tree = self.tree.compact()
+        self.compactions += 1
+        self._dirs = {
+            path: index for index, path in self.tree.directory_paths().items()
+            if not self.tree.flags[index] & FLAG_ERROR
+        }
+        logger.debug(f"Live tree compacted to {len(self.tree):,} nodes")
+
+    def snapshot(self) -> SizeTree:
+        """Compact copy of the current tree, for whole-array consumers"""
+        with self.lock:
+            return self.tree.compact()
@@ -0,0 +1,301 @@
+"""
+Duplicate file finder
+Staged pipeline: files are grouped by size, then by a hash of their first
+and last 64 KiB, and only the remaining collisions are hashed entirely
+"""
+
+import os
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, is_link, iter_files
+from utils.progress import DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+
+logger = get_logger(__name__)
+
+# Bytes hashed at each end of a file by the partial stage
+PARTIAL_BLOCK = 64 * 1024
+
+# Read buffer of the full hash stage
+FULL_HASH_BUFFER = 1024 * 1024
+
+DEFAULT_HASH_WORKERS = 4
+
+# (st_dev, st_ino) identifying a file whatever its name
+FileId = Tuple[int, int]
+
+HASH_PARTIAL = "partial"
+HASH_FULL = "full"
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=20)
+
+
+def partial_hash(path: str, size: int) -> str:
+    """Hash of the first and last PARTIAL_BLOCK bytes (whole file if small)"""
+    digest = _new_hash()
+    with open(path, 'rb', buffering=0) as f:
+        digest.update(f.read(PARTIAL_BLOCK))
+        if size > 2 * PARTIAL_BLOCK:
+            f.seek(-PARTIAL_BLOCK, os.SEEK_END)
+            digest.update(f.read(PARTIAL_BLOCK))
+        elif size > PARTIAL_BLOCK:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def full_hash(path: str, progress: Optional[ProgressThrottle] = None) -> str:
+    """Streaming hash of a whole file through a large reusable buffer"""
+    digest = _new_hash()
+    buffer = bytearray(FULL_HASH_BUFFER)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+            if progress is not None:
+                progress.add(read, 0, path)
+    return digest.hexdigest()
+
+
+def _outermost(roots: Iterable[PathLike]) -> List[str]:
+    """Drop roots listed twice or nested in another root"""
+    normalized = {os.path.normcase(os.path.abspath(os.fspath(r))): os.fspath(r) for r in roots}
+    kept = []
+    for key in sorted(normalized):
+        if kept and (key == kept[-1][0] or key.startswith(kept[-1][0].rstrip(os.sep) + os.sep)):
+            continue
+        kept.append((key, normalized[key]))
+    return [root for _, root in kept]
+
+
+class DuplicateSet:
+    """Files with identical contents"""
+
+    def __init__(self, size: int, digest: str, paths: List[str],
+                 links: Optional[Dict[str, List[str]]] = None):
+        self.size = size
+        self.digest = digest
+        # One path per distinct file (inode)
+        self.paths = paths
+        # Extra names of the same inode: path -> hard links sharing its data
+        self.links = links or {}
+
+    @property
+    def reclaimable(self) -> int:
+        """Bytes freed by keeping a single copy"""
+        return self.size * (len(self.paths) - 1)
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'size': self.size,
+            'digest': self.digest,
+            'paths': self.paths,
+            'links': self.links,
+            'reclaimable': self.reclaimable,
+        }
+
+    def __repr__(self):
+        return (f"DuplicateSet(size={self.size}, copies={len(self.paths)}, "
+                f"reclaimable={self.reclaimable})")
+
+
+class HashCache(ABC):
+    """Stored digests, valid while a file keeps its size and mtime"""
+
+    @abstractmethod
+    def get_hash(self, kind: str, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def put_hash(self, kind: str, path: str, size: int, mtime_ns: int, digest: str):
+        pass
+
+
+class DuplicateFinder:
+    """
+    Find duplicate files below one or more folders
+
+    Stage 1 groups files by size (sizes seen once are dropped without any
+    read). Hard links to the same inode are merged into one candidate,
+    since they do not use extra space; nested roots are walked once.
+    Stage 2 hashes the first and last 64 KiB of each candidate and stage 3
+    fully hashes the files that still collide; both run on a thread pool.
+    """
+
+    def __init__(self, min_size: int = 1, workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+                 interval: float = DEFAULT_INTERVAL,
+                 cancel: Optional[threading.Event] = None,
+                 cache: Optional[HashCache] = None):
+        """
+        Args:
+            min_size: Smaller files are ignored (empty files by default)
+            workers: Number of hashing threads
+            on_progress: Receives the bytes hashed as rate-limited events
+            interval: Minimum delay in seconds between two progress events
+            cancel: Set to stop early (sets found so far are returned)
+            cache: Digests reused when size and mtime did not change
+                   (e.g. utils.file_catalog.FileCatalog)
+        """
+        self.min_size = max(1, min_size)
+        self.workers = workers or DEFAULT_HASH_WORKERS
+        self.on_progress = on_progress
+        self.interval = interval
+        self.cancel = cancel
+        self.cache = cache
+        self.files_scanned = 0
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        self.reused = 0
+        # Modification time of every candidate, for the hash cache
+        self._mtimes: Dict[str, int] = {}
+
+    def _cancelled(self) -> bool:
+        return self.cancel is not None and self.cancel.is_set()
+
+    def _group_by_size(self, roots: Iterable[PathLike]) -> Dict[int, List[str]]:
+        """Stage 1: sizes shared by at least two files"""
+        by_size: Dict[int, List[str]] = {}
+        for root in _outermost(roots):
+            for entry in iter_files(root):
+                if self._cancelled():
+                    return {}
+                try:
+                    if is_link(entry):
+                        continue
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                self.files_scanned += 1
+                if size >= self.min_size:
+                    by_size.setdefault(size, []).append(entry.path)
+        return {size: paths for size, paths in by_size.items() if len(paths) > 1}
+
+    def _merge_inodes(self, paths: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Keep one path per inode; the other names are returned as links"""
+        by_id: Dict[FileId, List[str]] = {}
+        for path in paths:
+            try:
+                # os.stat (not the DirEntry) fills st_ino/st_dev on Windows
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            by_id.setdefault((st.st_dev, st.st_ino), []).append(path)
+            self._mtimes[path] = st.st_mtime_ns
+
+        unique = []
+        links: Dict[str, List[str]] = {}
+        for names in by_id.values():
+            unique.append(names[0])
+            if len(names) > 1:
+                links[names[0]] = names[1:]
+        return unique, links
+
+    def _hash_groups(self, pool: ThreadPoolExecutor, groups: List[Tuple[int, List[str]]],
+                     hasher: Callable[[str, int], str]) -> List[Tuple[int, str, List[str]]]:
+        """Split each group by hasher(path, size), keeping collisions only"""
+        jobs = [
+            (size, path, pool.submit(hasher, path, size))
+            for size, paths in groups for path in paths
+        ]
+        split: Dict[Tuple[int, str], List[str]] = {}
+        for size, path, future in jobs:
+            if self._cancelled():
+                future.cancel()
+                continue
+            try:
+                digest = future.result()
+            except OSError as e:
+                logger.debug(f"Cannot hash {path}: {e}")
+                continue
+            split.setdefault((size, digest), []).append(path)
+        return [(size, digest, paths) for (size, digest), paths in split.items() if len(paths) > 1]
+
+    def find(self, roots: Iterable[PathLike]) -> List[DuplicateSet]:
+        """
+        Run the pipeline
+
+        Returns:
+            Duplicate sets, most reclaimable bytes first
+        """
+        progress = ProgressThrottle(self.on_progress, "duplicates", self.interval) \
+            if self.on_progress else None
+
+        groups = []
+        links: Dict[str, List[str]] = {}
+        for size, paths in self._group_by_size(roots).items():
+            unique, group_links = self._merge_inodes(paths)
+            links.update(group_links)
+            if len(unique) > 1:
+                groups.append((size, unique))
+
+        def cached(kind: str, compute: Callable[[str, int], str]) -> Callable[[str, int], str]:
+            if self.cache is None:
+                return compute
+
+            def hasher(path: str, size: int) -> str:
+                mtime_ns = self._mtimes.get(path, 0)
+                digest = self.cache.get_hash(kind, path, size, mtime_ns)
+                if digest is not None:
+                    self.reused += 1
+                    return digest
+                digest = compute(path, size)
+                self.cache.put_hash(kind, path, size, mtime_ns, digest)
+                return digest
+            return hasher
+
+        def partial(path: str, size: int) -> str:
+            self.partial_hashed += 1
+            digest = partial_hash(path, size)
+            if progress is not None:
+                progress.add(min(size, 2 * PARTIAL_BLOCK), 1, path)
+            return digest
+
+        def full(path: str, size: int) -> str:
+            self.full_hashed += 1
+            return full_hash(path, progress)
+
+        partial = cached(HASH_PARTIAL, partial)
+        full = cached(HASH_FULL, full)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher") as pool:
+            survivors = []
+            for size, digest, paths in self._hash_groups(pool, groups, partial):
+                if size <= 2 * PARTIAL_BLOCK:
+                    # The partial hash already covered the whole file
+                    results.append(DuplicateSet(size, digest, paths))
+                else:
+                    survivors.append((size, paths))
+
+            for size, digest, paths in self._hash_groups(pool, survivors, full):
+                results.append(DuplicateSet(size, digest, paths))
+
+        for duplicate in results:
+            duplicate.links = {path: links[path] for path in duplicate.paths if path in links}
+
+        results.sort(key=lambda d: d.reclaimable, reverse=True)
+        if progress is not None:
+            progress.finish({'sets': results})
+        logger.debug(f"Duplicates: {self.files_scanned} files, {self.partial_hashed} partial "
+                     f"and {self.full_hashed} full hashes, {self.reused} reused, "
+                     f"{len(results)} sets")
+        return results
+
+
+def find_duplicates(roots: Iterable[PathLike], min_size: int = 1, **kwargs) -> List[DuplicateSet]:
+    """Shortcut for DuplicateFinder(min_size, ...).find(roots)"""
+    return DuplicateFinder(min_size, **kwargs).find(roots)
+
+
+def reclaimable_bytes(duplicates: Iterable[DuplicateSet]) -> int:
+    """Total bytes freed by keeping one copy of every set"""
+    return sum(duplicate.reclaimable for duplicate in duplicates)
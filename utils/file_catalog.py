@@ -0,0 +1,377 @@
+"""
+Persistent file catalog
+Stores the directory listings of the disk analyzer and the duplicate
+finder's digests in SQLite, so that revisiting a drive only re-lists the
+directories that changed
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike
+from utils.scan_index import CACHE_DIR, DEFAULT_MAX_AGE
+from utils.disk_usage import (
+    FLAG_ERROR, ListingCollector, SizeTree, analyze_tree, list_directory
+)
+from utils.duplicates import HashCache
+from utils.size_accounting import bind_cache_accounting, size_accounting
+from utils.progress import DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+
+logger = get_logger(__name__)
+
+DEFAULT_CATALOG_FILE = CACHE_DIR / "file_catalog.db"
+
+_NAME_ERRORS = 'surrogatepass'
+
+# Bumped when the stored listing layout changes (older catalogs are dropped)
+_SCHEMA_VERSION = 2
+
+
+class _Listing:
+    """Stored listing of one directory, packed as four blobs"""
+
+    __slots__ = ('mtime_ns', 'scanned_at', 'names', 'flags', 'sizes', 'mtimes')
+
+    def __init__(self, mtime_ns: int, scanned_at: float, names: bytes, flags: bytes,
+                 sizes: bytes, mtimes: bytes):
+        self.mtime_ns = mtime_ns
+        self.scanned_at = scanned_at
+        self.names = names
+        self.flags = flags
+        self.sizes = sizes
+        self.mtimes = mtimes
+
+    @classmethod
+    def pack(cls, mtime_ns: int, entries: List[Tuple[str, int, int, int]]) -> '_Listing':
+        """Pack (name, flags, size, mtime) entries"""
+        names = b'\0'.join(entry[0].encode('utf-8', _NAME_ERRORS) for entry in entries)
+        flags = bytes(entry[1] for entry in entries)
+        sizes = array('Q', [entry[2] for entry in entries]).tobytes()
+        mtimes = array('I', [entry[3] for entry in entries]).tobytes()
+        return cls(mtime_ns, time.time(), names, flags, sizes, mtimes)
+
+    def unpack(self) -> List[Tuple[str, int, int, int]]:
+        """Rebuild the (name, flags, size, mtime) entries"""
+        if not self.flags:
+            return []
+        sizes = array('Q')
+        sizes.frombytes(self.sizes)
+        mtimes = array('I')
+        mtimes.frombytes(self.mtimes)
+        names = self.names.decode('utf-8', _NAME_ERRORS).split('\0')
+        return list(zip(names, self.flags, sizes, mtimes))
+
+
+class FileCatalog(HashCache):
+    """
+    SQLite catalog of directory listings and file digests
+
+    A directory whose mtime did not change since it was cataloged is not
+    listed again: its stored entries (name, flags, size, mtime) are reused. The
+    last tree built for each root is stored as well: when none of its
+    directories changed, it is returned as is, so an unchanged tree costs
+    one stat per directory. Digests are keyed by path and only reused while
+    the file keeps the same size and mtime.
+    """
+
+    def __init__(self, db_path: Optional[PathLike] = None, max_age: float = DEFAULT_MAX_AGE):
+        """
+        Args:
+            db_path: SQLite file (cache/file_catalog.db in the app directory by default)
+            max_age: Seconds after which an unchanged directory is re-listed
+                     (files can grow in place without a directory mtime change)
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_CATALOG_FILE
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._listings: Dict[str, _Listing] = {}
+        self._hashes: Dict[Tuple[str, str], Tuple[int, int, str]] = {}
+        self._dirty_listings: Dict[str, _Listing] = {}
+        self._dirty_hashes: Dict[Tuple[str, str], Tuple[int, int, str]] = {}
+        self._visited: Set[str] = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the catalog database, creating it if needed"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            # Catalog written by an older version: it is only a cache
+            with conn:
+                for table in ("listings", "hashes", "trees"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, scanned_at REAL, "
+            "names BLOB, flags BLOB, sizes BLOB, mtimes BLOB)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT, kind TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT, "
+            "PRIMARY KEY (path, kind))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS trees (root TEXT PRIMARY KEY, data BLOB)"
+        )
+        # Digests do not depend on how sizes are counted: they are kept
+        bind_cache_accounting(conn, ["listings", "trees"])
+        return conn
+
+    def _load(self):
+        """Load the catalog in memory"""
+        self.size_accounting = size_accounting()
+        try:
+            conn = self._connect()
+            try:
+                for path, *columns in conn.execute(
+                        "SELECT path, mtime_ns, scanned_at, names, flags, sizes, mtimes "
+                        "FROM listings"):
+                    self._listings[path] = _Listing(*columns)
+                for path, kind, size, mtime_ns, digest in conn.execute(
+                        "SELECT path, kind, size, mtime_ns, digest FROM hashes"):
+                    self._hashes[(path, kind)] = (size, mtime_ns, digest)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"File catalog unavailable, starting from scratch: {e}")
+            self._listings = {}
+            self._hashes = {}
+
+    def _check_accounting(self):
+        """Drop listings counted under another size accounting mode"""
+        if self.size_accounting != size_accounting():
+            with self._lock:
+                self._listings = {}
+                self._dirty_listings = {}
+            self._load()
+
+    def save(self, root: Optional[PathLike] = None) -> bool:
+        """
+        Write the listings and digests refreshed since the last save
+
+        Args:
+            root: Root of the last refresh: its cataloged directories that
+                  were not visited (deleted since) are dropped
+        """
+        self._check_accounting()
+        stale: List[str] = []
+        if root is not None:
+            prefix = os.path.join(os.path.abspath(os.fspath(root)), '')
+            with self._lock:
+                stale = [
+                    path for path in self._listings
+                    if (path + os.sep).startswith(prefix) and path not in self._visited
+                ]
+                for path in stale:
+                    del self._listings[path]
+
+        if not stale and not self._dirty_listings and not self._dirty_hashes:
+            return True
+        with self._lock:
+            listings, self._dirty_listings = self._dirty_listings, {}
+            hashes, self._dirty_hashes = self._dirty_hashes, {}
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany("DELETE FROM listings WHERE path = ?", [(p,) for p in stale])
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (path, l.mtime_ns, l.scanned_at, l.names, l.flags, l.sizes, l.mtimes)
+                            for path, l in listings.items()
+                        ]
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (path, kind, size, mtime_ns, digest)
+                            for (path, kind), (size, mtime_ns, digest) in hashes.items()
+                        ]
+                    )
+            finally:
+                conn.close()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Could not save file catalog: {e}")
+            with self._lock:
+                listings.update(self._dirty_listings)
+                hashes.update(self._dirty_hashes)
+                self._dirty_listings = listings
+                self._dirty_hashes = hashes
+            return False
+
+    def clear(self):
+        """Forget every cataloged directory and digest"""
+        with self._lock:
+            self._listings = {}
+            self._hashes = {}
+            self._dirty_listings = {}
+            self._dirty_hashes = {}
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM listings")
+                    conn.execute("DELETE FROM hashes")
+                    conn.execute("DELETE FROM trees")
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Could not clear file catalog: {e}")
+
+    def load_tree(self, root: PathLike) -> Optional[SizeTree]:
+        """Last tree stored for a root (None if missing or unreadable)"""
+        key = os.path.abspath(os.fspath(root))
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT data FROM trees WHERE root = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+            return SizeTree.from_bytes(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Stored tree of {key} unavailable: {e}")
+            return None
+
+    def store_tree(self, tree: SizeTree) -> bool:
+        """Store the tree of a root, replacing the previous one"""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO trees VALUES (?, ?)",
+                                 (tree.name(0), tree.to_bytes()))
+            finally:
+                conn.close()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Could not store tree of {tree.name(0)}: {e}")
+            return False
+
+    def is_current(self, tree: SizeTree) -> bool:
+        """
+        Check that no directory of a stored tree changed since it was listed
+
+        Costs one stat per directory; the directories are marked visited.
+        """
+        now = time.time()
+        flags = tree.flags
+        visited = []
+        for index, path in tree.directory_paths().items():
+            stored = self._listings.get(path)
+            if stored is None:
+                if flags[index] & FLAG_ERROR:
+                    # Unreadable when the tree was built: nothing to compare
+                    continue
+                return False
+            try:
+                mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                return False
+            if mtime_ns != stored.mtime_ns or now - stored.scanned_at >= self.max_age:
+                return False
+            visited.append(path)
+        with self._lock:
+            self._visited.update(visited)
+        self.hits = len(visited)
+        return True
+
+    def list_directory(self, path: str) -> Optional[List[Tuple[str, int, int, int]]]:
+        """
+        Listing of a directory, from the catalog when it did not change
+
+        Same contract as utils.disk_usage.list_directory (thread-safe).
+        """
+        try:
+            mtime_ns = os.stat(path, follow_symlinks=False).st_mtime_ns
+        except OSError as e:
+            logger.debug(f"Cannot stat {path}: {e}")
+            return None
+
+        with self._lock:
+            self._visited.add(path)
+            stored = self._listings.get(path)
+            fresh = (stored is not None and stored.mtime_ns == mtime_ns
+                     and time.time() - stored.scanned_at < self.max_age)
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            return stored.unpack()
+
+        # mtime is read before listing: a change during the listing makes
+        # the next refresh list this directory again
+        entries = list_directory(path)
+        if entries is not None:
+            listing = _Listing.pack(mtime_ns, entries)
+            with self._lock:
+                self._listings[path] = listing
+                self._dirty_listings[path] = listing
+        return entries
+
+    def analyze(
+        self,
+        root: PathLike,
+        workers: Optional[int] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+        interval: float = DEFAULT_INTERVAL,
+        cancel: Optional[threading.Event] = None,
+        collectors: Optional[List[ListingCollector]] = None
+    ) -> SizeTree:
+        """
+        Incremental equivalent of utils.disk_usage.analyze_tree
+
+        Without collectors, the stored tree is returned directly when none
+        of its directories changed. Otherwise the tree is rebuilt from the
+        stored listings, re-listing changed directories only. The catalog
+        is saved at the end (directories gone since the last refresh are
+        dropped, unless the analysis was cancelled).
+        """
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._visited = set()
+        self._check_accounting()
+
+        if not collectors:
+            stored = self.load_tree(root)
+            if stored is not None and self.is_current(stored):
+                logger.debug(f"File catalog: stored tree of {root} is current "
+                             f"({self.hits} directories checked)")
+                if on_progress is not None:
+                    progress = ProgressThrottle(on_progress, "analyze", interval)
+                    progress.add(stored.size[0], stored.count[0], stored.name(0))
+                    progress.finish({stored.name(0): stored})
+                return stored
+
+        tree = analyze_tree(root, workers, on_progress, interval, cancel, collectors,
+                            lister=self.list_directory)
+        cancelled = cancel is not None and cancel.is_set()
+        if not cancelled:
+            self.store_tree(tree)
+        self.save(None if cancelled else root)
+        logger.debug(f"File catalog: {self.hits} directories reused, {self.misses} listed")
+        return tree
+
+    def get_hash(self, kind: str, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        """Stored digest of a file, if its size and mtime did not change"""
+        stored = self._hashes.get((path, kind))
+        if stored is not None and stored[0] == size and stored[1] == mtime_ns:
+            return stored[2]
+        return None
+
+    def put_hash(self, kind: str, path: str, size: int, mtime_ns: int, digest: str):
+        """Remember the digest of a file"""
+        with self._lock:
+            self._hashes[(path, kind)] = (size, mtime_ns, digest)
+            self._dirty_hashes[(path, kind)] = (size, mtime_ns, digest)
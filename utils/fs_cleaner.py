@@ -0,0 +1,281 @@
+"""
+Filesystem deletion engine
+Bottom-up, single-pass deletion that only counts bytes actually freed
+"""
+
+import os
+import stat
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, is_link, is_protected_folder, pattern_classifier
+from utils.progress import BATCH_SIZE, ProgressThrottle
+from utils.clean_filters import FilePredicate
+from utils.io_throttle import IOThrottle
+from utils.size_accounting import file_size, get_size_provider
+
+logger = get_logger(__name__)
+
+# Never delete binaries outside of temporary folders
+PROTECTED_EXTENSIONS = ('.sys', '.dll', '.exe')
+
+
+class DeleteReport:
+    """Result of a deletion: bytes and files actually removed for one path"""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.freed = 0
+        self.files = 0
+        self.dirs = 0
+        self.failed = 0
+        self.skipped = 0
+        # Planned entries that changed since planning (see utils.clean_plan)
+        self.changed = 0
+
+    def merge(self, other: 'DeleteReport'):
+        """Add another report to this one"""
+        self.freed += other.freed
+        self.files += other.files
+        self.dirs += other.dirs
+        self.failed += other.failed
+        self.skipped += other.skipped
+        self.changed += other.changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable representation"""
+        return {
+            'path': self.path,
+            'freed': self.freed,
+            'files': self.files,
+            'dirs': self.dirs,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'changed': self.changed,
+        }
+
+    def __repr__(self):
+        return (f"DeleteReport({self.path!r}, freed={self.freed}, files={self.files}, "
+                f"failed={self.failed})")
+
+
+def _is_protected_file(path: str) -> bool:
+    """Check if a file looks like a system binary outside of temp folders"""
+    lower = path.lower()
+    return lower.endswith(PROTECTED_EXTENSIONS) and 'temp' not in lower
+
+
+def force_remove(func, path: str):
+    """Remove a file/dir, clearing the read-only flag on Windows if needed"""
+    try:
+        func(path)
+    except PermissionError:
+        if os.name != 'nt':
+            raise
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+
+
+def remove_file(path: str, size: int, report: DeleteReport, guard: bool = True) -> bool:
+    """
+    Delete a single file and account for it in the report
+
+    guard refuses system binaries outside of temp folders; it applies to
+    matched top-level entries, not to the contents of a folder being emptied.
+    """
+    if guard and _is_protected_file(path):
+        logger.warning(f"Skipping system file: {path}")
+        report.skipped += 1
+        return False
+    try:
+        force_remove(os.unlink, path)
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.debug(f"Could not delete {path}: {e}")
+        report.failed += 1
+        return False
+    report.freed += size
+    report.files += 1
+    return True
+
+
+def _remove_link(entry: os.DirEntry, report: DeleteReport):
+    """Delete a symlink or junction without touching its target"""
+    try:
+        if os.name == 'nt' and entry.is_dir():
+            force_remove(os.rmdir, entry.path)
+        else:
+            force_remove(os.unlink, entry.path)
+        report.files += 1
+    except OSError as e:
+        logger.debug(f"Could not remove link {entry.path}: {e}")
+        report.failed += 1
+
+
+def delete_classified(
+    folder: PathLike,
+    classify: Callable[[str], Optional[Hashable]],
+    progress: Optional[ProgressThrottle] = None,
+    filters: Optional[Dict[Hashable, FilePredicate]] = None,
+    throttle: Optional[IOThrottle] = None
+) -> Dict[Hashable, DeleteReport]:
+    """
+    Delete the contents of a folder in a single bottom-up traversal
+
+    Files are unlinked as soon as they are listed (their size comes from the
+    cached DirEntry stat); directories are removed once empty. Each direct
+    child of folder is passed to classify: None keeps it, any other value is
+    the key under which it and its subtree are reported. A single file can
+    also be passed as folder.
+
+    Args:
+        folder: Folder whose contents are deleted (the folder itself is kept)
+        classify: Maps a top-level entry name to a key (or None to keep it)
+        progress: Receives the freed bytes/files in batches
+        filters: Mapping of key -> predicate(path, stat) selecting the files
+                 that may be deleted (see utils.clean_filters)
+        throttle: Caps the deletion throughput (background mode)
+
+    Returns:
+        Mapping of key -> DeleteReport with the bytes actually freed
+    """
+    path = os.fspath(folder)
+    reports: Dict[Hashable, DeleteReport] = {}
+    # Freed bytes/files not yet reported to progress
+    batch = [0, 0]
+
+    def report_for(key: Hashable) -> DeleteReport:
+        report = reports.get(key)
+        if report is None:
+            report = reports[key] = DeleteReport(path)
+        return report
+
+    if is_protected_folder(folder):
+        logger.error(f"BLOCKED: Attempted to delete from critical folder: {folder}")
+        return reports
+
+    try:
+        if os.path.isfile(path):
+            key = classify(os.path.basename(path))
+            if key is not None:
+                st = os.lstat(path)
+                predicate = filters.get(key) if filters else None
+                if predicate is None or predicate(path, st):
+                    remove_file(path, file_size(path, st), report_for(key))
+            return reports
+    except OSError:
+        return reports
+
+    # (path, key, visited): key is None for the root only; a directory is
+    # pushed back once its children are queued so that it is removed after them
+    stack: List[Tuple[str, Optional[Hashable], bool]] = [(path, None, False)]
+    sized = get_size_provider()
+
+    while stack:
+        current, key, visited = stack.pop()
+
+        if visited:
+            try:
+                force_remove(os.rmdir, current)
+                report_for(key).dirs += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Not empty: some children could not be deleted
+                logger.debug(f"Could not remove {current}: {e}")
+            continue
+
+        if key is not None:
+            stack.append((current, key, True))
+
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    entry_key = key
+                    if entry_key is None:
+                        entry_key = classify(entry.name)
+                        if entry_key is None:
+                            continue
+                    report = report_for(entry_key)
+                    try:
+                        if is_link(entry):
+                            # Remove the symlink/junction itself, never its target
+                            _remove_link(entry, report)
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, entry_key, False))
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError as e:
+                        logger.debug(f"Cannot read {entry.path}: {e}")
+                        report.failed += 1
+                        continue
+                    if filters:
+                        predicate = filters.get(entry_key)
+                        if predicate is not None and not predicate(entry.path, st):
+                            continue
+                    size = sized(entry.path, st)
+                    # Binaries are only refused at the top level: subtrees
+                    # of a matched folder go entirely
+                    if not remove_file(entry.path, size, report, guard=key is None):
+                        continue
+                    if throttle is not None:
+                        throttle.consume(1, size)
+                    if progress is not None:
+                        batch[0] += size
+                        batch[1] += 1
+                        if batch[1] >= BATCH_SIZE:
+                            progress.add(batch[0], batch[1], current)
+                            batch = [0, 0]
+        except PermissionError:
+            logger.debug(f"Permission denied: {current}")
+            if key is not None:
+                report_for(key).failed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug(f"Error deleting contents of {current}: {e}")
+            if key is not None:
+                report_for(key).failed += 1
+
+    if progress is not None and batch[1]:
+        progress.add(batch[0], batch[1], path)
+
+    return reports
+
+
+def delete_contents(folder: PathLike, pattern: str = '*') -> DeleteReport:
+    """
+    Delete the contents of a folder (or a single file) in a single pass
+
+    Args:
+        folder: Folder whose contents are deleted (the folder itself is kept)
+        pattern: Glob pattern applied to the top-level entries
+
+    Returns:
+        DeleteReport with the bytes actually freed
+    """
+    if os.path.isfile(folder):
+        # Single files are targeted explicitly, whatever the pattern
+        pattern = '*'
+    reports = delete_classified(folder, pattern_classifier(pattern))
+    return reports.get(pattern) or DeleteReport(os.fspath(folder))
+
+
+def delete_targets(targets: List[Tuple[PathLike, str]]) -> Dict[str, DeleteReport]:
+    """
+    Delete several (path, pattern) targets
+
+    Returns:
+        Mapping of path -> DeleteReport
+    """
+    reports = {}
+    for path, pattern in targets:
+        if not os.path.exists(path):
+            continue
+        report = delete_contents(path, pattern)
+        if report.path in reports:
+            reports[report.path].merge(report)
+        else:
+            reports[report.path] = report
+    return reports
@@ -0,0 +1,317 @@
+"""
+Filesystem scan engine
+Single-pass os.scandir walker shared by the cleaner and disk tools
+"""
+
+import os
+import fnmatch
+import time
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple, Union
+from utils.logger import get_logger
+from utils.clean_planner import plan_targets
+from utils.progress import BATCH_SIZE, DEFAULT_INTERVAL, ProgressEvent
+from utils.clean_filters import FilePredicate
+from utils.size_accounting import file_size, get_size_provider
+
+logger = get_logger(__name__)
+
+PathLike = Union[str, Path]
+
+# Folders that must never be scanned or cleaned unless they are obviously
+# temporary/cache locations
+CRITICAL_FOLDERS = ['system32', 'syswow64', 'program files', 'windows\\system']
+
+# Windows junctions are not reported by DirEntry.is_symlink()
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+
+def is_protected_folder(folder: PathLike) -> bool:
+    """Check if a folder is a critical system location"""
+    folder_str = str(folder).lower()
+    for critical in CRITICAL_FOLDERS:
+        if critical in folder_str and 'temp' not in folder_str and 'cache' not in folder_str:
+            return True
+    return False
+
+
+def is_link(entry: os.DirEntry) -> bool:
+    """Check if an entry is a symlink or a junction (never followed)"""
+    if entry.is_symlink():
+        return True
+    if os.name == 'nt':
+        try:
+            attributes = entry.stat(follow_symlinks=False).st_file_attributes
+            return bool(attributes & FILE_ATTRIBUTE_REPARSE_POINT)
+        except (OSError, AttributeError):
+            return False
+    return False
+
+
+class ScanResult:
+    """Bytes and file count found for one category"""
+
+    def __init__(self, category: str = "", size: int = 0, count: int = 0):
+        self.category = category
+        self.size = size
+        self.count = count
+
+    def add(self, size: int, count: int):
+        """Add a partial result"""
+        self.size += size
+        self.count += count
+
+    def to_dict(self) -> Dict[str, Union[str, int]]:
+        """Serializable representation"""
+        return {'category': self.category, 'size': self.size, 'count': self.count}
+
+    def __repr__(self):
+        return f"ScanResult({self.category!r}, size={self.size}, count={self.count})"
+
+
+def pattern_classifier(pattern: str) -> Callable[[str], Optional[str]]:
+    """Build a classifier accepting top-level names that match pattern"""
+    if pattern == '*':
+        return lambda name: pattern
+    return lambda name: pattern if fnmatch.fnmatch(name, pattern) else None
+
+
+def iter_classified(
+    root: PathLike,
+    classify: Callable[[str], Optional[Hashable]],
+    on_dir: Optional[Callable[[Hashable, str], None]] = None
+) -> Iterator[Tuple[Hashable, os.DirEntry]]:
+    """
+    Iterate over every file below root in a single pass
+
+    Each direct child of root is passed to classify; children for which it
+    returns None are skipped, other children (and their whole subtree) are
+    tagged with the returned key. Symlinks and junctions are never followed.
+
+    Args:
+        root: Directory to walk
+        classify: Maps a top-level entry name to a key (or None to skip it)
+        on_dir: Called with (key, path) for every directory below root,
+                parents before children
+
+    Yields:
+        Tuples of (key, os.DirEntry); stat() is cached on the entry
+    """
+    stack = [(os.fspath(root), None)]
+
+    while stack:
+        current, key = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    entry_key = key
+                    if entry_key is None:
+                        entry_key = classify(entry.name)
+                        if entry_key is None:
+                            continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False) and not is_link(entry):
+                            stack.append((entry.path, entry_key))
+                            if on_dir is not None:
+                                on_dir(entry_key, entry.path)
+                        else:
+                            yield entry_key, entry
+                    except OSError as e:
+                        logger.debug(f"Cannot read {entry.path}: {e}")
+        except (PermissionError, FileNotFoundError, NotADirectoryError) as e:
+            logger.debug(f"Cannot scan {current}: {e}")
+        except OSError as e:
+            logger.debug(f"Error scanning {current}: {e}")
+
+
+def iter_files(root: PathLike, pattern: str = '*') -> Iterator[os.DirEntry]:
+    """
+    Iterate over every file below root in a single pass
+
+    Only the direct children of root are filtered with pattern (same
+    semantics as Path.glob used by the cleaner); matching directories are
+    walked entirely. Symlinks and junctions are never followed.
+
+    Args:
+        root: Directory to walk
+        pattern: Glob pattern applied to the top-level entries
+
+    Yields:
+        os.DirEntry of each file; stat() is cached on the entry
+    """
+    for _, entry in iter_classified(root, pattern_classifier(pattern)):
+        yield entry
+
+
+def scan_classified(
+    path: PathLike,
+    classify: Callable[[str], Optional[Hashable]]
+) -> Dict[Hashable, Tuple[int, int]]:
+    """
+    Calculate size and file count below path, split by classifier key
+
+    A single file can also be passed; it is classified by its own name.
+
+    Returns:
+        Mapping of key -> (total_size, file_count)
+    """
+    if is_protected_folder(path):
+        logger.warning(f"Skipping critical folder: {path}")
+        return {}
+
+    totals: Dict[Hashable, List[int]] = {}
+
+    try:
+        if os.path.isfile(path):
+            key = classify(os.path.basename(path))
+            return {key: (file_size(path, os.lstat(path)), 1)} if key is not None else {}
+    except OSError:
+        return {}
+
+    sized = get_size_provider()
+    for key, entry in iter_classified(path, classify):
+        try:
+            size = sized(entry.path, entry.stat(follow_symlinks=False))
+        except OSError:
+            # Vanished or inaccessible file
+            continue
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [size, 1]
+        else:
+            total[0] += size
+            total[1] += 1
+
+    return {key: (size, count) for key, (size, count) in totals.items()}
+
+
+def scan_path(path: PathLike, pattern: str = '*') -> Tuple[int, int]:
+    """
+    Calculate size and file count of a folder (or a single file)
+
+    Args:
+        path: Folder or file to measure
+        pattern: Glob pattern applied to the top-level entries
+
+    Returns:
+        Tuple of (total_size, file_count)
+    """
+    if os.path.isfile(path):
+        # Single files are targeted explicitly, whatever the pattern
+        pattern = '*'
+    return scan_classified(path, pattern_classifier(pattern)).get(pattern, (0, 0))
+
+
+def iter_scan(
+    targets: Dict[str, List[Tuple[PathLike, str]]],
+    categories: Optional[List[str]] = None,
+    interval: float = DEFAULT_INTERVAL,
+    filters: Optional[Dict[str, FilePredicate]] = None
+) -> Iterator[ProgressEvent]:
+    """
+    Scan cleaning targets as a stream of rate-limited progress events
+
+    Overlapping targets are merged first (see utils.clean_planner) so that
+    every file is visited and counted once. The last event has done=True
+    and carries the per-category ScanResult mapping in its results.
+
+    Args:
+        targets: Mapping of category -> list of (path, pattern)
+        categories: Categories to scan (all if None)
+        interval: Minimum delay in seconds between two events
+        filters: Mapping of category -> predicate(path, stat) selecting the
+                 files to count (see utils.clean_filters)
+
+    Yields:
+        ProgressEvent with the bytes/files found so far and the current root
+    """
+    if categories is not None:
+        targets = {cat: paths for cat, paths in targets.items() if cat in categories}
+
+    results = {category: ScanResult(category) for category in targets}
+    total_size = 0
+    total_count = 0
+    last_emit = time.monotonic()
+    root_path = ""
+    sized = get_size_provider()
+
+    for root in plan_targets(targets):
+        root_path = root.path
+        if is_protected_folder(root_path):
+            logger.warning(f"Skipping critical folder: {root_path}")
+            continue
+
+        try:
+            if os.path.isfile(root_path):
+                category = root.classify(os.path.basename(root_path))
+                if category is not None:
+                    st = os.lstat(root_path)
+                    predicate = filters.get(category) if filters else None
+                    if predicate is not None and not predicate(root_path, st):
+                        continue
+                    size = file_size(root_path, st)
+                    results[category].add(size, 1)
+                    total_size += size
+                    total_count += 1
+                continue
+        except OSError:
+            continue
+
+        pending = 0
+        for category, entry in iter_classified(root_path, root.classify):
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                # Vanished or inaccessible file
+                continue
+            if filters:
+                predicate = filters.get(category)
+                if predicate is not None and not predicate(entry.path, st):
+                    continue
+            size = sized(entry.path, st)
+            result = results[category]
+            result.size += size
+            result.count += 1
+            total_size += size
+            total_count += 1
+
+            pending += 1
+            if pending >= BATCH_SIZE:
+                pending = 0
+                now = time.monotonic()
+                if now - last_emit >= interval:
+                    last_emit = now
+                    yield ProgressEvent("scan", root_path, total_size, total_count)
+
+    yield ProgressEvent("scan", root_path, total_size, total_count, True, results)
+
+
+def scan_categories(
+    targets: Dict[str, List[Tuple[PathLike, str]]],
+    categories: Optional[List[str]] = None,
+    filters: Optional[Dict[str, FilePredicate]] = None
+) -> Dict[str, ScanResult]:
+    """
+    Scan cleaning targets and aggregate the results per category
+
+    Args:
+        targets: Mapping of category -> list of (path, pattern)
+        categories: Categories to scan (all if None)
+        filters: Mapping of category -> predicate(path, stat)
+
+    Returns:
+        Mapping of category -> ScanResult
+    """
+    for event in iter_scan(targets, categories, interval=float('inf'), filters=filters):
+        if event.done:
+            return event.results
+    return {}
+
+
+def format_size(size: int) -> str:
+    """Format a byte count as MB/GB for display"""
+    size_mb = size / (1024 * 1024)
+    size_gb = size_mb / 1024
+    if size_gb >= 1:
+        return f"{size_gb:.2f} GB"
+    return f"{size_mb:.2f} MB"
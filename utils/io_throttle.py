@@ -0,0 +1,119 @@
+"""
+I/O throttling
+Token buckets capping deletion throughput (files/s and bytes/s) for the
+background cleaning mode
+"""
+
+import time
+import threading
+from typing import Any, Dict, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLEAN_MODE_FOREGROUND = "foreground"
+CLEAN_MODE_BACKGROUND = "background"
+
+DEFAULT_BACKGROUND_FILES_PER_SECOND = 500
+DEFAULT_BACKGROUND_MB_PER_SECOND = 10
+
+# Seconds of throughput a bucket may hold (burst size)
+DEFAULT_BURST = 0.5
+
+# Workers only sleep once they owe at least this many seconds, so that
+# they yield between batches instead of sleeping after every file
+MIN_SLEEP = 0.05
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate"""
+
+    def __init__(self, rate: float, burst: float = DEFAULT_BURST):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Seconds of tokens the bucket holds when full
+        """
+        self.rate = float(rate)
+        self.capacity = max(self.rate * burst, 1.0)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount: float) -> float:
+        """
+        Consume tokens, going into debt if needed
+
+        Returns:
+            Seconds to wait until the debt is paid back (0 if none)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class IOThrottle:
+    """
+    Cap the number of files and bytes processed per second
+
+    Shared by all cleaning workers: consume() is called after each deleted
+    file and sleeps the calling worker when either limit is exceeded.
+    """
+
+    def __init__(self, files_per_second: Optional[float] = None,
+                 bytes_per_second: Optional[float] = None, burst: float = DEFAULT_BURST):
+        self.files = TokenBucket(files_per_second, burst) if files_per_second else None
+        self.bytes = TokenBucket(bytes_per_second, burst) if bytes_per_second else None
+        self.waited = 0.0
+
+    def consume(self, files: int, size: int):
+        """Account for processed files and wait if a limit is exceeded"""
+        wait = 0.0
+        if self.files is not None:
+            wait = self.files.take(files)
+        if self.bytes is not None:
+            wait = max(wait, self.bytes.take(size))
+        if wait >= MIN_SLEEP:
+            self.waited += wait
+            time.sleep(wait)
+
+    def __repr__(self):
+        files = self.files.rate if self.files else None
+        size = self.bytes.rate if self.bytes else None
+        return f"IOThrottle(files_per_second={files}, bytes_per_second={size})"
+
+
+def throttle_from_settings(optimization: Optional[Dict[str, Any]],
+                           mode: Optional[str] = None) -> Optional[IOThrottle]:
+    """
+    Build the throttle for a cleaning mode from the optimization settings
+
+    Args:
+        optimization: The "optimization" settings section
+        mode: Overrides optimization.clean_mode ("foreground" or "background")
+
+    Returns:
+        IOThrottle for the background mode, None at full speed
+    """
+    optimization = optimization or {}
+    mode = mode or optimization.get('clean_mode', CLEAN_MODE_FOREGROUND)
+    if mode != CLEAN_MODE_BACKGROUND:
+        return None
+
+    try:
+        files = float(optimization.get('background_files_per_second',
+                                       DEFAULT_BACKGROUND_FILES_PER_SECOND) or 0)
+        megabytes = float(optimization.get('background_mb_per_second',
+                                           DEFAULT_BACKGROUND_MB_PER_SECOND) or 0)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid background cleaning limits, using defaults: {e}")
+        files = DEFAULT_BACKGROUND_FILES_PER_SECOND
+        megabytes = DEFAULT_BACKGROUND_MB_PER_SECOND
+
+    if files <= 0 and megabytes <= 0:
+        return None
+    return IOThrottle(files if files > 0 else None,
+                      megabytes * 1024 ** 2 if megabytes > 0 else None)
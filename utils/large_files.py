@@ -0,0 +1,181 @@
+"""
+Large file finder
+Keeps the N largest files seen during a scan in a bounded min-heap, so
+memory does not depend on the size of the disk
+"""
+
+import os
+import time
+import heapq
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, is_link, iter_files
+from utils.progress import DEFAULT_INTERVAL
+
+logger = get_logger(__name__)
+
+DEFAULT_TOP_FILES = 100
+
+# (size, path), largest first
+LargeFile = Tuple[int, str]
+
+
+def normalize_extensions(extensions: Optional[Iterable[str]]) -> Optional[frozenset]:
+    """Lower-case extensions with a leading dot ("MKV", ".iso" -> ".mkv", ".iso")"""
+    if not extensions:
+        return None
+    normalized = frozenset(
+        ext if ext.startswith('.') else '.' + ext
+        for ext in (e.strip().lower() for e in extensions) if ext
+    )
+    return normalized or None
+
+
+class LargeFileFinder:
+    """
+    Bounded top-K of the largest files
+
+    The heap holds at most limit (size, path) pairs with the smallest on
+    top: a file smaller than the current minimum is rejected with a single
+    comparison, before its path is even built. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_TOP_FILES,
+        min_size: int = 0,
+        extensions: Optional[Iterable[str]] = None,
+        on_snapshot: Optional[Callable[[List[LargeFile]], None]] = None,
+        interval: float = DEFAULT_INTERVAL
+    ):
+        """
+        Args:
+            limit: Number of files kept
+            min_size: Smaller files are ignored
+            extensions: Only keep these extensions (all if None)
+            on_snapshot: Receives the current top-K (largest first) at most
+                         once per interval while it changes
+            interval: Minimum delay in seconds between two snapshots
+        """
+        self.limit = max(1, int(limit))
+        self.min_size = min_size
+        self.extensions = normalize_extensions(extensions)
+        self.on_snapshot = on_snapshot
+        self.interval = interval
+        self.seen = 0
+        self._heap: List[LargeFile] = []
+        self._threshold = min_size
+        self._changed = False
+        self._last_snapshot = 0.0
+        self._lock = threading.Lock()
+
+    def _accepts(self, name: str) -> bool:
+        return self.extensions is None or os.path.splitext(name)[1].lower() in self.extensions
+
+    def _push(self, size: int, path: str):
+        """Insert a candidate (lock held)"""
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, (size, path))
+        else:
+            heapq.heapreplace(self._heap, (size, path))
+        if len(self._heap) == self.limit:
+            # Anything not larger than the smallest kept file is rejected
+            self._threshold = max(self.min_size, self._heap[0][0] + 1)
+        self._changed = True
+
+    def add(self, path: str, size: int):
+        """Offer one file"""
+        with self._lock:
+            self.seen += 1
+            if size >= self._threshold and self._accepts(path):
+                self._push(size, path)
+        self._maybe_snapshot()
+
+    def add_listing(self, directory: str, entries: List[Tuple[str, int, int, int]]):
+        """
+        Offer the (name, flags, size, mtime) listing of a directory
+
+        Matches the collector interface of utils.disk_usage.analyze_tree;
+        only regular files (flags == 0) are considered.
+        """
+        with self._lock:
+            self.seen += len(entries)
+            for name, flags, size, _ in entries:
+                if flags == 0 and size >= self._threshold and self._accepts(name):
+                    self._push(size, os.path.join(directory, name))
+        self._maybe_snapshot()
+
+    def add_tree(self, tree):
+        """Offer every regular file of a utils.disk_usage.SizeTree"""
+        flags = tree.flags
+        sizes = tree.size
+        with self._lock:
+            self.seen += len(tree)
+            for index in range(len(tree)):
+                if flags[index] == 0 and sizes[index] >= self._threshold:
+                    if self._accepts(tree.name(index)):
+                        self._push(sizes[index], tree.path(index))
+        self._maybe_snapshot()
+
+    def top(self) -> List[LargeFile]:
+        """Current top-K, largest first"""
+        with self._lock:
+            return sorted(self._heap, reverse=True)
+
+    def _maybe_snapshot(self):
+        """Emit the current top-K if it changed and the interval elapsed"""
+        if self.on_snapshot is None or not self._changed:
+            return
+        now = time.monotonic()
+        if now - self._last_snapshot < self.interval:
+            return
+        self._last_snapshot = now
+        self._changed = False
+        self.on_snapshot(self.top())
+
+    def finish(self) -> List[LargeFile]:
+        """Emit and return the final top-K"""
+        result = self.top()
+        if self.on_snapshot is not None:
+            self.on_snapshot(result)
+        return result
+
+
+def find_large_files(
+    root: PathLike,
+    limit: int = DEFAULT_TOP_FILES,
+    min_size: int = 0,
+    extensions: Optional[Iterable[str]] = None,
+    on_snapshot: Optional[Callable[[List[LargeFile]], None]] = None,
+    interval: float = DEFAULT_INTERVAL,
+    cancel: Optional[threading.Event] = None
+) -> List[LargeFile]:
+    """
+    Find the largest files below a directory in constant memory
+
+    Args:
+        root: Directory to scan
+        limit: Number of files returned
+        min_size: Smaller files are ignored
+        extensions: Only keep these extensions (all if None)
+        on_snapshot: Receives incremental top-K snapshots during the scan
+        interval: Minimum delay in seconds between two snapshots
+        cancel: Set to stop the scan early (the current top-K is returned)
+
+    Returns:
+        List of (size, path), largest first
+    """
+    finder = LargeFileFinder(limit, min_size, extensions, on_snapshot, interval)
+    for entry in iter_files(root):
+        if cancel is not None and cancel.is_set():
+            logger.info(f"Large file search in {root} cancelled")
+            break
+        try:
+            if is_link(entry):
+                continue
+            size = entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+        finder.add(entry.path, size)
+    return finder.finish()
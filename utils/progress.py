@@ -0,0 +1,101 @@
+"""
+Progress events
+Batched, rate-limited progress reporting for long filesystem operations
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Default maximum emission rate: 10 events per second
+DEFAULT_INTERVAL = 0.1
+
+# Workers report to the throttle every BATCH_SIZE files
+BATCH_SIZE = 256
+
+
+class ProgressEvent:
+    """Snapshot of a running scan or cleaning operation"""
+
+    __slots__ = ('phase', 'root', 'bytes', 'files', 'done', 'results', 'elapsed')
+
+    def __init__(self, phase: str, root: str, bytes_: int, files: int,
+                 done: bool = False, results: Optional[Dict[str, Any]] = None,
+                 elapsed: float = 0.0):
+        self.phase = phase
+        self.root = root
+        self.bytes = bytes_
+        self.files = files
+        self.done = done
+        self.results = results
+        # Seconds since the operation started
+        self.elapsed = elapsed
+
+    @property
+    def files_per_second(self) -> float:
+        """Average file throughput since the start"""
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        """Average throughput in MB/s since the start"""
+        return self.bytes / (1024 ** 2) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable representation (without results)"""
+        return {
+            'phase': self.phase,
+            'root': self.root,
+            'bytes': self.bytes,
+            'files': self.files,
+            'done': self.done,
+            'elapsed': self.elapsed,
+        }
+
+    def __repr__(self):
+        return (f"ProgressEvent({self.phase!r}, root={self.root!r}, bytes={self.bytes}, "
+                f"files={self.files}, done={self.done})")
+
+
+class ProgressThrottle:
+    """
+    Accumulate progress from any number of threads and emit it at most
+    once per interval
+
+    The callback runs on whichever thread triggers the emission; UI code
+    must hand it over to its main loop (e.g. widget.after).
+    """
+
+    def __init__(self, callback: Callable[[ProgressEvent], None], phase: str = "scan",
+                 interval: float = DEFAULT_INTERVAL):
+        self.callback = callback
+        self.phase = phase
+        self.interval = interval
+        self.bytes = 0
+        self.files = 0
+        self.root = ""
+        self._last_emit = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, size: int, count: int, root: str = ""):
+        """Add a batch of processed files"""
+        with self._lock:
+            self.bytes += size
+            self.files += count
+            if root:
+                self.root = root
+            now = time.monotonic()
+            if now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+            event = ProgressEvent(self.phase, self.root, self.bytes, self.files,
+                                  elapsed=now - self._started)
+        self.callback(event)
+
+    def finish(self, results: Optional[Dict[str, Any]] = None):
+        """Emit the final event, whatever the rate limit"""
+        with self._lock:
+            event = ProgressEvent(self.phase, self.root, self.bytes, self.files, True, results,
+                                  time.monotonic() - self._started)
+        self.callback(event)
@@ -3,81 +3,609 @@ Safe command execution utilities
 Provides secure wrappers for running system commands
 """
 
+import os
+import queue
+import asyncio
+import locale
+import atexit
+import base64
+import secrets
+import shlex
+import threading
+import time
 import subprocess
-from typing import List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from utils.logger import get_logger
+from utils.command_policy import (
+    BLOCK, DEFAULT_POLICY, SERVICE_DISABLE, SERVICE_STOP, WARN, CommandPolicy
+)
 
 logger = get_logger(__name__)
 
+# Long-lived PowerShell processes kept by the session pool
+POWERSHELL_POOL_SIZE = 2
+
+POWERSHELL_SESSION = [
+    'powershell', '-NoLogo', '-NoProfile', '-NonInteractive',
+    '-ExecutionPolicy', 'Bypass', '-Command', '-'
+]
+
+# powershell.exe flags that do not change how a pooled session runs a script
+_POOLABLE_FLAGS = {'-noprofile', '-nologo', '-noninteractive'}
+
+# Seconds left to the stderr stream to deliver its end marker after stdout
+_STDERR_GRACE = 5.0
+
+# Builds the stdin text that runs a script and then prints the end marker:
+# "<marker> <exit status>" on its own stdout line, "<marker>" on stderr
+ScriptFramer = Callable[[str, str], str]
+
+
+def frame_powershell(script: str, marker: str) -> str:
+    """
+    One stdin line running a script in a child scope of a PowerShell session
+
+    The script travels base64-encoded, so its contents can never be taken
+    for the end marker or break the line-based -Command - input.
+    """
+    encoded = base64.b64encode(script.encode('utf-8')).decode('ascii')
+    return (
+        "$global:LASTEXITCODE = 0; $__ok = $true; "
+        "try { & { Invoke-Expression ([Text.Encoding]::UTF8.GetString("
+        f"[Convert]::FromBase64String('{encoded}'))) }}; "
+        "$__ok = $? } catch { $__ok = $false; [Console]::Error.WriteLine($_) }; "
+        "$__code = if ($LASTEXITCODE) { $LASTEXITCODE } elseif ($__ok) { 0 } else { 1 }; "
+        f"[Console]::Out.WriteLine(\"`n{marker} $__code\"); [Console]::Out.Flush(); "
+        f"[Console]::Error.WriteLine(\"`n{marker}\"); [Console]::Error.Flush()\n"
+    )
+
+
+def frame_sh(script: str, marker: str) -> str:
+    """
+    Here-document running a script in a subshell of a POSIX shell session
+
+    Used on Linux to exercise the session pool; the subshell keeps exit
+    and variable changes from leaking into the session.
+    """
+    delimiter = f"{marker}_SCRIPT"
+    return (
+        f"( eval \"$(cat <<'{delimiter}'\n{script}\n{delimiter}\n)\" ) </dev/null\n"
+        f"printf '\\n%s %d\\n' '{marker}' $?\n"
+        f"printf '\\n%s\\n' '{marker}' >&2\n"
+    )
+
+
+class ShellSessionError(Exception):
+    """A shell session died while running a script"""
+
+
+class ShellUnavailable(ShellSessionError):
+    """The interpreter of a shell session cannot be started"""
+
+
+class ShellSession:
+    """
+    One long-lived interpreter fed scripts over stdin
+
+    Each script is framed so that the shell prints a unique end marker with
+    the exit status on stdout, and the same marker on stderr, once it is
+    done; the output in between belongs to that script. Reader threads
+    move both streams into queues so that a time-out never blocks on a
+    pipe. A session that times out or dies is closed: it cannot be reused.
+    """
+
+    def __init__(self, argv: List[str], framer: ScriptFramer, init: Optional[str] = None):
+        """
+        Args:
+            argv: Command starting the interpreter in read-from-stdin mode
+            framer: Builds the stdin text of a script (frame_powershell, frame_sh)
+            init: Sent once after start (not framed, output ignored)
+
+        Raises:
+            ShellUnavailable: If the interpreter cannot be started
+        """
+        self.argv = argv
+        self.framer = framer
+        self.scripts = 0
+        self._token = secrets.token_hex(8)
+        try:
+            self._process = subprocess.Popen(
+                argv,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                bufsize=1,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+            )
+        except OSError as e:
+            raise ShellUnavailable(f"Cannot start {argv[0]}: {e}") from e
+        self._stdout: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr: "queue.Queue[Optional[str]]" = queue.Queue()
+        for stream, lines in ((self._process.stdout, self._stdout),
+                              (self._process.stderr, self._stderr)):
+            threading.Thread(target=self._pump, args=(stream, lines), daemon=True,
+                             name="shell-session").start()
+        if init:
+            self._write(init if init.endswith('\n') else init + '\n')
+
+    @staticmethod
+    def _pump(stream, lines: "queue.Queue[Optional[str]]"):
+        try:
+            for line in stream:
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        # End of stream: the interpreter exited
+        lines.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def _write(self, text: str):
+        try:
+            self._process.stdin.write(text)
+            self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            self.close()
+            raise ShellSessionError(f"Shell session closed: {e}") from e
+
+    def _read_frame(self, lines: "queue.Queue[Optional[str]]", marker: str,
+                    deadline: float) -> Tuple[str, str]:
+        """Lines up to the end marker, and what follows the marker"""
+        collected = []
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(self.argv, 0) from None
+            if line is None:
+                raise ShellSessionError(f"Shell session exited (code {self._process.wait()})")
+            if line.startswith(marker):
+                output = ''.join(collected)
+                # The framer starts the marker on a new line
+                if output.endswith('\n'):
+                    output = output[:-1]
+                return output, line[len(marker):].strip()
+            collected.append(line)
+
+    def execute(self, script: str, timeout: float = 60) -> Tuple[int, str, str]:
+        """
+        Run one script
+
+        Returns:
+            Tuple of (exit status, stdout, stderr)
+
+        Raises:
+            subprocess.TimeoutExpired: The script did not finish in time
+                                       (the session is closed)
+            ShellSessionError: The interpreter exited
+        """
+        self.scripts += 1
+        marker = f"__OPTIWIN_END_{self._token}_{self.scripts}__"
+        deadline = time.monotonic() + timeout
+        self._write(self.framer(script, marker))
+        try:
+            stdout, status = self._read_frame(self._stdout, marker, deadline)
+            stderr, _ = self._read_frame(self._stderr, marker,
+                                         max(deadline, time.monotonic() + _STDERR_GRACE))
+        except subprocess.TimeoutExpired:
+            self.close()
+            raise subprocess.TimeoutExpired(script, timeout) from None
+        except ShellSessionError:
+            self.close()
+            raise
+        try:
+            return int(status), stdout, stderr
+        except ValueError:
+            return 1, stdout, stderr
+
+    def close(self):
+        """Stop the interpreter"""
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+            except (OSError, ValueError):
+                pass
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+
+
+class ShellPool:
+    """
+    Bounded pool of shell sessions
+
+    Sessions are started on demand, up to size, and reused by later
+    scripts; a script waits when all of them are busy. Sessions closed by a
+    time-out or a crash are dropped and replaced on the next demand.
+    """
+
+    def __init__(self, argv: List[str], framer: ScriptFramer, size: int = POWERSHELL_POOL_SIZE,
+                 init: Optional[str] = None):
+        """
+        Args:
+            argv: Command starting the interpreter (see ShellSession)
+            framer: Script framing for that interpreter
+            size: Maximum number of concurrent sessions
+            init: Sent to every new session
+        """
+        self.argv = argv
+        self.framer = framer
+        self.size = max(1, size)
+        self.init = init
+        self.started = 0
+        self._idle: List[ShellSession] = []
+        self._count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def _acquire(self) -> ShellSession:
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ShellUnavailable("Shell pool closed")
+                while self._idle:
+                    session = self._idle.pop()
+                    if session.alive:
+                        return session
+                    self._count -= 1
+                if self._count < self.size:
+                    self._count += 1
+                    break
+                self._condition.wait()
+        try:
+            session = ShellSession(self.argv, self.framer, self.init)
+        except ShellUnavailable:
+            self._release(None)
+            raise
+        self.started += 1
+        return session
+
+    def _release(self, session: Optional[ShellSession]):
+        with self._condition:
+            if session is not None and session.alive and not self._closed:
+                self._idle.append(session)
+            else:
+                self._count -= 1
+                if session is not None:
+                    session.close()
+            self._condition.notify()
+
+    def run(self, script: str, timeout: float = 60) -> Tuple[int, str, str]:
+        """
+        Run a script on a free session
+
+        Returns:
+            Tuple of (exit status, stdout, stderr)
+
+        Raises:
+            subprocess.TimeoutExpired, ShellSessionError: As ShellSession.execute
+        """
+        session = self._acquire()
+        try:
+            return session.execute(script, timeout)
+        finally:
+            self._release(session)
+
+    def close(self):
+        """Stop every idle session (busy ones stop when released)"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._condition.notify_all()
+        for session in idle:
+            session.close()
+
+
+_powershell_pool: Optional[ShellPool] = None
+_powershell_pool_lock = threading.Lock()
+
+
+def get_powershell_pool() -> ShellPool:
+    """Shared PowerShell session pool (closed at exit)"""
+    global _powershell_pool
+    with _powershell_pool_lock:
+        if _powershell_pool is None:
+            _powershell_pool = ShellPool(
+                POWERSHELL_SESSION, frame_powershell, POWERSHELL_POOL_SIZE,
+                init="$ProgressPreference = 'SilentlyContinue'; "
+                     "[Console]::OutputEncoding = [Text.Encoding]::UTF8"
+            )
+            atexit.register(_powershell_pool.close)
+        return _powershell_pool
+
+
+def _is_dangerous_powershell(script: str) -> bool:
+    return _policy.check_powershell(script).action == BLOCK
+
+
+def _poolable_powershell(command: List[str]) -> Optional[str]:
+    """Script of a plain 'powershell [flags] -Command <script>' call, None otherwise"""
+    if len(command) < 3 or os.path.basename(command[0]).lower() not in ('powershell', 'powershell.exe'):
+        return None
+    args = [arg.lower() for arg in command[1:-2]]
+    i = 0
+    while i < len(args):
+        if args[i] == '-executionpolicy' and i + 1 < len(args) and args[i + 1] == 'bypass':
+            i += 2
+        elif args[i] in _POOLABLE_FLAGS:
+            i += 1
+        else:
+            return None
+    if command[-2].lower() != '-command' or command[-1] == '-':
+        return None
+    return command[-1]
+
+
+def _run_pooled(command: List[str], script: str, timeout: float) -> subprocess.CompletedProcess:
+    """Run a PowerShell script on the session pool, as subprocess.run would"""
+    status, stdout, stderr = get_powershell_pool().run(script, timeout)
+    return subprocess.CompletedProcess(command, status, stdout, stderr)
+
+
+# Seconds a read-only query result is reused
+DEFAULT_QUERY_TTL = 30.0
+
+# Cached query results kept at most (oldest dropped first)
+MAX_CACHED_QUERIES = 256
+
+# Subsystem touched by commands of an executable: (scope, index of the
+# argument naming the object, e.g. the service of 'sc stop X')
+_SCOPES = {
+    'sc': ('service', 2),
+    'net': ('service', 2),
+    'powercfg': ('power', None),
+    'netsh': ('network', None),
+    'ipconfig': ('network', None),
+    'wmic': ('wmi', None),
+    'reg': ('registry', None),
+    'schtasks': ('tasks', None),
+    'tasklist': ('process', None),
+    'taskkill': ('process', None),
+}
+
+# Cmdlet nouns of PowerShell scripts and the subsystem they belong to
+_POWERSHELL_SCOPES = (
+    ('service', 'service'),
+    ('netadapter', 'network'),
+    ('netipconfiguration', 'network'),
+    ('dnsclient', 'network'),
+    ('appxpackage', 'appx'),
+    ('scheduledtask', 'tasks'),
+    ('itemproperty', 'registry'),
+)
+
+# Scope of commands touching an unknown subsystem (mutations clear everything)
+SCOPE_ANY = ('*',)
+
+
+def command_scope(command: List[str]) -> Tuple[str, ...]:
+    """
+    Subsystem a command reads or changes, most general part first
+
+    ('service', 'spooler') for 'sc query Spooler' or 'sc stop Spooler',
+    ('power',) for any powercfg call, SCOPE_ANY when unknown.
+    """
+    if not command:
+        return SCOPE_ANY
+    exe = os.path.basename(command[0]).lower()
+    if exe.endswith('.exe'):
+        exe = exe[:-4]
+    script = _poolable_powershell(command)
+    if script is not None:
+        script = script.lower()
+        scopes = {scope for noun, scope in _POWERSHELL_SCOPES if noun in script}
+        return (scopes.pop(),) if len(scopes) == 1 else SCOPE_ANY
+    rule = _SCOPES.get(exe)
+    if rule is None:
+        return SCOPE_ANY
+    scope, target = rule
+    if target is not None and len(command) > target and not command[target].startswith(('/', '-')):
+        return (scope, command[target].lower())
+    return (scope,)
+
+
+def _overlaps(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    if a == SCOPE_ANY or b == SCOPE_ANY:
+        return True
+    length = min(len(a), len(b))
+    return a[:length] == b[:length]
+
+
+class CommandCache:
+    """
+    TTL memoisation of read-only command results
+
+    Results are keyed on the exact argv. Every mutating command drops the
+    results of the subsystem it touches ('sc stop X' drops 'sc query X'
+    and 'sc query', not 'sc query Y'). A query that was running while a
+    mutation of its subsystem happened is not stored, so a result older
+    than the mutation is never served.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_QUERY_TTL, max_entries: int = MAX_CACHED_QUERIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # argv -> (expiry, scope, result)
+        self._entries: Dict[Tuple[str, ...], Tuple[float, Tuple[str, ...],
+                                                   subprocess.CompletedProcess]] = {}
+        self._mutations = 0
+        self._lock = threading.Lock()
+
+    def get(self, command: List[str]) -> Optional[subprocess.CompletedProcess]:
+        """Cached result, or None (counted as a miss)"""
+        key = tuple(command)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.hits += 1
+                result = entry[2]
+                return subprocess.CompletedProcess(result.args, result.returncode,
+                                                   result.stdout, result.stderr)
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def generation(self) -> int:
+        """Mutation counter, read before running a query"""
+        return self._mutations
+
+    def put(self, command: List[str], result: subprocess.CompletedProcess, generation: int):
+        """Store a query result unless a mutation happened since generation"""
+        with self._lock:
+            if generation != self._mutations:
+                return
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[tuple(command)] = (self.clock() + self.ttl, command_scope(command), result)
+
+    def invalidate(self, command: List[str]) -> int:
+        """
+        Drop the results of the subsystem a mutating command touches
+
+        Returns:
+            Number of results dropped
+        """
+        scope = command_scope(command)
+        with self._lock:
+            self._mutations += 1
+            stale = [key for key, (_, entry_scope, _) in self._entries.items()
+                     if _overlaps(scope, entry_scope)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._mutations += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+            }
+
+
+_command_cache = CommandCache()
+
+
+def get_command_cache() -> CommandCache:
+    """Cache used by run_command(read_only=True)"""
+    return _command_cache
+
+
+_policy = DEFAULT_POLICY
+
+
+def set_command_policy(policy: CommandPolicy):
+    """Replace the policy every runner checks commands against"""
+    global _policy
+    _policy = policy
+
+
+def get_command_policy() -> CommandPolicy:
+    return _policy
+
+
+def _check_command(command: List[str], shell: bool) -> bool:
+    """Policy check shared by the command runners (logs the verdict)"""
+    decision = _policy.check(command, shell)
+    if decision.action == BLOCK:
+        logger.error(f"BLOCKED dangerous command: {command}")
+        return False
+    if decision.action == WARN:
+        logger.warning(f"Potentially unsafe executable: {command[0]}")
+    return True
+
 
 def run_command(
     command: List[str],
     shell: bool = False,
     capture_output: bool = True,
     timeout: int = 60,
-    check: bool = False
+    check: bool = False,
+    read_only: bool = False
 ) -> Optional[subprocess.CompletedProcess]:
     """
     Safely run a system command with protections
     
+    Plain 'powershell -Command <script>' calls run on a pooled PowerShell
+    session instead of a new process (see ShellPool).
+    
     Args:
         command: List of command arguments
         shell: Whether to use shell (avoid if possible)
         capture_output: Capture stdout/stderr
         timeout: Command timeout in seconds
         check: Raise exception on non-zero exit
+        read_only: The command only queries state: its result is reused for
+                   DEFAULT_QUERY_TTL seconds (see CommandCache). Other
+                   commands drop the cached results of their subsystem.
     
     Returns:
         CompletedProcess object or None if blocked/failed
     """
-    # Security: Don't allow dangerous commands
-    dangerous_commands = [
-        'format',
-        'del /f /s /q c:\\',
-        'rd /s /q c:\\',
-        'reg delete hklm',
-        'diskpart',
-        'bcdedit /delete',
-    ]
-    
-    command_str = ' '.join(command).lower()
-    for dangerous in dangerous_commands:
-        if dangerous in command_str:
-            logger.error(f"BLOCKED dangerous command: {command}")
-            return None
+    if not _check_command(command, shell):
+        return None
     
-    # Security: Validate command exists and is in safe locations
-    if command and not shell:
-        exe = command[0].lower()
-        allowed_exes = [
-            'powershell', 'cmd', 'powercfg', 'sc', 'schtasks',
-            'netsh', 'reg', 'wmic', 'ipconfig', 'sfc', 'dism',
-            'chkdsk', 'cleanmgr', 'defrag', 'taskkill', 'tasklist',
-            'vssadmin', 'fsutil', 'compact', 'nvidia-settings', 
-            'radeonsettings.exe', 'net', 'del', 'ren', 'start'
-        ]
-        
-        # Check if it's an allowed executable
-        exe_name = exe.split('\\')[-1].replace('.exe', '')
-        if exe_name not in allowed_exes and '\\' not in exe:
-            if not any(allowed in exe_name for allowed in allowed_exes):
-                logger.warning(f"Potentially unsafe executable: {exe}")
+    if read_only:
+        cached = _command_cache.get(command)
+        if cached is not None:
+            return cached
+        generation = _command_cache.generation()
+    else:
+        _command_cache.invalidate(command)
     
     try:
-        result = subprocess.run(
-            command,
-            shell=shell,
-            capture_output=capture_output,
-            text=True,
-            timeout=timeout,
-            check=check
-        )
+        script = _poolable_powershell(command) if command and not shell and capture_output else None
+        result = None
+        if script is not None:
+            try:
+                result = _run_pooled(command, script, timeout)
+            except ShellUnavailable as e:
+                logger.warning(f"PowerShell session unavailable, starting a process: {e}")
+        if result is None:
+            result = subprocess.run(
+                command,
+                shell=shell,
+                capture_output=capture_output,
+                text=True,
+                timeout=timeout,
+                check=check
+            )
+        elif check:
+            result.check_returncode()
         
         if result.returncode != 0:
             logger.warning(f"Command failed (exit {result.returncode}): {' '.join(command)}")
             if result.stderr:
                 logger.warning(f"Error output: {result.stderr}")
         
+        # Failures are not cached: the next query retries
+        if read_only and capture_output and result.returncode == 0:
+            _command_cache.put(command, result, generation)
         return result
         
     except subprocess.TimeoutExpired:
@@ -91,6 +619,11 @@ def run_command(
     except Exception as e:
         logger.error(f"Unexpected error running command: {e}")
         return None
+    
+    finally:
+        if not read_only:
+            # Again once done: queries run meanwhile saw the old state
+            _command_cache.invalidate(command)
 
 
 def run_powershell(
@@ -108,18 +641,9 @@ def run_powershell(
         Tuple of (success, stdout, stderr)
     """
     # Security checks for PowerShell
-    dangerous_patterns = [
-        'remove-item -recurse c:\\',
-        'format-volume',
-        'clear-disk',
-        'remove-partition',
-    ]
-    
-    script_lower = script.lower()
-    for dangerous in dangerous_patterns:
-        if dangerous in script_lower:
-            logger.error(f"BLOCKED dangerous PowerShell script")
-            return False, "", "Script blocked for security"
+    if _is_dangerous_powershell(script):
+        logger.error(f"BLOCKED dangerous PowerShell script")
+        return False, "", "Script blocked for security"
     
     command = [
         'powershell',
@@ -129,7 +653,257 @@ def run_powershell(
         '-Command', script
     ]
     
-    return run_command(command, timeout=timeout)
+    # Runs on a pooled session (see run_command)
+    result = run_command(command, timeout=timeout)
+    if result is None:
+        return False, "", "Script blocked or failed to run"
+    return result.returncode == 0, result.stdout or "", result.stderr or ""
+
+
+# Commands run_command_async runs at once, all event loops and threads together
+MAX_CONCURRENT_COMMANDS = 4
+
+# Seconds between two checks of a threading.Event cancelling async commands
+CANCEL_POLL_INTERVAL = 0.1
+
+# Receives (command index, 'stdout' or 'stderr', line without its newline)
+LineCallback = Callable[[int, str, str], None]
+
+
+class _CommandSlots:
+    """
+    Process-wide concurrency limit for async commands
+
+    Unlike asyncio.Semaphore it is not bound to one event loop, so modules
+    running their own loops on worker threads share the same limit. A
+    waiter cancelled while a slot is being handed to it passes it on.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self._waiters: List[asyncio.Future] = []
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            if self.running < self.limit and not self._waiters:
+                self.running += 1
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # Cancelled after the slot was granted
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.running -= 1
+            self._wake()
+
+    def set_limit(self, limit: int):
+        with self._lock:
+            self.limit = limit
+            self._wake()
+
+    def _wake(self):
+        """Hand free slots to waiters (lock held)"""
+        while self._waiters and self.running < self.limit:
+            waiter = self._waiters.pop(0)
+            try:
+                waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+            except RuntimeError:
+                # Its event loop is closed
+                continue
+            # Counted as soon as it is handed over
+            self.running += 1
+
+    def _grant(self, waiter: asyncio.Future):
+        if waiter.done():
+            # Cancelled meanwhile
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+_slots = _CommandSlots(MAX_CONCURRENT_COMMANDS)
+
+
+def set_command_concurrency(limit: int):
+    """Change the number of async commands run at once"""
+    # Waiting commands start right away when the limit is raised
+    _slots.set_limit(max(1, limit))
+
+
+async def _pump_lines(stream: asyncio.StreamReader, sink: List[str],
+                      on_line: Optional[Callable[[str], None]]):
+    encoding = locale.getpreferredencoding(False)
+    while True:
+        raw = await stream.readline()
+        if not raw:
+            return
+        line = raw.decode(encoding, errors='replace').replace('\r\n', '\n')
+        sink.append(line)
+        if on_line is not None:
+            on_line(line.rstrip('\n'))
+
+
+async def _wait_cancel(cancel: threading.Event):
+    while not cancel.is_set():
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+
+def _shell_line(command: List[str]) -> str:
+    """Command line for shell=True: a single string as is, arguments quoted"""
+    if len(command) == 1:
+        return command[0]
+    if os.name == 'nt':
+        return subprocess.list2cmdline(command)
+    return shlex.join(command)
+
+
+async def run_command_async(
+    command: List[str],
+    timeout: float = 60,
+    shell: bool = False,
+    on_stdout: Optional[Callable[[str], None]] = None,
+    on_stderr: Optional[Callable[[str], None]] = None,
+    cancel: Optional[threading.Event] = None
+) -> Optional[subprocess.CompletedProcess]:
+    """
+    Run a system command without blocking the event loop
+    
+    Same checks and result as run_command. At most MAX_CONCURRENT_COMMANDS
+    commands run at once; the others wait for a slot, and the time-out only
+    starts once the command is launched. Cancelling the task (or setting
+    cancel) kills the process. PowerShell commands get a process of their
+    own rather than the pooled session, so that they can be killed too.
+    
+    Args:
+        command: List of command arguments
+        timeout: Command timeout in seconds
+        shell: Whether to use shell (avoid if possible)
+        on_stdout: Receives each stdout line as it is printed
+        on_stderr: Receives each stderr line as it is printed
+        cancel: Kills the command when set (for callers on other threads)
+    
+    Returns:
+        CompletedProcess object or None if blocked/failed/cancelled
+    
+    Raises:
+        asyncio.CancelledError: If the task was cancelled
+    """
+    if not _check_command(command, shell):
+        return None
+    
+    _command_cache.invalidate(command)
+    await _slots.acquire()
+    try:
+        if cancel is not None and cancel.is_set():
+            return None
+        
+        try:
+            if shell:
+                process = await asyncio.create_subprocess_shell(
+                    _shell_line(command), stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE, stdin=asyncio.subprocess.DEVNULL)
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *command, stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE, stdin=asyncio.subprocess.DEVNULL)
+        except OSError as e:
+            logger.error(f"Unexpected error running command: {e}")
+            return None
+        
+        stdout: List[str] = []
+        stderr: List[str] = []
+        finished = asyncio.ensure_future(asyncio.gather(
+            _pump_lines(process.stdout, stdout, on_stdout),
+            _pump_lines(process.stderr, stderr, on_stderr),
+            process.wait()
+        ))
+        waiters = {finished}
+        if cancel is not None:
+            waiters.add(asyncio.ensure_future(_wait_cancel(cancel)))
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not finished.done():
+                # Time-out, cancel event or task cancellation
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                finished.cancel()
+                await asyncio.shield(process.wait())
+            for waiter in waiters - {finished}:
+                waiter.cancel()
+        
+        if finished not in done:
+            if cancel is not None and cancel.is_set():
+                logger.info(f"Command cancelled: {' '.join(command)}")
+            else:
+                logger.error(f"Command timeout after {timeout}s: {' '.join(command)}")
+            return None
+        
+        result = subprocess.CompletedProcess(command, process.returncode,
+                                             ''.join(stdout), ''.join(stderr))
+        if result.returncode != 0:
+            logger.warning(f"Command failed (exit {result.returncode}): {' '.join(command)}")
+            if result.stderr:
+                logger.warning(f"Error output: {result.stderr}")
+        return result
+    finally:
+        _slots.release()
+        _command_cache.invalidate(command)
+
+
+async def gather_commands(
+    commands: List[List[str]],
+    timeout: float = 60,
+    on_line: Optional[LineCallback] = None,
+    cancel: Optional[threading.Event] = None
+) -> List[Optional[subprocess.CompletedProcess]]:
+    """
+    Run independent commands concurrently (within the global limit)
+    
+    Args:
+        commands: Commands to run, in no particular order
+        timeout: Timeout in seconds of each command
+        on_line: Receives (command index, stream, line) as output comes in
+        cancel: Kills the running commands and skips the others when set
+    
+    Returns:
+        One result per command, in the order of commands (see run_command_async)
+    """
+    def stream(index: int, name: str) -> Optional[Callable[[str], None]]:
+        if on_line is None:
+            return None
+        return lambda line: on_line(index, name, line)
+    
+    return list(await asyncio.gather(*(
+        run_command_async(command, timeout, on_stdout=stream(index, 'stdout'),
+                          on_stderr=stream(index, 'stderr'), cancel=cancel)
+        for index, command in enumerate(commands)
+    )))
+
+
+def run_commands(
+    commands: List[List[str]],
+    timeout: float = 60,
+    on_line: Optional[LineCallback] = None,
+    cancel: Optional[threading.Event] = None
+) -> List[Optional[subprocess.CompletedProcess]]:
+    """gather_commands() for synchronous callers (runs its own event loop)"""
+    return asyncio.run(gather_commands(commands, timeout, on_line, cancel))
 
 
 def run_registry_command(
@@ -153,18 +927,9 @@ def run_registry_command(
         True if successful
     """
     # Security: Don't allow critical system keys to be deleted
-    critical_keys = [
-        'HKLM\\SYSTEM\\CurrentControlSet\\Control\\Session Manager',
-        'HKLM\\SYSTEM\\CurrentControlSet\\Services\\Tcpip',
-        'HKLM\\SOFTWARE\\Microsoft\\Windows NT\\CurrentVersion\\Winlogon',
-    ]
-    
-    key_lower = key.lower()
-    if operation == 'delete':
-        for critical in critical_keys:
-            if critical.lower() in key_lower:
-                logger.error(f"BLOCKED deletion of critical registry key: {key}")
-                return False
+    if _policy.check_registry(operation, key).action == BLOCK:
+        logger.error(f"BLOCKED deletion of critical registry key: {key}")
+        return False
     
     # Build command
     command = ['reg', operation, key]
@@ -180,59 +945,40 @@ def run_registry_command(
             command.extend(['/v', value_name])
         command.append('/f')
     
-    success, _, _ = run_command(command)
-    return success
+    return _succeeded(run_command(command))
+
+
+def _succeeded(result: Optional[subprocess.CompletedProcess]) -> bool:
+    return result is not None and result.returncode == 0
 
 
 def is_service_running(service_name: str) -> bool:
     """Check if a Windows service is running"""
-    try:
-        success, stdout, _ = run_command(
-            ['sc', 'query', service_name],
-            timeout=10
-        )
-        return success and 'RUNNING' in stdout
-    except:
-        return False
+    result = run_command(['sc', 'query', service_name], timeout=10, read_only=True)
+    return _succeeded(result) and 'RUNNING' in result.stdout
 
 
 def stop_service(service_name: str) -> bool:
     """Safely stop a Windows service"""
     # Don't allow stopping critical services
-    critical_services = [
-        'wuauserv',  # Windows Update (let user control this)
-        'BITS',      # Background Intelligent Transfer
-        'CryptSvc',  # Cryptographic Services
-        'TrustedInstaller',  # Windows Modules Installer
-        'Winmgmt',   # Windows Management Instrumentation
-    ]
-    
-    if service_name in critical_services:
+    if _policy.check_service(SERVICE_STOP, service_name).action == BLOCK:
         logger.warning(f"Refusing to stop critical service: {service_name}")
         return False
     
-    success, _, _ = run_command(['sc', 'stop', service_name])
-    return success
+    return _succeeded(run_command(['sc', 'stop', service_name]))
 
 
 def disable_service(service_name: str) -> bool:
     """Safely disable a Windows service"""
     # Same critical services protection
-    critical_services = [
-        'BITS', 'CryptSvc', 'TrustedInstaller', 'Winmgmt'
-    ]
-    
-    if service_name in critical_services:
+    if _policy.check_service(SERVICE_DISABLE, service_name).action == BLOCK:
         logger.warning(f"Refusing to disable critical service: {service_name}")
         return False
     
-    success, _, _ = run_command(
-        ['sc', 'config', service_name, 'start=disabled']
-    )
-    return success
+    # sc expects 'start=' and the value as two arguments
+    return _succeeded(run_command(['sc', 'config', service_name, 'start=', 'disabled']))
 
 
 def start_service(service_name: str) -> bool:
     """Safely start a Windows service"""
-    success, _, _ = run_command(['sc', 'start', service_name])
-    return success
+    return _succeeded(run_command(['sc', 'start', service_name]))
@@ -0,0 +1,336 @@
+"""
+Persistent incremental scan index
+Remembers per-directory file totals in SQLite so that rescans only re-list
+the directories that changed
+"""
+
+import os
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.fs_scanner import PathLike, ScanResult, is_link, is_protected_folder, iter_files
+from utils.clean_planner import plan_targets
+from utils.progress import DEFAULT_INTERVAL, ProgressEvent, ProgressThrottle
+from utils.clean_filters import FilePredicate
+from utils.size_accounting import (
+    bind_cache_accounting, file_size, get_size_provider, size_accounting
+)
+
+logger = get_logger(__name__)
+
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+DEFAULT_INDEX_FILE = CACHE_DIR / "scan_index.db"
+
+# Directory mtimes do not change when an existing file grows in place:
+# entries older than this are re-listed anyway
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+class _DirRecord:
+    """Indexed state of one directory (its direct files only)"""
+
+    __slots__ = ('mtime_ns', 'size', 'count', 'subdirs', 'scanned_at')
+
+    def __init__(self, mtime_ns: int, size: int, count: int,
+                 subdirs: List[str], scanned_at: float):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.count = count
+        self.subdirs = subdirs
+        self.scanned_at = scanned_at
+
+
+class ScanIndex:
+    """
+    Incremental scanner backed by a per-directory SQLite index
+
+    For every directory the index stores its mtime, the total size and
+    count of its direct files and the names of its subdirectories. A
+    directory whose mtime did not change is not listed again: its totals
+    are reused and only its (known) subdirectories are checked.
+    """
+
+    def __init__(self, db_path: Optional[PathLike] = None, max_age: float = DEFAULT_MAX_AGE):
+        """
+        Args:
+            db_path: SQLite file (cache/scan_index.db in the app directory by default)
+            max_age: Seconds after which an unchanged directory is re-listed
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_INDEX_FILE
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._records: Dict[str, _DirRecord] = {}
+        self._dirty: Dict[str, _DirRecord] = {}
+        self._forgotten: List[str] = []
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index database, creating it if needed"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+            "count INTEGER, subdirs TEXT, scanned_at REAL)"
+        )
+        bind_cache_accounting(conn, ["dirs"])
+        return conn
+
+    def _load(self):
+        """Load every indexed directory in memory"""
+        self.size_accounting = size_accounting()
+        try:
+            conn = self._connect()
+            try:
+                for path, mtime_ns, size, count, subdirs, scanned_at in conn.execute(
+                        "SELECT path, mtime_ns, size, count, subdirs, scanned_at FROM dirs"):
+                    self._records[path] = _DirRecord(
+                        mtime_ns, size, count, json.loads(subdirs), scanned_at
+                    )
+            finally:
+                conn.close()
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Scan index unavailable, starting from scratch: {e}")
+            self._records = {}
+
+    def save(self) -> bool:
+        """Write the directories refreshed since the last save"""
+        self._check_accounting()
+        if not self._dirty and not self._forgotten:
+            return True
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    for prefix in self._forgotten:
+                        conn.execute(
+                            "DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+                            (prefix, len(prefix) + 1, prefix + os.sep)
+                        )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (path, r.mtime_ns, r.size, r.count, json.dumps(r.subdirs), r.scanned_at)
+                            for path, r in self._dirty.items()
+                        ]
+                    )
+            finally:
+                conn.close()
+            self._dirty = {}
+            self._forgotten = []
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Could not save scan index: {e}")
+            return False
+
+    def clear(self):
+        """Forget every indexed directory"""
+        self._records = {}
+        self._dirty = {}
+        self._forgotten = []
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM dirs")
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Could not clear scan index: {e}")
+
+    def _check_accounting(self):
+        """Drop totals counted under another size accounting mode"""
+        if self.size_accounting != size_accounting():
+            self._records = {}
+            self._dirty = {}
+            self._forgotten = []
+            self._load()
+
+    def _forget(self, path: str):
+        """Drop a directory and all its descendants from the index"""
+        prefix = path + os.sep
+        for key in [k for k in self._records if k == path or k.startswith(prefix)]:
+            del self._records[key]
+            self._dirty.pop(key, None)
+        self._forgotten.append(path)
+
+    def _refresh(self, path: str, mtime_ns: int) -> _DirRecord:
+        """List a directory and record the totals of its direct files"""
+        size = 0
+        count = 0
+        subdirs = []
+        sized = get_size_provider()
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False) and not is_link(entry):
+                        subdirs.append(entry.name)
+                    else:
+                        size += sized(entry.path, entry.stat(follow_symlinks=False))
+                        count += 1
+                except OSError:
+                    # Vanished or inaccessible file
+                    pass
+
+        previous = self._records.get(path)
+        if previous is not None:
+            for name in set(previous.subdirs) - set(subdirs):
+                self._forget(os.path.join(path, name))
+
+        record = _DirRecord(mtime_ns, size, count, subdirs, time.time())
+        self._records[path] = record
+        self._dirty[path] = record
+        return record
+
+    def scan_tree(self, path: PathLike,
+                  progress: Optional[ProgressThrottle] = None) -> Tuple[int, int]:
+        """
+        Calculate the size and file count of a directory tree incrementally
+
+        Args:
+            path: Directory to measure
+            progress: Receives the totals of every directory as it is read
+
+        Returns:
+            Tuple of (total_size, file_count)
+        """
+        self._check_accounting()
+        total_size = 0
+        file_count = 0
+        now = time.time()
+        stack = [os.fspath(path)]
+
+        while stack:
+            current = stack.pop()
+            try:
+                mtime_ns = os.stat(current, follow_symlinks=False).st_mtime_ns
+            except OSError:
+                if current in self._records:
+                    self._forget(current)
+                continue
+
+            record = self._records.get(current)
+            if (record is not None and record.mtime_ns == mtime_ns
+                    and now - record.scanned_at < self.max_age):
+                self.hits += 1
+            else:
+                self.misses += 1
+                try:
+                    # mtime is read before listing: a change during the
+                    # listing makes the next scan refresh this directory
+                    record = self._refresh(current, mtime_ns)
+                except OSError as e:
+                    logger.debug(f"Cannot scan {current}: {e}")
+                    continue
+
+            total_size += record.size
+            file_count += record.count
+            if progress is not None:
+                progress.add(record.size, record.count, current)
+            stack.extend(os.path.join(current, name) for name in record.subdirs)
+
+        return total_size, file_count
+
+    def scan_categories(
+        self,
+        targets: Dict[str, List[Tuple[PathLike, str]]],
+        categories: Optional[List[str]] = None,
+        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+        interval: float = DEFAULT_INTERVAL,
+        filters: Optional[Dict[str, FilePredicate]] = None
+    ) -> Dict[str, ScanResult]:
+        """
+        Incremental equivalent of utils.fs_scanner.scan_categories
+
+        The direct children of each planned root are always listed (to apply
+        the category patterns); their subtrees go through the index. The
+        index only holds per-directory totals, so categories with filters
+        are walked file by file instead. The index is saved at the end.
+
+        Args:
+            targets: Mapping of category -> list of (path, pattern)
+            categories: Categories to scan (all if None)
+            on_progress: Receives rate-limited ProgressEvent updates, then a
+                         final event with done=True and the results
+            interval: Minimum delay in seconds between two progress events
+            filters: Mapping of category -> predicate(path, stat)
+        """
+        self._check_accounting()
+        filters = filters or {}
+        progress = ProgressThrottle(on_progress, "scan", interval) if on_progress else None
+        if categories is not None:
+            targets = {cat: paths for cat, paths in targets.items() if cat in categories}
+
+        results = {category: ScanResult(category) for category in targets}
+
+        for root in plan_targets(targets):
+            if is_protected_folder(root.path):
+                logger.warning(f"Skipping critical folder: {root.path}")
+                continue
+            try:
+                if os.path.isfile(root.path):
+                    category = root.classify(os.path.basename(root.path))
+                    st = os.lstat(root.path)
+                    predicate = filters.get(category)
+                    if category is not None and (predicate is None or predicate(root.path, st)):
+                        size = file_size(root.path, st)
+                        results[category].add(size, 1)
+                        if progress is not None:
+                            progress.add(size, 1, root.path)
+                    continue
+                with os.scandir(root.path) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.debug(f"Cannot scan {root.path}: {e}")
+                continue
+
+            for entry in entries:
+                category = root.classify(entry.name)
+                if category is None:
+                    continue
+                predicate = filters.get(category)
+                try:
+                    if entry.is_dir(follow_symlinks=False) and not is_link(entry):
+                        if predicate is None:
+                            results[category].add(*self.scan_tree(entry.path, progress))
+                        else:
+                            results[category].add(*_scan_filtered(entry.path, predicate, progress))
+                    else:
+                        st = entry.stat(follow_symlinks=False)
+                        if predicate is not None and not predicate(entry.path, st):
+                            continue
+                        size = file_size(entry.path, st)
+                        results[category].add(size, 1)
+                        if progress is not None:
+                            progress.add(size, 1, root.path)
+                except OSError:
+                    pass
+
+        self.save()
+        logger.debug(f"Scan index: {self.hits} directories reused, {self.misses} listed")
+        if progress is not None:
+            progress.finish(results)
+        return results
+
+
+def _scan_filtered(path: str, predicate: FilePredicate,
+                   progress: Optional[ProgressThrottle] = None) -> Tuple[int, int]:
+    """Walk a subtree without the index, counting the files accepted by predicate"""
+    total_size = 0
+    file_count = 0
+    sized = get_size_provider()
+    for entry in iter_files(path):
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if predicate(entry.path, st):
+            total_size += sized(entry.path, st)
+            file_count += 1
+    if progress is not None:
+        progress.add(total_size, file_count, path)
+    return total_size, file_count
@@ -0,0 +1,460 @@
+"""
+Batched service control
+Brings a set of Windows services to target states: their current states
+are read in one query, only the services that differ are started, stopped
+or reconfigured (in parallel), then one query per round waits, with
+increasing delays, until they settle
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from utils.logger import get_logger
+from utils.command_policy import BLOCK, SERVICE_DISABLE, SERVICE_STOP
+from utils.safe_commands import (
+    MAX_CONCURRENT_COMMANDS, disable_service, get_command_policy, run_command,
+    start_service, stop_service
+)
+
+logger = get_logger(__name__)
+
+# Service states (Get-Service Status, lower-case)
+RUNNING = "running"
+STOPPED = "stopped"
+START_PENDING = "startpending"
+STOP_PENDING = "stoppending"
+PAUSED = "paused"
+
+# Start types (Get-Service StartType, lower-case)
+AUTOMATIC = "automatic"
+MANUAL = "manual"
+DISABLED = "disabled"
+
+# State a pending service is heading to
+_SETTLES_TO = {START_PENDING: RUNNING, STOP_PENDING: STOPPED}
+
+# sc config start= values
+_SC_START_TYPES = {AUTOMATIC: 'auto', MANUAL: 'demand', DISABLED: 'disabled'}
+
+# Services started, stopped or reconfigured at once
+DEFAULT_SERVICE_WORKERS = MAX_CONCURRENT_COMMANDS
+
+# Seconds waited for every service to reach its target state
+DEFAULT_SETTLE_TIMEOUT = 30.0
+
+# Delay between two state queries: doubled after each one, up to the maximum
+FIRST_POLL_DELAY = 0.1
+MAX_POLL_DELAY = 2.0
+
+
+class ServiceInfo:
+    """State and start type of one service"""
+
+    __slots__ = ('name', 'state', 'start_type')
+
+    def __init__(self, name: str, state: str, start_type: str):
+        self.name = name
+        self.state = state
+        self.start_type = start_type
+
+    def __repr__(self):
+        return f"ServiceInfo({self.name!r}, {self.state}, {self.start_type})"
+
+
+class ServiceController(ABC):
+    """
+    Service control backend
+
+    Implementations query many services at once and act on one service
+    per call. WindowsServiceController is the default; FakeServiceController
+    simulates one for tests.
+    """
+
+    @abstractmethod
+    def query(self, names: Iterable[str]) -> Dict[str, ServiceInfo]:
+        """Current state of the named services (services not installed are absent)"""
+
+    @abstractmethod
+    def start(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def stop(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def set_start_type(self, name: str, start_type: str) -> bool:
+        pass
+
+
+class WindowsServiceController(ServiceController):
+    """Queries through Get-Service, acts through sc"""
+
+    def query(self, names: Iterable[str]) -> Dict[str, ServiceInfo]:
+        quoted = ','.join("'" + name.replace("'", "''") + "'" for name in names)
+        if not quoted:
+            return {}
+        script = (
+            f"Get-Service -Name {quoted} -ErrorAction SilentlyContinue | "
+            "ForEach-Object { \"$($_.Name)|$($_.Status)|$($_.StartType)\" }"
+        )
+        # Not read_only: waiting for a transition needs the live state, not
+        # a cached one
+        result = run_command(['powershell', '-Command', script], timeout=30)
+        services = {}
+        if result is None:
+            return services
+        for line in result.stdout.splitlines():
+            parts = line.strip().split('|')
+            if len(parts) == 3:
+                name, state, start_type = parts
+                services[name.lower()] = ServiceInfo(name, state.lower(), start_type.lower())
+        return services
+
+    def start(self, name: str) -> bool:
+        return start_service(name)
+
+    def stop(self, name: str) -> bool:
+        return stop_service(name)
+
+    def set_start_type(self, name: str, start_type: str) -> bool:
+        if start_type == DISABLED:
+            return disable_service(name)
+        result = run_command(['sc', 'config', name, 'start=', _SC_START_TYPES[start_type]])
+        return result is not None and result.returncode == 0
+
+
+class FakeServiceController(ServiceController):
+    """
+    In-memory service controller
+
+    Started and stopped services stay pending for `delay` seconds, like
+    real services; disabled services cannot be started. Every call is
+    recorded in `calls` and the number of queries in `queries`.
+    """
+
+    def __init__(
+        self,
+        services: Dict[str, tuple],
+        delay: float = 0.0,
+        latency: float = 0.0,
+        failing: Iterable[str] = (),
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            services: Name -> (state, start type)
+            delay: Seconds a service stays pending after start/stop
+            latency: Seconds each action takes (to observe concurrency)
+            failing: Services whose actions fail
+            clock: Time source
+        """
+        self.services = {name.lower(): ServiceInfo(name, state, start_type)
+                         for name, (state, start_type) in services.items()}
+        self.delay = delay
+        self.latency = latency
+        self.failing = {name.lower() for name in failing}
+        self.clock = clock
+        self.calls: List[tuple] = []
+        self.queries = 0
+        self.max_active = 0
+        self._active = 0
+        self._settle_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def query(self, names: Iterable[str]) -> Dict[str, ServiceInfo]:
+        with self._lock:
+            self.queries += 1
+            now = self.clock()
+            found = {}
+            for name in names:
+                info = self.services.get(name.lower())
+                if info is None:
+                    continue
+                if info.state in _SETTLES_TO and self._settle_at.get(info.name, now) <= now:
+                    info.state = _SETTLES_TO[info.state]
+                found[name.lower()] = ServiceInfo(info.name, info.state, info.start_type)
+            return found
+
+    def _act(self, action: str, name: str, *args) -> Optional[ServiceInfo]:
+        with self._lock:
+            self.calls.append((action, name) + args)
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self._active -= 1
+        if name.lower() in self.failing:
+            return None
+        return self.services.get(name.lower())
+
+    def _transition(self, info: ServiceInfo, pending: str):
+        with self._lock:
+            info.state = pending
+            self._settle_at[info.name] = self.clock() + self.delay
+
+    def start(self, name: str) -> bool:
+        info = self._act('start', name)
+        if info is None or info.start_type == DISABLED or info.state != STOPPED:
+            return False
+        self._transition(info, START_PENDING)
+        return True
+
+    def stop(self, name: str) -> bool:
+        info = self._act('stop', name)
+        if info is None or info.state not in (RUNNING, PAUSED):
+            return False
+        self._transition(info, STOP_PENDING)
+        return True
+
+    def set_start_type(self, name: str, start_type: str) -> bool:
+        info = self._act('set_start_type', name, start_type)
+        if info is None:
+            return False
+        with self._lock:
+            info.start_type = start_type
+        return True
+
+
+class ServiceTransition:
+    """Changes needed to bring one service to its target"""
+
+    __slots__ = ('name', 'current', 'state', 'start_type')
+
+    def __init__(self, name: str, current: ServiceInfo, state: Optional[str],
+                 start_type: Optional[str]):
+        self.name = name
+        self.current = current
+        # Target state / start type, None when already right
+        self.state = state
+        self.start_type = start_type
+
+    def __repr__(self):
+        return (f"ServiceTransition({self.name!r}, {self.current.state} -> {self.state}, "
+                f"{self.current.start_type} -> {self.start_type})")
+
+
+class ServiceReport:
+    """Outcome of apply_service_states()"""
+
+    def __init__(self):
+        # Services brought to their target
+        self.changed: List[str] = []
+        # Services already in their target
+        self.unchanged: List[str] = []
+        # Service -> reason it was not touched
+        self.skipped: Dict[str, str] = {}
+        # Service -> reason it did not reach its target
+        self.failed: Dict[str, str] = {}
+        self.queries = 0
+
+    @property
+    def success(self) -> bool:
+        """True if no transition failed (skipped services aside)"""
+        return not self.failed
+
+    def to_dict(self) -> Dict:
+        """Serializable representation"""
+        return {
+            'changed': len(self.changed),
+            'unchanged': len(self.unchanged),
+            'skipped': len(self.skipped),
+            'failed': len(self.failed),
+            'queries': self.queries,
+        }
+
+    def __repr__(self):
+        return (f"ServiceReport(changed={len(self.changed)}, unchanged={len(self.unchanged)}, "
+                f"skipped={len(self.skipped)}, failed={len(self.failed)})")
+
+
+def plan_transitions(
+    snapshot: Dict[str, ServiceInfo],
+    states: Dict[str, str],
+    start_types: Optional[Dict[str, str]] = None,
+    report: Optional[ServiceReport] = None
+) -> List[ServiceTransition]:
+    """
+    Minimal changes bringing the snapshot to the targets
+
+    A service already in (or heading to) its target state needs nothing;
+    services not installed, protected by the command policy, or disabled
+    without a new start type are skipped (and recorded in report).
+    """
+    start_types = start_types or {}
+    report = report if report is not None else ServiceReport()
+    policy = get_command_policy()
+    transitions = []
+    for name in dict.fromkeys(list(states) + list(start_types)):
+        current = snapshot.get(name.lower())
+        if current is None:
+            report.skipped[name] = "not installed"
+            continue
+        state = states.get(name)
+        if state is not None and _SETTLES_TO.get(current.state, current.state) == state:
+            state = None
+        start_type = start_types.get(name)
+        if start_type == current.start_type:
+            start_type = None
+        if state == STOPPED and policy.check_service(SERVICE_STOP, name).action == BLOCK:
+            report.skipped[name] = "critical service"
+            continue
+        if start_type == DISABLED and policy.check_service(SERVICE_DISABLE, name).action == BLOCK:
+            report.skipped[name] = "critical service"
+            continue
+        if state == RUNNING and (start_type or current.start_type) == DISABLED:
+            report.skipped[name] = "disabled"
+            continue
+        if state is None and start_type is None:
+            if current.state not in _SETTLES_TO:
+                report.unchanged.append(name)
+                continue
+        transitions.append(ServiceTransition(name, current, state, start_type))
+    return transitions
+
+
+def _expected_state(transition: ServiceTransition) -> str:
+    """State the service should settle in once its transition is applied"""
+    current = transition.current.state
+    return transition.state or _SETTLES_TO.get(current, current)
+
+
+def _apply(controller: ServiceController, transition: ServiceTransition,
+           timeout: float, cancel: Optional[threading.Event]) -> Optional[str]:
+    """Issue the commands of one transition, returns a failure reason or None"""
+    name = transition.name
+    # Enabled before starting, stopped before disabling
+    if transition.start_type is not None and transition.state != STOPPED:
+        if not controller.set_start_type(name, transition.start_type):
+            return f"could not set start type {transition.start_type}"
+    if transition.state is not None:
+        if transition.current.state in _SETTLES_TO:
+            # Still heading the other way: it only accepts commands once settled
+            settled = _SETTLES_TO[transition.current.state]
+            if _wait(controller, {name: settled}, timeout, cancel)[1]:
+                return f"stuck in {transition.current.state}"
+        act = controller.start if transition.state == RUNNING else controller.stop
+        if not act(name):
+            return f"could not {'start' if transition.state == RUNNING else 'stop'}"
+    if transition.start_type is not None and transition.state == STOPPED:
+        if not controller.set_start_type(name, transition.start_type):
+            return f"could not set start type {transition.start_type}"
+    return None
+
+
+def _wait(
+    controller: ServiceController,
+    targets: Dict[str, str],
+    timeout: float,
+    cancel: Optional[threading.Event]
+) -> Tuple[int, Dict[str, str]]:
+    """
+    Query the services until each is in its target state
+
+    Returns:
+        (number of queries, services not in their target with their last state)
+    """
+    deadline = time.monotonic() + timeout
+    delay = FIRST_POLL_DELAY
+    pending = dict(targets)
+    last: Dict[str, str] = {}
+    queries = 0
+    while True:
+        snapshot = controller.query(pending)
+        queries += 1
+        for name in list(pending):
+            info = snapshot.get(name.lower())
+            last[name] = info.state if info is not None else "missing"
+            if info is not None and info.state == pending[name]:
+                del pending[name]
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        pause = min(delay, remaining)
+        if cancel is not None:
+            if cancel.wait(pause):
+                break
+        else:
+            time.sleep(pause)
+        delay = min(delay * 2, MAX_POLL_DELAY)
+    return queries, {name: last[name] for name in pending}
+
+
+def apply_service_states(
+    states: Dict[str, str],
+    start_types: Optional[Dict[str, str]] = None,
+    controller: Optional[ServiceController] = None,
+    workers: int = DEFAULT_SERVICE_WORKERS,
+    timeout: float = DEFAULT_SETTLE_TIMEOUT,
+    cancel: Optional[threading.Event] = None
+) -> ServiceReport:
+    """
+    Bring services to target states and start types
+
+    Args:
+        states: Service name -> RUNNING or STOPPED
+        start_types: Service name -> AUTOMATIC, MANUAL or DISABLED
+        controller: Backend (the current one by default, see set_service_controller)
+        workers: Services acted upon at once
+        timeout: Seconds waited for the services to settle
+        cancel: Stops waiting when set (commands already issued still apply)
+
+    Returns:
+        ServiceReport
+    """
+    controller = controller or _controller
+    report = ServiceReport()
+    names = dict.fromkeys(list(states) + list(start_types or {}))
+    snapshot = controller.query(names)
+    report.queries += 1
+
+    transitions = plan_transitions(snapshot, states, start_types, report)
+    if not transitions:
+        return report
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(transitions))),
+                            thread_name_prefix="services") as pool:
+        failures = list(pool.map(lambda t: _apply(controller, t, timeout, cancel), transitions))
+
+    issued = []
+    for transition, failure in zip(transitions, failures):
+        if failure is None:
+            issued.append(transition)
+        else:
+            report.failed[transition.name] = failure
+            logger.warning(f"Service {transition.name}: {failure}")
+
+    if issued:
+        queries, stuck = _wait(controller, {t.name: _expected_state(t) for t in issued},
+                               timeout, cancel)
+        report.queries += queries
+        for transition in issued:
+            if transition.name in stuck:
+                report.failed[transition.name] = f"still {stuck[transition.name]}"
+                logger.warning(f"Service {transition.name} did not reach "
+                               f"{_expected_state(transition)} (still {stuck[transition.name]})")
+            elif transition.state is None and transition.start_type is None:
+                # Only had to finish a pending transition
+                report.unchanged.append(transition.name)
+            else:
+                report.changed.append(transition.name)
+    logger.info(f"Services: {report}")
+    return report
+
+
+_controller: ServiceController = WindowsServiceController()
+
+
+def set_service_controller(controller: ServiceController):
+    """Replace the backend used by apply_service_states()"""
+    global _controller
+    _controller = controller
+
+
+def get_service_controller() -> ServiceController:
+    return _controller
@@ -0,0 +1,167 @@
+"""
+File size accounting
+Scans and cleaning reports count either the apparent size of files
+(st_size) or the space they actually occupy on disk, which is smaller for
+compressed and sparse files and rounded up to whole clusters otherwise
+"""
+
+import os
+import stat
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SIZE_APPARENT = "apparent"
+SIZE_ALLOCATED = "allocated"
+
+# Returns the size counted for a file from its path and lstat result
+SizeProvider = Callable[[str, os.stat_result], int]
+
+# POSIX st_blocks are always 512-byte units, whatever the filesystem block size
+POSIX_BLOCK = 512
+
+_NTFS_PACKED = stat.FILE_ATTRIBUTE_COMPRESSED | stat.FILE_ATTRIBUTE_SPARSE_FILE
+
+
+def apparent_size(path: str, st: os.stat_result) -> int:
+    """Logical file size (what applications read)"""
+    return st.st_size
+
+
+if os.name == 'nt':
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _GetCompressedFileSizeW = _kernel32.GetCompressedFileSizeW
+    _GetCompressedFileSizeW.argtypes = [wintypes.LPCWSTR, ctypes.POINTER(wintypes.DWORD)]
+    _GetCompressedFileSizeW.restype = wintypes.DWORD
+    _GetDiskFreeSpaceW = _kernel32.GetDiskFreeSpaceW
+    _GetDiskFreeSpaceW.argtypes = [wintypes.LPCWSTR] + [ctypes.POINTER(wintypes.DWORD)] * 4
+    _GetDiskFreeSpaceW.restype = wintypes.BOOL
+    _INVALID_FILE_SIZE = 0xFFFFFFFF
+
+    _clusters: Dict[str, int] = {}
+    _clusters_lock = threading.Lock()
+
+    def _cluster_size(path: str) -> int:
+        """Cluster size of the volume holding a path (cached per drive)"""
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        cluster = _clusters.get(drive)
+        if cluster is None:
+            sectors, sector_bytes, free, total = (wintypes.DWORD() for _ in range(4))
+            if _GetDiskFreeSpaceW(drive + '\\', ctypes.byref(sectors), ctypes.byref(sector_bytes),
+                                  ctypes.byref(free), ctypes.byref(total)):
+                cluster = sectors.value * sector_bytes.value or 1
+            else:
+                cluster = 1
+            with _clusters_lock:
+                _clusters[drive] = cluster
+        return cluster
+
+    def _packed_size(path: str) -> Optional[int]:
+        """Bytes actually stored for a compressed or sparse file"""
+        high = wintypes.DWORD()
+        low = _GetCompressedFileSizeW(path, ctypes.byref(high))
+        if low == _INVALID_FILE_SIZE and ctypes.get_last_error():
+            return None
+        return (high.value << 32) | low
+
+    def allocated_size(path: str, st: os.stat_result) -> int:
+        """Space used on disk: packed size of compressed/sparse files, rounded to clusters"""
+        size = st.st_size
+        if getattr(st, 'st_file_attributes', 0) & _NTFS_PACKED:
+            packed = _packed_size(path)
+            if packed is not None:
+                size = packed
+        cluster = _cluster_size(path)
+        return -(-size // cluster) * cluster
+else:
+    def allocated_size(path: str, st: os.stat_result) -> int:
+        """Space used on disk (st_blocks, sparse holes excluded)"""
+        blocks = getattr(st, 'st_blocks', None)
+        return blocks * POSIX_BLOCK if blocks is not None else st.st_size
+
+
+PROVIDERS: Dict[str, SizeProvider] = {
+    SIZE_APPARENT: apparent_size,
+    SIZE_ALLOCATED: allocated_size,
+}
+
+_accounting = SIZE_APPARENT
+_provider: SizeProvider = apparent_size
+
+
+def register_size_provider(name: str, provider: SizeProvider):
+    """Make an accounting mode available to set_size_accounting()"""
+    PROVIDERS[name] = provider
+
+
+def set_size_accounting(name: str):
+    """
+    Select how every scan, analysis and cleaning report counts file sizes
+
+    Raises:
+        ValueError: If no provider is registered under that name
+    """
+    global _accounting, _provider
+    provider = PROVIDERS.get(name)
+    if provider is None:
+        raise ValueError(f"Unknown size accounting: {name}")
+    _accounting = name
+    _provider = provider
+
+
+def size_accounting() -> str:
+    """Name of the current accounting mode"""
+    return _accounting
+
+
+def get_size_provider() -> SizeProvider:
+    """Current provider (fetch it once per walk in hot loops)"""
+    return _provider
+
+
+def file_size(path: str, st: os.stat_result) -> int:
+    """Size of a file under the current accounting mode"""
+    return _provider(path, st)
+
+
+def size_accounting_from_settings(optimization: Optional[Dict[str, Any]]) -> str:
+    """
+    Apply the optimization.size_accounting setting
+
+    Returns:
+        The mode in effect (apparent if the setting is unknown)
+    """
+    name = (optimization or {}).get('size_accounting', SIZE_APPARENT)
+    try:
+        set_size_accounting(name)
+    except ValueError as e:
+        logger.error(f"{e}, counting apparent sizes")
+        set_size_accounting(SIZE_APPARENT)
+    return _accounting
+
+
+def bind_cache_accounting(conn: sqlite3.Connection, tables: Iterable[str]) -> bool:
+    """
+    Empty cached size tables written under another accounting mode
+
+    The mode is recorded in a meta table of the cache database; a cache
+    without it predates size accounting and is emptied as well.
+
+    Returns:
+        True if the tables were emptied
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'size_accounting'").fetchone()
+    if row is not None and row[0] == _accounting:
+        return False
+    with conn:
+        for table in tables:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('size_accounting', ?)", (_accounting,))
+    return True
@@ -0,0 +1,215 @@
+"""
+Treemap layout
+Squarified treemap of an aggregated size tree, limited in depth and in
+rectangle size so that a tree of millions of nodes yields only the few
+thousand rectangles worth drawing
+"""
+
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+from utils.logger import get_logger
+from utils.disk_usage import SizeTree
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_DEPTH = 4
+
+# Rectangles smaller than this many square pixels are not drawn
+DEFAULT_MIN_AREA = 64
+
+# Gap in pixels between a directory and its children (shows the nesting)
+DEFAULT_PADDING = 2
+
+# Node index of the rectangle grouping the children too small to draw
+OTHER = -1
+
+# (x, y, width, height, node index or OTHER, depth)
+TreemapRect = Tuple[float, float, float, float, int, int]
+
+
+def squarify(areas: Sequence[float], x: float, y: float,
+             width: float, height: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Squarified layout (Bruls, Huizing, van Wijk) of areas sorted largest first
+
+    Areas are added to the current row along the shorter side as long as
+    the worst aspect ratio of the row improves; the row is then laid out
+    and the remaining rectangle shrinks. Areas must be in square pixels and
+    sum to at most width * height.
+
+    Returns:
+        (x, y, width, height) for each area, in the same order
+    """
+    rects = []
+    count = len(areas)
+    i = 0
+    while i < count and width > 0 and height > 0:
+        side = min(width, height)
+        side2 = side * side
+        row_sum = areas[i]
+        largest = areas[i]
+        worst = max(side2 * largest / (row_sum * row_sum), row_sum * row_sum / (side2 * areas[i])) \
+            if row_sum > 0 else float('inf')
+        j = i + 1
+        while j < count:
+            candidate_sum = row_sum + areas[j]
+            # Sorted areas: the new one is the smallest of the row
+            candidate = max(side2 * largest / (candidate_sum * candidate_sum),
+                            candidate_sum * candidate_sum / (side2 * areas[j])) \
+                if areas[j] > 0 else float('inf')
+            if candidate > worst:
+                break
+            row_sum = candidate_sum
+            worst = candidate
+            j += 1
+
+        if width >= height:
+            # Column along the left edge
+            thickness = row_sum / height if height else 0
+            offset = y
+            for area in areas[i:j]:
+                length = area / thickness if thickness else 0
+                rects.append((x, offset, thickness, length))
+                offset += length
+            x += thickness
+            width -= thickness
+        else:
+            # Row along the top edge
+            thickness = row_sum / width if width else 0
+            offset = x
+            for area in areas[i:j]:
+                length = area / thickness if thickness else 0
+                rects.append((offset, y, length, thickness))
+                offset += length
+            y += thickness
+            height -= thickness
+        i = j
+
+    # Areas that did not fit (rounding) get empty rectangles
+    rects.extend((x, y, 0.0, 0.0) for _ in range(count - len(rects)))
+    return rects
+
+
+def layout_treemap(
+    tree: SizeTree,
+    width: float,
+    height: float,
+    index: int = 0,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    min_area: float = DEFAULT_MIN_AREA,
+    padding: float = DEFAULT_PADDING,
+    cancel: Optional[threading.Event] = None
+) -> List[TreemapRect]:
+    """
+    Lay out the subtree of a node
+
+    Children are scaled to their parent's rectangle by size; those below
+    min_area are merged into a single OTHER rectangle (dropped too if it is
+    still below min_area), so only drawable nodes are ever visited.
+
+    Args:
+        tree: Aggregated size tree
+        width: Width of the drawing area in pixels
+        height: Height of the drawing area in pixels
+        index: Node shown as the whole area
+        max_depth: Directory levels laid out below that node
+        min_area: Smallest drawn rectangle, in square pixels
+        padding: Inset in pixels of the children inside a directory
+        cancel: Set to stop early (the rectangles so far are returned)
+
+    Returns:
+        Rectangles, parents before their children
+    """
+    size = tree.size
+    rects: List[TreemapRect] = [(0.0, 0.0, float(width), float(height), index, 0)]
+    pending = [rects[0]]
+    while pending:
+        if cancel is not None and cancel.is_set():
+            break
+        x, y, w, h, node, depth = pending.pop()
+        total = size[node]
+        if depth >= max_depth or not tree.is_dir(node) or not total:
+            continue
+        x += padding
+        y += padding
+        w -= 2 * padding
+        h -= 2 * padding
+        if w * h < min_area:
+            continue
+
+        scale = w * h / total
+        threshold = min_area / scale
+        kept = sorted((c for c in tree.children(node) if size[c] >= threshold),
+                      key=size.__getitem__, reverse=True)
+        areas = [size[c] * scale for c in kept]
+        other = total - sum(size[c] for c in kept)
+        if other >= threshold:
+            kept.append(OTHER)
+            areas.append(other * scale)
+
+        for child, (cx, cy, cw, ch) in zip(kept, squarify(areas, x, y, w, h)):
+            rect = (cx, cy, cw, ch, child, depth + 1)
+            rects.append(rect)
+            if child != OTHER:
+                pending.append(rect)
+    return rects
+
+
+def hit_test(rects: Sequence[TreemapRect], px: float, py: float) -> Optional[TreemapRect]:
+    """Deepest rectangle containing a point"""
+    found = None
+    for rect in rects:
+        x, y, w, h, _, depth = rect
+        if x <= px < x + w and y <= py < y + h and (found is None or depth > found[5]):
+            found = rect
+    return found
+
+
+class TreemapWorker:
+    """
+    Computes layouts on a background thread
+
+    Only the latest request matters: a new request cancels the one being
+    computed, and results of superseded requests are never delivered.
+    """
+
+    def __init__(self, on_layout: Callable[[SizeTree, int, List[TreemapRect]], None]):
+        """
+        Args:
+            on_layout: Receives (tree, node index, rectangles) on the worker
+                       thread; UI code must hand it over to its main loop.
+                       Node indexes refer to the tree that was laid out.
+        """
+        self.on_layout = on_layout
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._cancel = threading.Event()
+
+    def request(self, tree: SizeTree, width: float, height: float, index: int = 0, **options):
+        """Start laying out a node (options as in layout_treemap)"""
+        with self._lock:
+            self._cancel.set()
+            self._cancel = threading.Event()
+            self._generation += 1
+            generation = self._generation
+            cancel = self._cancel
+        threading.Thread(target=self._run, args=(generation, cancel, tree, width, height,
+                                                 index, options),
+                         daemon=True, name="treemap").start()
+
+    def _run(self, generation, cancel, tree, width, height, index, options):
+        try:
+            rects = layout_treemap(tree, width, height, index, cancel=cancel, **options)
+        except Exception as e:
+            logger.error(f"Treemap layout error: {e}")
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+        self.on_layout(tree, index, rects)
+
+    def cancel(self):
+        """Drop the pending request"""
+        with self._lock:
+            self._cancel.set()
+            self._generation += 1